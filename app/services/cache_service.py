@@ -2,6 +2,10 @@ import os
 import json
 import math
 import pickle
+import time
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
 from redis import Redis
 from dotenv import load_dotenv
@@ -13,6 +17,17 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 SEMANTIC_CACHE_MAX = int(os.getenv("SEMANTIC_CACHE_MAX", "200"))
 SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
 
+# Cache exact des réponses LLM (sous le cache sémantique)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()  # memory | disk | redis
+LLM_CACHE_MAX = int(os.getenv("LLM_CACHE_MAX", "512"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(".cache", "llm_responses"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(60*60*24)))
+# Backend disque : nombre max de réponses gardées (les plus anciennes sont supprimées au-delà)
+LLM_CACHE_DISK_MAX = int(os.getenv("LLM_CACHE_DISK_MAX", "10000"))
+# Au-delà de cette température, la réponse n'est pas déterministe : pas de cache
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+
 def _cosine(a, b):
     a, b = np.array(a), np.array(b)
     na, nb = np.linalg.norm(a), np.linalg.norm(b)
@@ -62,9 +77,170 @@ class SemanticCache:
         self.r.ltrim("sc:keys", -SEMANTIC_CACHE_MAX, -1)
 
 
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    Exact-match cache of LLM responses.
+    Key = (model, temperature, max_tokens, hash(system prompt), hash(user prompt)), so the same packed
+    context and question return the stored answer without calling the provider.
+    In-memory LRU in front of an optional disk or Redis backend. Every layer honours the TTL: the LRU
+    keeps each response's storage time, so an answer expired on disk or in Redis is not served from memory.
+    The cache is only an optimization: a backend error (Redis down, disk full...) is logged, counted
+    in stats() and handled as a miss, never raised to the caller.
+    """
+
+    def __init__(self, backend: str = LLM_CACHE_BACKEND, max_entries: int = LLM_CACHE_MAX,
+                 cache_dir: str = LLM_CACHE_DIR, ttl: int = LLM_CACHE_TTL, disk_max: int = LLM_CACHE_DISK_MAX):
+        self.enabled = LLM_CACHE_ENABLED
+        self.backend = backend
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.disk_max = disk_max
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._disk_entries = 0
+        self.r = Redis.from_url(REDIS_URL) if self.enabled and backend == "redis" else None
+        if self.enabled and backend == "disk":
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                self._disk_entries = len(self._disk_files())
+            except OSError as e:
+                self._backend_error("init", e)
+
+    def applies(self, temperature: float) -> bool:
+        return self.enabled and temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, system_prompt: str, user_prompt: str) -> str:
+        return _sha256(f"{model}|{temperature}|{max_tokens}|{_sha256(system_prompt)}|{_sha256(user_prompt)}")
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.time() - stored_at <= self.ttl:
+                    self._lru.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._lru[key]
 
+        try:
+            found = self._backend_get(key)
+        except Exception as e:
+            self._backend_error("get", e)
+            found = None
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            value, stored_at = found
+            self.hits += 1
+            self._remember(key, value, stored_at)
+        return value
 
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self._remember(key, value, time.time())
+        try:
+            self._backend_set(key, value)
+        except Exception as e:
+            self._backend_error("set", e)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self._lru),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "errors": self.errors,
+        }
+
+    def _backend_error(self, op: str, error: Exception):
+        with self._lock:
+            self.errors += 1
+        print(f"⚠️ LLM response cache ({self.backend}) {op} failed: {error}")
+
+    def _remember(self, key: str, value: dict, stored_at: float):
+        # Date de stockage d'origine (mtime disque, TTL Redis restant) : la mémoire n'allonge pas la durée de vie
+        self._lru[key] = (stored_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _backend_get(self, key: str):
+        """(value, storage time) from the backend, or None on a miss."""
+        if self.backend == "redis" and self.r is not None:
+            hit = self.r.get(f"llm:resp:{key}")
+            if not hit:
+                return None
+            remaining = self.r.ttl(f"llm:resp:{key}")
+            stored_at = time.time() - (self.ttl - remaining) if remaining and remaining > 0 else time.time()
+            return json.loads(hit), stored_at
+        if self.backend == "disk":
+            path = self._disk_path(key)
+            try:
+                mtime = os.path.getmtime(path)
+                if time.time() - mtime > self.ttl:
+                    # Même TTL que Redis : une réponse expirée est supprimée et comptée comme un miss
+                    os.remove(path)
+                    return None
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f), mtime
+            except FileNotFoundError:
+                return None
+        return None
 
+    def _backend_set(self, key: str, value: dict):
+        if self.backend == "redis" and self.r is not None:
+            self.r.set(f"llm:resp:{key}", json.dumps(value), ex=self.ttl)
+        elif self.backend == "disk":
+            path = self._disk_path(key)
+            existed = os.path.exists(path)
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            if not existed:
+                with self._lock:
+                    self._disk_entries += 1
+                    prune = self._disk_entries > self.disk_max
+                if prune:
+                    self._prune_disk()
 
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
 
+    def _disk_files(self):
+        return [e for e in os.scandir(self.cache_dir) if e.name.endswith(".json")]
 
+    def _prune_disk(self):
+        """Drop expired responses, then the oldest ones down to 90% of disk_max (amortized over many sets)."""
+        now = time.time()
+        entries = []
+        for e in self._disk_files():
+            try:
+                entries.append((e.stat().st_mtime, e.path))
+            except FileNotFoundError:
+                pass
+        entries.sort()
+        keep = int(self.disk_max * 0.9)
+        removed = 0
+        for i, (mtime, path) in enumerate(entries):
+            if now - mtime <= self.ttl and len(entries) - i <= keep:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._disk_entries = len(entries) - removed
@@ -1,7 +1,14 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Tuple, Union
 import tiktoken
 import re
 
+_TITLE_RE = re.compile(r'^(#{1,6}\s+.+|[A-Z0-9][A-Z0-9 \-/]{6,}|(?:\d+\.)+\s+.+)$')
+_DOMAIN_RE = re.compile(r'^(exemples?|consignes?|erreurs? fréquentes?|variantes?|matériel|equipement|équipement)\s*:?\s*$', re.I)
+_BULLET_RE = re.compile(r'^(\-|\*|\d+\)|\d+\.)\s+')
+# Mêmes séparateurs que str.splitlines() (dont \x0c saut de page PDF, \x1c, \u2028)
+_LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+_LINE_BREAK_RE = re.compile(r'\r\n|[' + _LINE_BREAKS + r']')
+
 class SemanticChunker:
     """Chunk documents using semantic boundaries where possible."""
 
@@ -14,15 +21,58 @@ class SemanticChunker:
     def chunk_document(self, text: str, metadata: Dict) -> List[Dict]:
         """Produce chunks from a document respecting semantic boundaries."""
         sections = self._detect_sections(text)
+        # Une seule passe BPE par section ; les fenêtres réutilisent ces tokens
+        section_tokens = self.encoder.encode_batch(sections)
         chunks = []
-        for section in sections:
-            if self._is_atomic_section(section):
-                chunks.append(self._create_chunk(section, metadata))
-            else:
-                sub_chunks = self._split_with_overlap(section, self.chunk_size, self.overlap)
-                chunks.extend([self._create_chunk(chunk, metadata) for chunk in sub_chunks])
+        for section, tokens in zip(sections, section_tokens):
+            chunks.extend(self._chunk_section(section, tokens, metadata))
         return chunks
 
+    def chunk_documents(self, documents: Iterable[Tuple[str, Dict]]) -> List[List[Dict]]:
+        """Chunk several (text, metadata) documents with a single encode_batch over all their sections."""
+        documents = list(documents)
+        per_doc_sections = [self._detect_sections(text) for text, _ in documents]
+        flat = [section for sections in per_doc_sections for section in sections]
+        flat_tokens = iter(self.encoder.encode_batch(flat))
+
+        results = []
+        for (_, metadata), sections in zip(documents, per_doc_sections):
+            chunks = []
+            for section in sections:
+                chunks.extend(self._chunk_section(section, next(flat_tokens), metadata))
+            results.append(chunks)
+        return results
+
+    def iter_chunks(self, stream: Union[str, Iterable[str]], metadata: Dict) -> Iterator[Dict]:
+        """
+        Streaming variant of chunk_document: yields chunks as soon as each section is complete.
+        `stream` is a text or an iterable of line-aligned pieces (lines, or PDF pages one by one);
+        pieces are chunked as chunk_document("\n".join(pieces)) would chunk them.
+        Memory stays bounded by the largest section, so embedding/upsert can start before
+        the whole document is parsed.
+        """
+        for section in self._iter_sections(self._iter_lines(stream)):
+            yield from self._chunk_section(section, self.encoder.encode(section), metadata)
+
+    @staticmethod
+    def _iter_lines(stream: Union[str, Iterable[str]]) -> Iterator[str]:
+        """Lines of `stream`, split exactly like chunk_document splits its text (str.splitlines())."""
+        if isinstance(stream, str):
+            # Équivalent paresseux de stream.splitlines()
+            pos = 0
+            for m in _LINE_BREAK_RE.finditer(stream):
+                yield stream[pos:m.start()]
+                pos = m.end()
+            if pos < len(stream):
+                yield stream[pos:]
+            return
+        for piece in stream:
+            # Morceaux (pages) lus comme s'ils étaient joints par "\n" : après un séparateur
+            # final, ce "\n" ajoute une ligne vide (sauf derrière "\r", avec lequel il forme "\r\n")
+            yield from piece.splitlines()
+            if not piece or (piece[-1] in _LINE_BREAKS and piece[-1] != "\r"):
+                yield ""
+
     def _detect_sections(self, text: str) -> List[str]:
         """
         Heuristiques de découpe orientées documents :
@@ -31,59 +81,79 @@ class SemanticChunker:
         - Listes à puces / numérotées
         Retour: liste de paragraphes (strings) prêts pour le token-splitting
         """
-        lines = [ln.strip() for ln in text.splitlines()]
-        blocks, buf = [], []
+        return list(self._iter_sections(text.splitlines()))
 
-        title_re = re.compile(r'^(#{1,6}\s+.+|[A-Z0-9][A-Z0-9 \-/]{6,}|(?:\d+\.)+\s+.+)$')
-        domain_re = re.compile(r'^(exemples?|consignes?|erreurs? fréquentes?|variantes?|matériel|equipement|équipement)\s*:?\s*$', re.I)
-        bullet_re = re.compile(r'^(\-|\*|\d+\)|\d+\.)\s+')
+    def _iter_sections(self, lines: Iterable[str]) -> Iterator[str]:
+        """Generator behind _detect_sections: yields each section as soon as it is closed."""
+        buf = []
 
         def flush():
             if buf:
-                blocks.append("\n".join(buf).strip())
+                block = "\n".join(buf).strip()
                 buf.clear()
+                # Filtrer les vides
+                if block and len(block) > 1:
+                    return block
+            return None
 
         for ln in lines:
+            ln = ln.strip()
             if not ln:
-                flush()
+                block = flush()
+                if block:
+                    yield block
                 continue
 
             # Hard boundary on titles or section headers
-            if title_re.match(ln) or domain_re.match(ln):
-                flush()
-                blocks.append(ln)
+            if _TITLE_RE.match(ln) or _DOMAIN_RE.match(ln):
+                block = flush()
+                if block:
+                    yield block
+                if len(ln) > 1:
+                    yield ln
                 continue
 
             # Keep list items grouped but allow paragraph boundaries on blank lines
-            if bullet_re.match(ln):
+            if _BULLET_RE.match(ln):
                 buf.append(ln)
                 continue
 
             buf.append(ln)
 
-        flush()
-        # Filtrer les vides
-        return [b for b in blocks if b and len(b) > 1]
+        block = flush()
+        if block:
+            yield block
 
-    def _is_atomic_section(self, section: str) -> bool:
-        """Heuristically decide whether a section is small enough to keep intact."""
-        tokens = self.encoder.encode(section)
-        return len(tokens) <= self.chunk_size
+    def _chunk_section(self, section: str, tokens: List[int], metadata: Dict) -> List[Dict]:
+        """Keep a small section intact, otherwise cut overlapping token windows (no re-encoding)."""
+        if len(tokens) <= self.chunk_size:
+            return [self._create_chunk(section, metadata, len(tokens))]
+        return [
+            self._create_chunk(text, metadata, n_tokens)
+            for text, n_tokens in self._split_with_overlap(tokens, self.chunk_size, self.overlap)
+        ]
 
-    def _split_with_overlap(self, text: str, size: int, overlap: int) -> List[str]:
-        tokens = self.encoder.encode(text)
+    def _split_with_overlap(self, tokens: List[int], size: int, overlap: int) -> List[Tuple[str, int]]:
+        """
+        Windows of `size` tokens with `overlap`. Chunk text is sliced from the section text
+        using the character offset of each token, so windows are never decoded/re-encoded
+        and never cut a multi-byte character in half.
+        """
+        text, offsets = self.encoder.decode_with_offsets(tokens)
+        n = len(tokens)
         chunks = []
-        for i in range(0, len(tokens), size - overlap):
-            chunk_tokens = tokens[i:i + size]
-            chunks.append(self.encoder.decode(chunk_tokens))
+        for i in range(0, n, size - overlap):
+            end = i + size
+            char_end = offsets[end] if end < n else len(text)
+            chunks.append((text[offsets[i]:char_end], min(size, n - i)))
         return chunks
 
-    def _create_chunk(self, text: str, metadata: Dict) -> Dict:
+    def _create_chunk(self, text: str, metadata: Dict, n_tokens: int) -> Dict:
         return {
             "text": text,
             "metadata": {
                 **metadata,
-                "chunk_size": len(self.encoder.encode(text)),
+                "chunk_size": n_tokens,
                 "preview": text[:100] + "..."
             }
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,126 @@
+from typing import List, Dict, Optional
+import re
+import os
+from bisect import bisect_left
+from functools import lru_cache
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Troncature des documents aux frontières de phrase pour remplir le budget restant
+ENABLE_CONTEXT_TRUNCATION = os.getenv("ENABLE_CONTEXT_TRUNCATION", "true").lower() == "true"
+# En dessous de ce nombre de tokens, un fragment tronqué n'apporte rien
+MIN_FRAGMENT_TOKENS = int(os.getenv("MIN_FRAGMENT_TOKENS", "40"))
+# Taille du cache de comptage (fallback quand "n_tokens" manque dans le payload)
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "4096"))
+
+# Fin de phrase (., !, ?, ;, …) ou saut de ligne. Les espaces restent attachés à la phrase suivante.
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?;…])(?=\s)|\n")
+
+
+class ContextPacker:
+    """
+    Select the documents that maximise total relevance within a token budget.
+    Solves a 0/1 knapsack (weight = tokens, value = score) instead of greedily
+    stopping at the first document that overflows, then optionally fills the
+    leftover budget with a sentence-truncated document.
+    """
+
+    def __init__(self, encoder, max_docs: int = 5,
+                 allow_truncation: bool = ENABLE_CONTEXT_TRUNCATION,
+                 min_fragment_tokens: int = MIN_FRAGMENT_TOKENS):
+        self._enc = encoder
+        self.max_docs = max_docs
+        self.allow_truncation = allow_truncation
+        self.min_fragment_tokens = min_fragment_tokens
+        # Tokenizer mémoïsé : seulement utilisé pour les documents ingérés sans "n_tokens"
+        self._count_text = lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)(self._encode_len)
+
+    def _encode_len(self, text: str) -> int:
+        return len(self._enc.encode(text))
+
+    def count_tokens(self, doc: Dict) -> int:
+        """Token count of a document: payload['n_tokens'] (set at ingest), else the memoized count of its text."""
+        n_tokens = (doc.get("payload") or {}).get("n_tokens")
+        if n_tokens is None:
+            n_tokens = self._count_text(doc.get("text", ""))
+        return n_tokens
+
+    def pack(self, docs: List[Dict], max_tokens: int) -> List[Dict]:
+        """Return the packed documents, ordered by decreasing score."""
+        candidates = sorted(docs, key=lambda x: x['score'], reverse=True)[:self.max_docs]
+        if not candidates or max_tokens <= 0:
+            return []
+
+        weights = [self.count_tokens(d) for d in candidates]
+        # Les scores du reranker peuvent être négatifs : on les décale pour garder des valeurs > 0
+        shift = min(0.0, min(d['score'] for d in candidates))
+        values = [d['score'] - shift + 1e-6 for d in candidates]
+
+        chosen = self._knapsack(weights, values, max_tokens)
+        packed = [candidates[i] for i in chosen]
+        used = sum(weights[i] for i in chosen)
+
+        if self.allow_truncation:
+            remaining = max_tokens - used
+            for i, doc in enumerate(candidates):
+                if i in chosen:
+                    continue
+                if remaining < self.min_fragment_tokens:
+                    break
+                fragment = self._truncate(doc, remaining)
+                if fragment:
+                    packed.append(fragment)
+                    remaining -= fragment["payload"]["n_tokens"]
+
+        return sorted(packed, key=lambda x: x['score'], reverse=True)
+
+    @staticmethod
+    def _knapsack(weights: List[int], values: List[float], capacity: int) -> List[int]:
+        """0/1 knapsack by dynamic programming over the token capacity. Returns chosen indices."""
+        n = len(weights)
+        best = [0.0] * (capacity + 1)
+        keep = [[False] * (capacity + 1) for _ in range(n)]
+        for i in range(n):
+            w, v = weights[i], values[i]
+            if w > capacity:
+                continue
+            for c in range(capacity, w - 1, -1):
+                if best[c - w] + v > best[c]:
+                    best[c] = best[c - w] + v
+                    keep[i][c] = True
+
+        chosen = []
+        c = capacity
+        for i in range(n - 1, -1, -1):
+            if keep[i][c]:
+                chosen.append(i)
+                c -= weights[i]
+        return sorted(chosen)
+
+    def _truncate(self, doc: Dict, budget: int) -> Optional[Dict]:
+        """Copy of the document cut at the last sentence boundary whose prefix fits the budget."""
+        text = doc.get("text", "")
+        # Une seule passe BPE sur le texte : l'offset de chaque token donne le coût de chaque préfixe
+        _, offsets = self._enc.decode_with_offsets(self._enc.encode(text))
+        cuts = [m.start() for m in _SENTENCE_END_RE.finditer(text)] + [len(text)]
+        # Tokens commencés avant la coupe (un token à cheval est compté) : croissant avec la coupe
+        fitting = [cut for cut in cuts if bisect_left(offsets, cut) <= budget]
+
+        # Le préfixe retenu est ré-encodé tel quel : n_tokens est son compte exact, jamais au-delà du budget
+        for end in reversed(fitting):
+            fragment = text[:end].rstrip()
+            n_tokens = len(self._enc.encode(fragment))
+            if n_tokens <= budget:
+                break
+        else:
+            return None
+
+        if n_tokens < self.min_fragment_tokens:
+            return None
+
+        return {
+            **doc,
+            "text": fragment,
+            "payload": {**(doc.get("payload") or {}), "n_tokens": n_tokens, "truncated": True},
+        }
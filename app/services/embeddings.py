@@ -0,0 +1,327 @@
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Sequence, Union
+import os
+import re
+import json
+import time
+import numpy as np
+from qdrant_client.models import Distance, VectorParams, PointStruct
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+load_dotenv()
+
+
+class EmbeddingSpec(NamedTuple):
+    name: str
+    dim: int
+    normalize: bool  # sortie normalisée L2 par le modèle (module Normalize)
+
+
+# Registre des modèles d'embedding : seule source de vérité pour la dimension de la collection.
+# Le modèle utilisé à l'ingestion est enregistré avec la collection et revérifié au démarrage du retriever.
+EMBEDDING_MODELS: Dict[str, EmbeddingSpec] = {spec.name: spec for spec in (
+    EmbeddingSpec("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2", 384, False),
+    EmbeddingSpec("sentence-transformers/paraphrase-multilingual-mpnet-base-v2", 768, False),
+    EmbeddingSpec("sentence-transformers/all-MiniLM-L6-v2", 384, True),
+    EmbeddingSpec("sentence-transformers/all-mpnet-base-v2", 768, True),
+)}
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
+
+# Métadonnées d'embedding d'une collection : un point dans la collection compagnon "<collection>__embedding"
+# (Qdrant n'a pas de métadonnées au niveau collection)
+EMBEDDING_META_SUFFIX = "__embedding"
+EMBEDDING_META_POINT_ID = 1
+
+# Backend d'embedding (CPU) :
+# - "torch"     : SentenceTransformer PyTorch (référence, utilisé pour indexer la collection)
+# - "quantized" : même modèle, couches Linear quantifiées int8 dynamiquement (torch.quantization)
+# - "onnx"      : export ONNX servi par onnxruntime (int8 si EMBEDDING_ONNX_QUANTIZE), sans torch au runtime
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join(".cache", "onnx"))
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "true").lower() == "true"
+# Les vecteurs indexés viennent du modèle torch : un autre backend doit rester à ce cosinus près
+EMBEDDING_PARITY_MIN_COSINE = float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", "0.98"))
+
+BACKENDS = ("torch", "quantized", "onnx")
+
+# Phrases de contrôle (FR/EN, domaine de l'index) pour la vérification de parité
+PARITY_TEXTS = [
+    "Séance de renforcement du bas du corps sans matériel pour débutant",
+    "Micro-cycle d'activation neuromusculaire : coordination et réveil moteur",
+    "Squat bulgare avec haltères, 3 séries de 10 répétitions, repos 90 secondes",
+    "Programme hypertrophie sur 4 semaines, 4 séances par semaine",
+    "Mobilité de hanche et gainage pour la récupération active",
+    "Interval training on a bike: 8 x 30 seconds hard, 90 seconds easy",
+    "Progression rule: increase the load when all sets reach the top of the rep range",
+    "Tabata modifié",
+]
+
+
+class ParityError(RuntimeError):
+    """Backend embeddings too far from the PyTorch reference."""
+
+
+class EmbeddingConfigError(ValueError):
+    """Embedding model, collection and/or snapshot do not agree (name, dimension or normalization)."""
+
+
+def get_embedding_spec(model_name: str = EMBEDDING_MODEL) -> EmbeddingSpec:
+    spec = EMBEDDING_MODELS.get(model_name)
+    if spec is None:
+        raise EmbeddingConfigError(f"Modèle d'embedding inconnu : {model_name} "
+                                   f"(à déclarer dans EMBEDDING_MODELS, connus : {', '.join(EMBEDDING_MODELS)})")
+    return spec
+
+
+def _slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+def pool(token_embeddings: np.ndarray, attention_mask: np.ndarray, mode: str = "mean",
+         normalize: bool = False) -> np.ndarray:
+    """Sentence embeddings from token embeddings, as the sentence-transformers Pooling / Normalize modules do."""
+    if mode == "cls":
+        emb = token_embeddings[:, 0]
+    else:
+        mask = attention_mask[..., None].astype(token_embeddings.dtype)
+        emb = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        emb = emb / np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+    return emb.astype(np.float32)
+
+
+class OnnxEmbedder:
+    """
+    Exported transformer run by onnxruntime + the model's tokenizer + numpy pooling.
+    Same encode() contract as SentenceTransformer for what the app uses (str -> 1D, list -> 2D array).
+    """
+
+    def __init__(self, model_dir: str):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("onnxruntime n'est pas installé. Installe-le avec `pip install onnxruntime` pour EMBEDDING_BACKEND=onnx.")
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(os.path.join(model_dir, self.meta["file"]), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta["dim"]
+
+    def encode(self, sentences: Union[str, Sequence[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = []
+        for start in range(0, len(texts), batch_size):
+            enc = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                 max_length=self.meta["max_seq_length"], return_tensors="np")
+            feeds = {name: enc[name].astype(np.int64) for name in self.input_names}
+            token_embeddings = self.session.run(None, feeds)[0]
+            out.append(pool(token_embeddings, enc["attention_mask"], self.meta["pooling"], self.meta["normalize"]))
+        emb = np.concatenate(out) if out else np.zeros((0, self.meta["dim"]), dtype=np.float32)
+        return emb[0] if single else emb
+
+
+def onnx_model_dir(model_name: str, quantize: bool = EMBEDDING_ONNX_QUANTIZE) -> str:
+    return os.path.join(EMBEDDING_ONNX_DIR, _slug(model_name) + ("-int8" if quantize else ""))
+
+
+def export_onnx(model_name: str, quantize: bool = EMBEDDING_ONNX_QUANTIZE,
+                min_cosine: float = EMBEDDING_PARITY_MIN_COSINE) -> str:
+    """
+    Export the transformer of a SentenceTransformer to ONNX (optionally int8 dynamic quantization),
+    with tokenizer and pooling config, then check parity against the PyTorch model.
+    Needs torch (export time only). Returns the export directory.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    out_dir = onnx_model_dir(model_name, quantize)
+    tmp_dir = f"{out_dir}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    reference = SentenceTransformer(model_name, device="cpu")
+    transformer, pooling = reference[0], reference[1]
+    hf_model = transformer.auto_model.eval()
+    hf_model.config.return_dict = False  # sortie tuple : (last_hidden_state, ...)
+    tokenizer = transformer.tokenizer
+
+    dummy = tokenizer(["export onnx"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+    dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+    fp32_path = os.path.join(tmp_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(hf_model, tuple(dummy[n] for n in input_names), fp32_path,
+                          input_names=input_names, output_names=["token_embeddings"],
+                          dynamic_axes=dynamic_axes, opset_version=14, do_constant_folding=True)
+
+    file_name = "model.onnx"
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, os.path.join(tmp_dir, "model_int8.onnx"), weight_type=QuantType.QInt8)
+        os.remove(fp32_path)
+        file_name = "model_int8.onnx"
+
+    tokenizer.save_pretrained(tmp_dir)
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "model_name": model_name,
+            "file": file_name,
+            "quantized": quantize,
+            "dim": reference.get_sentence_embedding_dimension(),
+            "max_seq_length": reference.max_seq_length,
+            "pooling": "cls" if pooling.pooling_mode_cls_token else "mean",
+            "normalize": any(type(m).__name__ == "Normalize" for m in reference),
+        }, f, indent=2)
+
+    report = check_parity(OnnxEmbedder(tmp_dir), reference, min_cosine=min_cosine)
+    print(f"   ONNX parity: min cosine {report['min_cosine']:.4f} (mean {report['mean_cosine']:.4f})")
+
+    if os.path.isdir(out_dir):
+        for name in os.listdir(out_dir):
+            os.remove(os.path.join(out_dir, name))
+        os.rmdir(out_dir)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+def quantize_torch(model: "SentenceTransformer") -> "SentenceTransformer":
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def check_parity(candidate, reference, texts: Sequence[str] = PARITY_TEXTS,
+                 min_cosine: float = EMBEDDING_PARITY_MIN_COSINE, raise_on_error: bool = True) -> Dict:
+    """
+    Cosine between candidate and reference embeddings of `texts`.
+    Raises ParityError if any text is below `min_cosine` (the collection was indexed with the reference).
+    """
+    a = np.asarray(candidate.encode(list(texts)), dtype=np.float32)
+    b = np.asarray(reference.encode(list(texts)), dtype=np.float32)
+    cos = (a * b).sum(axis=1) / np.clip(np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1), 1e-12, None)
+    report = {"min_cosine": float(cos.min()), "mean_cosine": float(cos.mean()), "n": len(texts),
+              "min_required": min_cosine, "ok": bool(cos.min() >= min_cosine)}
+    if raise_on_error and not report["ok"]:
+        worst = texts[int(cos.argmin())]
+        raise ParityError(f"Embedding parity failed: min cosine {report['min_cosine']:.4f} < {min_cosine} (\"{worst}\")")
+    return report
+
+
+def load_embedding_model(model_name: str, backend: Optional[str] = None):
+    """
+    Embedding model for `backend` (default EMBEDDING_BACKEND). Every backend exposes encode() and
+    get_sentence_embedding_dimension() like SentenceTransformer.
+    The onnx backend never imports torch / sentence_transformers, and needs an existing export
+    (scripts/embedding_parity.py --backend onnx --export): exporting loads the full torch model.
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND inconnu : {backend} (attendu : {', '.join(BACKENDS)})")
+    t0 = time.perf_counter()
+
+    if backend == "onnx":
+        model_dir = onnx_model_dir(model_name)
+        if not os.path.exists(os.path.join(model_dir, "meta.json")):
+            raise FileNotFoundError(f"Export ONNX introuvable pour {model_name} ({model_dir}) : lancer "
+                                    f"`python scripts/embedding_parity.py --backend onnx --export` avant de démarrer")
+        model = OnnxEmbedder(model_dir)
+    else:
+        # Import paresseux : torch n'est chargé que par les backends qui s'en servent
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device="cpu" if backend == "quantized" else None)
+        if backend == "quantized":
+            quantized = quantize_torch(model)
+            # Le modèle fp32 est déjà en mémoire : la parité ne coûte que quelques encodes
+            report = check_parity(quantized, model)
+            print(f"   int8 parity: min cosine {report['min_cosine']:.4f} (mean {report['mean_cosine']:.4f})")
+            model = quantized
+
+    print(f"🧠 Embedding model {model_name} [{backend}] loaded in {time.perf_counter() - t0:.1f}s")
+    return model
+
+
+# --- MÉTADONNÉES DE LA COLLECTION ---
+
+def meta_collection_name(collection_name: str) -> str:
+    return f"{collection_name}{EMBEDDING_META_SUFFIX}"
+
+
+def record_collection_embedding(client, collection_name: str, spec: EmbeddingSpec,
+                                backend: Optional[str] = None) -> Dict[str, Any]:
+    """Write the embedding model of `collection_name` (name, dim, normalize) next to it. Returns the record."""
+    meta_name = meta_collection_name(collection_name)
+    if not client.collection_exists(meta_name):
+        client.create_collection(collection_name=meta_name, vectors_config=VectorParams(size=1, distance=Distance.DOT))
+    record = {"collection": collection_name, "embedding_model": spec.name, "dim": spec.dim,
+              "normalize": spec.normalize, "backend": backend, "recorded_at": time.time()}
+    client.upsert(collection_name=meta_name, wait=True,
+                  points=[PointStruct(id=EMBEDDING_META_POINT_ID, vector=[1.0], payload=record)])
+    return record
+
+
+def read_collection_embedding(client, collection_name: str) -> Optional[Dict[str, Any]]:
+    """Embedding record of `collection_name`, or None if it was ingested before the registry."""
+    meta_name = meta_collection_name(collection_name)
+    if not client.collection_exists(meta_name):
+        return None
+    points = client.retrieve(collection_name=meta_name, ids=[EMBEDDING_META_POINT_ID], with_payload=True)
+    return points[0].payload if points else None
+
+
+def collection_vector_size(client, collection_name: str) -> int:
+    vectors = client.get_collection(collection_name).config.params.vectors
+    # Collection avec vecteurs nommés : le dense est sans nom
+    if isinstance(vectors, dict):
+        vectors = vectors[""]
+    return vectors.size
+
+
+def embedding_mismatches(recorded: Optional[Dict[str, Any]], spec: EmbeddingSpec) -> List[str]:
+    """Differences between a recorded {embedding_model, dim, normalize} (collection or snapshot) and `spec`."""
+    if not recorded:
+        return []
+    problems = []
+    if recorded.get("embedding_model") and recorded["embedding_model"] != spec.name:
+        problems.append(f"modèle {recorded['embedding_model']} != {spec.name}")
+    if recorded.get("dim") is not None and int(recorded["dim"]) != spec.dim:
+        problems.append(f"dimension {recorded['dim']} != {spec.dim}")
+    if recorded.get("normalize") is not None and bool(recorded["normalize"]) != spec.normalize:
+        problems.append(f"normalize {recorded['normalize']} != {spec.normalize}")
+    return problems
+
+
+def check_model_dimension(model, spec: EmbeddingSpec) -> None:
+    dim = model.get_sentence_embedding_dimension()
+    if dim != spec.dim:
+        raise EmbeddingConfigError(f"{spec.name} produit des vecteurs de dimension {dim}, le registre indique {spec.dim}")
+
+
+def validate_collection_embedding(client, collection_name: str, spec: EmbeddingSpec,
+                                  model=None) -> Optional[Dict[str, Any]]:
+    """
+    Check that `collection_name` can be queried with `spec` (and `model`, if given): vector size of the
+    collection and recorded model metadata. Raises EmbeddingConfigError on mismatch; Qdrant errors propagate.
+    Returns the recorded metadata (None for a collection ingested before the registry: dimension checked only).
+    """
+    if model is not None:
+        check_model_dimension(model, spec)
+    size = collection_vector_size(client, collection_name)
+    recorded = read_collection_embedding(client, collection_name)
+    problems = embedding_mismatches(recorded, spec)
+    if size != spec.dim:
+        problems.insert(0, f"vecteurs de la collection en dimension {size} != {spec.dim}")
+    if problems:
+        raise EmbeddingConfigError(f"Collection '{collection_name}' incompatible avec {spec.name} : "
+                                   f"{'; '.join(problems)} (réingérer ou changer EMBEDDING_MODEL)")
+    return recorded
@@ -1,9 +1,13 @@
-from typing import List, Dict
+from typing import List, Dict, Tuple
 from openai import OpenAI
 import re
+import json
 from dotenv import load_dotenv
 import os
 import tiktoken
+from app.services.context_packer import ContextPacker
+from app.services.prompts import build_messages, build_plan_messages, extract_usage
+from app.services.cache_service import ResponseCache
 
 load_dotenv()  # Charge automatiquement les variables d'environnement
 
@@ -21,81 +25,49 @@ class RAGGenerator:
         self.temperature = float(os.getenv("LLM_TEMPERATURE", "0.1"))
         # Encodage token pour un comptage précis
         self._enc = tiktoken.get_encoding("cl100k_base")
+        self._packer = ContextPacker(self._enc, max_docs=self.max_docs)
+        # Cache exact des réponses (mêmes docs packés + même question => pas d'appel OpenAI)
+        self.response_cache = ResponseCache()
 
     def _pack_context(self, docs: List[Dict], max_tokens: int) -> List[Dict]:
-        """Pack the highest scoring documents until the token budget is filled."""
-        sorted_docs = sorted(docs, key=lambda x: x['score'], reverse=True)
-        packed: List[Dict] = []
-        token_count = 0
-        for doc in sorted_docs[:self.max_docs]:
-            # Comptage exact des tokens pour contrôler le budget
-            doc_tokens = len(self._enc.encode(doc['text']))
-            if token_count + doc_tokens > max_tokens:
-                break
-            packed.append(doc)
-            token_count += doc_tokens
-        return packed
+        """Pack the most relevant documents that fit the token budget (knapsack + sentence truncation)."""
+        return self._packer.pack(docs, max_tokens)
+
+    def _complete(self, messages: List[Dict]) -> Tuple[str, Dict]:
+        """Chat completion through the exact-match response cache (only at low temperature)."""
+        use_cache = self.response_cache.applies(self.temperature)
+        if use_cache:
+            key = ResponseCache.make_key(
+                self.model, self.temperature, self.max_output_tokens,
+                messages[0]["content"], messages[-1]["content"]
+            )
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached["answer"], {**cached["usage"], "response_cache_hit": True}
 
-    def _build_prompt(self, query: str, context: List[Dict]) -> str:
-        context_text = "\n\n".join([
-            f"[Document {i+1}] {doc['payload'].get('title', '')} (ID: {doc['id']})\n" + doc['text']
-            for i, doc in enumerate(context)
-        ])
-        return f"""You are a fitness coaching assistant. Answer the question using only the information from the context.
-Always cite your sources as (Document N).
-
-Context:
-{context_text}
-
-Question: {query}
-
-Provide a concise, actionable answer and list relevant exercises/programs. Cite your sources."""
-
-    def _get_system_prompt(self, context_text: str = None) -> str:
-        base_prompt = """
-You are the **Training Data Generator**. Your ONLY function is to output a raw training schedule in a specific, machine-parsable format based on the retrieved documents.
-
-**CRITICAL PARSING RULES (Software Functionality):**
-
-1.  **NO CONVERSATION:** You MUST NOT include any conversational text, introduction ("Hello Champion"), greeting, disclaimer, or conclusion. Output ONLY the schedule structure.
-2.  **Day Header Syntax (Tabs):** You MUST use the double hash and space (`## `) to define each day. This is a functional token for the app's tab system.
-3.  **Exercise Syntax (Checklist):** You MUST use the exact checklist format (`- [ ] `) for every exercise line. This is the functional token for the checkbox UI.
-
-**Final Output Structure (Must be followed exactly):**
-
-## Day 1: [Focus Name]
-* Duration: [XX] min | Intensity: [Level]
-
-- [ ] [Exercise Name] | [Sets] sets x [Reps] reps | [Rest] sec
-  * Cue: [Brief technical cue]
-
-- [ ] [Exercise Name] | [Sets] sets x [Reps] reps | [Rest] sec
-  * Cue: [Brief technical cue]
-
-## Day 2: [Focus Name]
-* Duration: [XX] min | Intensity: [Level]
-... (Repeat for all scheduled days)
-"""
-
-        if context_text:
-            base_prompt += f"\n\n**CURRENT PROGRAM CONTEXT:**\nThe user is looking at this specific training plan:\n\n{context_text}\n\nAnswer their question based on this plan. If they ask about technique, use your RAG knowledge (Qdrant) to explain the exercise listed in the plan."
-
-        return base_prompt
-
-    def generate(self, query: str, retrieved_docs: List[Dict], context_text: str = None) -> Dict:
-        context = self._pack_context(retrieved_docs, self.max_context_tokens)
-        prompt = self._build_prompt(query, context)
-        
         response = self.client.chat.completions.create(
             model=self.model,
-            messages=[
-                {"role": "system", "content": self._get_system_prompt(context_text)},
-                {"role": "user", "content": prompt}
-            ],
+            messages=messages,
             temperature=self.temperature,
             max_tokens=self.max_output_tokens
         )
         answer_text = response.choices[0].message.content
+        usage = extract_usage(response)
+
+        if use_cache:
+            self.response_cache.set(key, {"answer": answer_text, "usage": usage})
+        return answer_text, {**usage, "response_cache_hit": False}
+
+    def render_plan(self, plan: Dict) -> str:
+        """Render a structured plan (from the catalog planner) as Markdown. No retrieval involved."""
+        answer_text, _ = self._complete(build_plan_messages(json.dumps(plan, ensure_ascii=False)))
+        return answer_text
+
+    def generate(self, query: str, retrieved_docs: List[Dict], context_text: str = None) -> Dict:
+        context = self._pack_context(retrieved_docs, self.max_context_tokens)
+        # Préfixe système statique (cache fournisseur), parties variables en fin de message
+        messages = build_messages(query, context, context_text=context_text)
+        answer_text, usage = self._complete(messages)
         
         # Extraire les références "(Document N)" et mapper vers le contexte
         doc_ref_re = re.compile(r"\(Document\s+(\d+)\)")
@@ -116,5 +88,6 @@ You are the **Training Data Generator**. Your ONLY function is to output a raw t
         return {
             "answer": answer_text,
             "sources": sources,
-            "context_used": context
+            "context_used": context,
+            "usage": usage
         }
\ No newline at end of file
@@ -1,25 +1,65 @@
-from typing import List, Dict
+from typing import Dict, List, Optional
 import uuid
 from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Distance, VectorParams, PointStruct,
     OptimizersConfigDiff, HnswConfigDiff,
-    ScalarQuantization, ScalarQuantizationConfig
+    ScalarQuantization, ScalarQuantizationConfig,
+    PayloadSchemaType
 )
 from dotenv import load_dotenv
 import os
+import tiktoken
+from app.services.rag_router import FILTER_SCHEMA
+from app.services.embeddings import (
+    get_embedding_spec, record_collection_embedding, EmbeddingConfigError, EMBEDDING_MODEL
+)
 
 load_dotenv()
 
+_PAYLOAD_INDEX_TYPES = {
+    "keyword": PayloadSchemaType.KEYWORD,
+    "integer": PayloadSchemaType.INTEGER,
+}
+
+
+def missing_payload_indexes(client: QdrantClient, collection_name: str,
+                            schema: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Filter fields of `schema` (default FILTER_SCHEMA) without a payload index of the expected type."""
+    schema = schema or FILTER_SCHEMA
+    existing = client.get_collection(collection_name).payload_schema or {}
+    missing = {}
+    for field, index_type in schema.items():
+        info = existing.get(field)
+        if info is None or info.data_type != _PAYLOAD_INDEX_TYPES[index_type]:
+            missing[field] = index_type
+    return missing
+
+
+def ensure_payload_indexes(client: QdrantClient, collection_name: str,
+                           schema: Optional[Dict[str, str]] = None) -> List[str]:
+    """Create the payload indexes of the filter schema that do not exist yet. Returns the created fields."""
+    missing = missing_payload_indexes(client, collection_name, schema)
+    for field, index_type in missing.items():
+        client.create_payload_index(collection_name=collection_name, field_name=field,
+                                    field_schema=_PAYLOAD_INDEX_TYPES[index_type], wait=True)
+    return list(missing)
+
 class DocumentIndexer:
     """Create a Qdrant collection and index documents with embeddings."""
 
     def __init__(self, qdrant_url: str = os.getenv("QDRANT_URL", "http://localhost:6335"), collection_name: str = os.getenv("QDRANT_COLLECTION", "coach_mike")):
         self.client = QdrantClient(url=qdrant_url)
         self.collection_name = collection_name
+        self._enc = tiktoken.get_encoding("cl100k_base")
 
-    def create_collection(self, vector_size: int = 768) -> None:
-        """Recreate the collection with given vector size and cosine distance."""
+    def create_collection(self, vector_size: Optional[int] = None, embedding_model: str = EMBEDDING_MODEL) -> None:
+        """Recreate the collection with the vector size of `embedding_model` and cosine distance."""
+        # Dimension du registre EMBEDDING_MODELS ; une taille explicite doit lui correspondre
+        spec = get_embedding_spec(embedding_model)
+        if vector_size is not None and vector_size != spec.dim:
+            raise EmbeddingConfigError(f"vector_size={vector_size} incompatible avec {spec.name} ({spec.dim}d)")
+        vector_size = spec.dim
         # Supprimer la collection existante si elle existe
         if self.client.collection_exists(self.collection_name):
             print(f"Suppression de la collection existante '{self.collection_name}'...")
@@ -53,6 +93,9 @@ class DocumentIndexer:
                 max_indexing_threads=int(os.getenv("MAX_INDEXING_THREADS", "0"))
             )
         )
+        created = ensure_payload_indexes(self.client, self.collection_name)
+        print(f"Index de payload : {', '.join(created) or 'aucun'}")
+        record_collection_embedding(self.client, self.collection_name, spec)
         print(f"Collection '{self.collection_name}' creee avec succes !")
 
     def index_documents(self, documents: List[Dict], batch_size: int = 100) -> None:
@@ -116,6 +159,11 @@ class DocumentIndexer:
                 **meta,
             }
             
+            # Nombre de tokens calculé une seule fois à l'ingestion (lu par le générateur)
+            # SemanticChunker le fournit déjà via "chunk_size"
+            if payload.get("n_tokens") is None:
+                payload["n_tokens"] = meta.get("chunk_size") or len(self._enc.encode(payload["text"] or ""))
+
             # Optionnel : préserver des identifiants s'ils existent déjà
             if record.get("doc_id") or doc.get("doc_id"):
                 payload["doc_id"] = record.get("doc_id") or doc.get("doc_id")
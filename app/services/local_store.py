@@ -0,0 +1,216 @@
+from typing import Any, Dict, List, NamedTuple, Optional
+import os
+import json
+import time
+import numpy as np
+from dotenv import load_dotenv
+from app.services.rag_router import FilterSpec, freeze_filters
+
+load_dotenv()
+
+# Index vectoriel en mémoire, exporté depuis Qdrant : mode dégradé si Qdrant est indisponible,
+# et tests sans serveur. Le corpus (quelques centaines de refs + exercices) tient largement en RAM :
+# un produit matrice-vecteur sur la matrice normalisée est exact et prend moins d'une milliseconde.
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", os.path.join(".cache", "vector_snapshot"))
+SCROLL_BATCH = 256
+
+VECTORS_FILE = "vectors.npy"
+PAYLOADS_FILE = "payloads.jsonl"
+META_FILE = "meta.json"
+
+
+class LocalHit(NamedTuple):
+    """Same attributes as a Qdrant ScoredPoint (id, score, payload, vector)."""
+    id: Any
+    score: float
+    payload: Dict[str, Any]
+    vector: Any = None
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def dense_vector(vector) -> Optional[List[float]]:
+    # Collection avec vecteur sparse nommé : le dense (sans nom) est sous la clé ""
+    if isinstance(vector, dict):
+        vector = vector.get("")
+    return vector
+
+
+# --- FILTRES ---
+
+def _payload_values(payload: Dict[str, Any], key: str) -> List[Any]:
+    """Values at `key` (dotted path), arrays flattened, as Qdrant matches them."""
+    values = [payload]
+    for part in key.split("."):
+        next_values = []
+        for v in values:
+            if isinstance(v, dict) and part in v:
+                child = v[part]
+                next_values.extend(child if isinstance(child, list) else [child])
+        values = next_values
+    return values
+
+
+def _condition_matches(payload: Dict[str, Any], cond: Dict[str, Any]) -> bool:
+    values = _payload_values(payload, cond.get("key", ""))
+    match = cond.get("match", {})
+    if "value" in match:
+        return match["value"] in values
+    if "any" in match:
+        return any(v in values for v in match["any"])
+    return False
+
+
+def matches_filter(payload: Dict[str, Any], filters: Optional[Dict]) -> bool:
+    """
+    Evaluate a build_filters() dict the way Qdrant evaluates the equivalent Filter:
+    every `must`, at least one `should` (when present), no `must_not`.
+    """
+    if not filters:
+        return True
+    if not all(_condition_matches(payload, c) for c in filters.get("must", [])):
+        return False
+    should = filters.get("should", [])
+    if should and not any(_condition_matches(payload, c) for c in should):
+        return False
+    return not any(_condition_matches(payload, c) for c in filters.get("must_not", []))
+
+
+# --- INDEX ---
+
+class LocalVectorStore:
+    """
+    In-process replacement for the Qdrant collection: normalized float32 matrix (exact cosine search),
+    payload table and filter evaluation. retrieve() follows the HybridRetriever contract.
+    """
+
+    def __init__(self, ids: List[Any], vectors: np.ndarray, payloads: List[Dict[str, Any]],
+                 model=None, meta: Optional[Dict[str, Any]] = None):
+        if len(ids) != len(vectors) or len(ids) != len(payloads):
+            raise ValueError(f"Snapshot incohérent : {len(ids)} ids, {len(vectors)} vecteurs, {len(payloads)} payloads")
+        self.ids = ids
+        self.vectors = vectors
+        self.payloads = payloads
+        self.model = model
+        self.meta = meta or {}
+        # Masque par filtre : build_filters renvoie peu de combinaisons distinctes
+        self._masks: Dict[FilterSpec, np.ndarray] = {}
+        self._positions: Optional[Dict[Any, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, path: str = LOCAL_INDEX_PATH, model=None) -> "LocalVectorStore":
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        ids, payloads = [], []
+        with open(os.path.join(path, PAYLOADS_FILE), "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    ids.append(row["id"])
+                    payloads.append(row["payload"])
+        return cls(ids, vectors, payloads, model=model, meta=meta)
+
+    @staticmethod
+    def exists(path: str = LOCAL_INDEX_PATH) -> bool:
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    def _mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        key = freeze_filters(filters)
+        if key is None:
+            return None
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter((matches_filter(p, key) for p in self.payloads), dtype=bool, count=len(self.payloads))
+            self._masks[key] = mask
+        return mask
+
+    def search(self, query_vector, filters: Optional[Dict] = None, limit: int = 10) -> List[LocalHit]:
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.vectors @ query
+        mask = self._mask(filters)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            limit = min(limit, int(mask.sum()))
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [LocalHit(self.ids[i], float(scores[i]), self.payloads[i], self.vectors[i]) for i in top]
+
+    def get_payloads(self, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """Payloads by point id (ids absent from the snapshot are skipped)."""
+        if self._positions is None:
+            self._positions = {point_id: i for i, point_id in enumerate(self.ids)}
+        return {i: self.payloads[self._positions[i]] for i in ids if i in self._positions}
+
+    def retrieve(self, query: str, top_k: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        if self.model is None:
+            raise RuntimeError("LocalVectorStore.retrieve needs an embedding model (use search() with a vector)")
+        hits = self.search(self.model.encode(query), filters, top_k)
+        return [{
+            "id": h.id,
+            "text": h.payload.get("text", ""),
+            "score": h.score,
+            "payload": h.payload
+        } for h in hits]
+
+
+def export_snapshot(client, collection_name: str, path: str = LOCAL_INDEX_PATH,
+                    embedding_model: Optional[str] = None) -> int:
+    """Scroll the whole collection (payloads + dense vectors) into a snapshot directory. Returns the point count."""
+    ids, vectors, payloads = [], [], []
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name=collection_name, limit=SCROLL_BATCH, offset=offset,
+                                       with_payload=True, with_vectors=True)
+        for p in points:
+            vector = dense_vector(p.vector)
+            if vector is None:
+                continue
+            ids.append(p.id)
+            vectors.append(vector)
+            payloads.append(p.payload or {})
+        if offset is None:
+            break
+
+    if not ids:
+        raise ValueError(f"Collection '{collection_name}' vide ou sans vecteur dense : rien à exporter")
+    matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+    # Écriture dans un dossier temporaire puis bascule : un export interrompu ne casse pas le snapshot en place
+    tmp = f"{path}.tmp"
+    _remove_dir(tmp)
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, VECTORS_FILE), matrix)
+    with open(os.path.join(tmp, PAYLOADS_FILE), "w", encoding="utf-8") as f:
+        for point_id, payload in zip(ids, payloads):
+            f.write(json.dumps({"id": point_id, "payload": payload}, ensure_ascii=False) + "\n")
+    with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"collection": collection_name, "count": len(ids), "dim": int(matrix.shape[1]),
+                   "embedding_model": embedding_model, "exported_at": time.time()}, f, indent=2)
+
+    old = f"{path}.old"
+    _remove_dir(old)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    _remove_dir(old)
+    return len(ids)
+
+
+def _remove_dir(path: str):
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
@@ -0,0 +1,83 @@
+from typing import List, Dict, Optional
+
+# --- PROMPT PREFIX CACHING ---
+# Les fournisseurs (OpenAI) mettent en cache le plus long préfixe identique d'un appel à l'autre.
+# SYSTEM_PROMPT est donc une constante, octet pour octet identique à chaque appel :
+# toutes les parties variables (contexte programme, documents, question) vont à la FIN,
+# dans le message utilisateur. Ne jamais y interpoler de valeur dynamique.
+SYSTEM_PROMPT = """
+You are the **Training Data Generator**. Your ONLY function is to output a raw training schedule in a specific, machine-parsable format based on the retrieved documents.
+
+**CRITICAL PARSING RULES (Software Functionality):**
+
+1.  **NO CONVERSATION:** You MUST NOT include any conversational text, introduction ("Hello Champion"), greeting, disclaimer, or conclusion. Output ONLY the schedule structure.
+2.  **Day Header Syntax (Tabs):** You MUST use the double hash and space (`## `) to define each day. This is a functional token for the app's tab system.
+3.  **Exercise Syntax (Checklist):** You MUST use the exact checklist format (`- [ ] `) for every exercise line. This is the functional token for the checkbox UI.
+
+**Final Output Structure (Must be followed exactly):**
+
+## Day 1: [Focus Name]
+* Duration: [XX] min | Intensity: [Level]
+
+- [ ] [Exercise Name] | [Sets] sets x [Reps] reps | [Rest] sec
+  * Cue: [Brief technical cue]
+
+- [ ] [Exercise Name] | [Sets] sets x [Reps] reps | [Rest] sec
+  * Cue: [Brief technical cue]
+
+## Day 2: [Focus Name]
+* Duration: [XX] min | Intensity: [Level]
+... (Repeat for all scheduled days)
+
+**SOURCES:**
+Use only the information from the documents given in the user message (the "Context" section).
+Always cite your sources as (Document N).
+Provide a concise, actionable answer and list relevant exercises/programs.
+
+**CURRENT PROGRAM CONTEXT:**
+If the user message contains a "CURRENT PROGRAM CONTEXT" section, the user is looking at that specific training plan.
+Answer their question based on this plan. If they ask about technique, use your RAG knowledge (Qdrant) to explain the exercise listed in the plan.
+
+**STRUCTURED PLAN:**
+If the user message contains a "Structured plan (JSON)" section, render it. Keep the days, themes and references exactly as given.
+"""
+
+
+def format_documents(context: List[Dict]) -> str:
+    return "\n\n".join([
+        f"[Document {i+1}] {doc['payload'].get('title', '')} (ID: {doc['id']})\n" + doc['text']
+        for i, doc in enumerate(context)
+    ])
+
+
+def build_messages(query: str, context: List[Dict], context_text: Optional[str] = None) -> List[Dict]:
+    """Static system prefix first, then the variable parts: program context, documents, question."""
+    parts = []
+    if context_text:
+        parts.append(f"**CURRENT PROGRAM CONTEXT:**\n{context_text}")
+    parts.append(f"Context:\n{format_documents(context)}")
+    parts.append(f"Question: {query}")
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": "\n\n".join(parts)}
+    ]
+
+
+def build_plan_messages(plan_json: str) -> List[Dict]:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Structured plan (JSON):\n{plan_json}"}
+    ]
+
+
+def extract_usage(response) -> Dict[str, int]:
+    """Token usage of a chat completion, including the prompt tokens served from the provider prefix cache."""
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details else 0,
+    }
@@ -1,10 +1,97 @@
 # app/services/rag_router.py
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterator, Mapping, Optional, List
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Champs de payload filtrables -> type d'index Qdrant ("keyword" | "integer").
+# Source unique : build_filters ne filtre que sur ces clés, et les index de payload sont créés
+# au bootstrap de la collection (qdrant_ingest, DocumentIndexer) puis vérifiés au démarrage de l'API.
+FILTER_SCHEMA: Dict[str, str] = {
+    "domain": "keyword",
+    "type": "keyword",
+    "difficulty_level": "keyword",
+    "niveau": "keyword",
+    "equipment": "keyword",
+}
+
+# Clauses dont l'ordre des conditions n'a pas de sens (triées à la canonicalisation)
+FILTER_CLAUSES = ("must", "should", "must_not")
+
+
+class FilterSpec(Mapping):
+    """
+    Immutable, hashable filter spec (same shape as the dicts build_filters used to return).
+    Nested dicts become FilterSpec and lists become tuples; equal filters hash equal, so they can key
+    caches (compiled Qdrant Filter, counts, local-index masks).
+    """
+    __slots__ = ("_data", "_hash", "canonical")
+
+    def __init__(self, data: Mapping, canonical: bool = False):
+        self._data = {k: _freeze(v) for k, v in data.items()}
+        self._hash = hash(frozenset(self._data.items()))
+        self.canonical = canonical  # produit par freeze_filters
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Mutable, JSON-serializable copy."""
+        return _thaw(self)
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return FilterSpec(value)
+    if isinstance(value, Mapping) and not isinstance(value, FilterSpec):
+        return FilterSpec(value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def freeze_filters(filters: Optional[Mapping]) -> Optional[FilterSpec]:
+    """
+    Canonical FilterSpec of a filter dict: conditions of must/should/must_not sorted, empty clauses dropped.
+    Two filters with the same conditions in a different order give the same (hashable) spec.
+    """
+    if not filters:
+        return None
+    if isinstance(filters, FilterSpec) and filters.canonical:
+        return filters
+    canonical = {}
+    for key, value in filters.items():
+        if key in FILTER_CLAUSES:
+            if not value:
+                continue
+            # Ordre par hash : stable dans le process, suffit pour que deux filtres équivalents soient égaux
+            value = sorted((_freeze(c) for c in value), key=hash)
+        canonical[key] = value
+    return FilterSpec(canonical, canonical=True) if canonical else None
+
+
 # --- TASK 3: SIMPLIFICATION ---
 # Suppression de tous les dictionnaires géants (TAXONOMY_*, USER_KEYWORDS_*)
 # Suppression des fonctions de mapping complexes  (_map_intent_*, _normalize_*, etc.)
@@ -26,40 +113,23 @@ def build_filters(
     stage: str, 
     profile: Optional[Dict[str, Any]] = None, 
     extra: Optional[Dict[str, Any]] = None
-) -> Optional[Dict[str, Any]]:
+) -> Optional[FilterSpec]:
     """
     Construit des filtres simplifiés pour Qdrant.
     Priorise la sécurité (Niveau) et le domaine, laisse le reste à la sémantique.
+    Retourne un FilterSpec canonique (immuable, hashable) ou None.
     """
     profile = profile or {}
     extra = extra or {}
-    
-    # Structure de filtre compatible avec le nouveau retriever (Pre-filtering)
-    # On retourne un dictionnaire qui sera converti en Filter Qdrant
-    f = {
-        "must": [],
-        "should": [],
-        "must_not": []
-    }
 
     # 1. Filtre de Domaine (Program vs Exercice)
     # Si la query demande explicitement un programme
     query = extra.get("query", "").lower()
     is_program_request = any(kw in query for kw in ["programme", "plan", "semaine", "planning"])
-    
-    if is_program_request:
-        f["must"].append({"key": "domain", "match": {"value": "program"}})
 
     # 2. Sécurité Niveau (Hard Filter)
-    # On empêche un débutant de voir du contenu expert, mais c'est tout.
     niveau_val = profile.get("level") or profile.get("niveau") or profile.get("niveau_sportif")
-    if niveau_val:
-        niveau_norm = _normalize_niveau(str(niveau_val))
-        if niveau_norm == "Débutant":
-            f["must_not"].append({"key": "difficulty_level", "match": {"value": "Expert"}})
-            f["must_not"].append({"key": "difficulty_level", "match": {"value": "Avancé"}})
-            # Boost sémantique (Should)
-            f["should"].append({"key": "difficulty_level", "match": {"value": "Débutant"}})
+    is_beginner = bool(niveau_val) and _normalize_niveau(str(niveau_val)) == "Débutant"
 
     # 3. Matériel (Hard Filter - Optionnel mais recommandé)
     # On garde une logique simple : si equipment spécifié, on l'utilise en filtre permissif
@@ -71,10 +141,28 @@ def build_filters(
             # gérer la pertinence sauf si on veut être strict.
             pass
 
-    # Nettoyage si listes vides
-    final_filter = {}
-    if f["must"]: final_filter["must"] = f["must"]
-    if f["should"]: final_filter["should"] = f["should"]
-    if f["must_not"]: final_filter["must_not"] = f["must_not"]
+    return _filter_spec(is_program_request, is_beginner)
+
+
+@lru_cache(maxsize=None)
+def _filter_spec(is_program_request: bool, is_beginner: bool) -> Optional[FilterSpec]:
+    """Spec for each combination of decisions, built and frozen once (the same object is returned every time)."""
+    # Structure de filtre compatible avec le nouveau retriever (Pre-filtering)
+    # On retourne un dictionnaire qui sera converti en Filter Qdrant
+    f = {
+        "must": [],
+        "should": [],
+        "must_not": []
+    }
+
+    if is_program_request:
+        f["must"].append({"key": "domain", "match": {"value": "program"}})
+
+    # On empêche un débutant de voir du contenu expert, mais c'est tout.
+    if is_beginner:
+        f["must_not"].append({"key": "difficulty_level", "match": {"value": "Expert"}})
+        f["must_not"].append({"key": "difficulty_level", "match": {"value": "Avancé"}})
+        # Boost sémantique (Should)
+        f["should"].append({"key": "difficulty_level", "match": {"value": "Débutant"}})
 
-    return final_filter if final_filter else None
+    return freeze_filters(f)
@@ -0,0 +1,147 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import os
+import time
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Scores (hash de la requête, id du doc, hash du texte) gardés en mémoire (LRU)
+RERANK_CACHE_MAX = int(os.getenv("RERANK_CACHE_MAX", "4096"))
+# Micro-batching : les paires des requêtes concurrentes partent dans un seul predict()
+RERANK_MAX_BATCH = int(os.getenv("RERANK_MAX_BATCH", "64"))
+RERANK_BATCH_WAIT_MS = float(os.getenv("RERANK_BATCH_WAIT_MS", "5"))
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()[:32]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class _Pending:
+    """Pairs of one caller, waiting for the batching thread."""
+
+    def __init__(self, pairs: List[List[str]]):
+        self.pairs = pairs
+        self.scores: Optional[List[float]] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class RerankService:
+    """
+    Cross-encoder scoring shared by all requests.
+    - The model is loaded (and warmed up) in the constructor, i.e. at API startup, not on the first request
+    - Scores are cached by (query hash, doc id, text hash): a repeated query only scores the new
+      candidates, and a doc re-ingested under the same id with new text is scored again
+    - Callers block on their own pairs while a background thread groups the pairs of concurrent
+      requests (up to RERANK_MAX_BATCH, waiting at most RERANK_BATCH_WAIT_MS) into one predict() call
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, cache_max: int = RERANK_CACHE_MAX,
+                 max_batch: int = RERANK_MAX_BATCH, batch_wait_ms: float = RERANK_BATCH_WAIT_MS, model=None):
+        self.model_name = model_name
+        if model is None:
+            # Import paresseux : avec ENABLE_RERANK=false, l'API ne charge pas torch pour le reranker
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name)
+        self.model = model
+        self.cache_max = cache_max
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000.0
+        self._cache: "OrderedDict[Tuple[str, Any, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.scored_pairs = 0
+        # Premier predict() à froid (allocations, threads torch) payé ici plutôt que par un utilisateur
+        self.model.predict([["warmup", "warmup"]])
+        self._worker = threading.Thread(target=self._run, name="rerank-batcher", daemon=True)
+        self._worker.start()
+
+    def score(self, query: str, docs: Sequence[Tuple[Any, str]]) -> Dict[Any, float]:
+        """Cross-encoder score of each (doc_id, text) for `query`, as {doc_id: score}."""
+        qh = query_hash(query)
+        scores: Dict[Any, float] = {}
+        missing: Dict[Any, Tuple[str, str]] = {}
+        with self._lock:
+            for doc_id, text in docs:
+                th = text_hash(text)
+                key = (qh, doc_id, th)
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[doc_id] = self._cache[key]
+                    self.hits += 1
+                else:
+                    missing[doc_id] = (text, th)
+            self.misses += len(missing)
+
+        if missing:
+            pending = _Pending([[query, text] for text, _ in missing.values()])
+            self._queue.put(pending)
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            with self._lock:
+                for (doc_id, (_, th)), value in zip(missing.items(), pending.scores):
+                    scores[doc_id] = value
+                    self._cache[(qh, doc_id, th)] = value
+                while len(self._cache) > self.cache_max:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def _collect(self) -> List[_Pending]:
+        batch = [self._queue.get()]
+        n_pairs = len(batch[0].pairs)
+        deadline = time.monotonic() + self.batch_wait
+        while n_pairs < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_pairs += len(item.pairs)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            pairs = [pair for item in batch for pair in item.pairs]
+            try:
+                values = [float(v) for v in self.model.predict(pairs, batch_size=max(self.max_batch, 1))]
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+                    item.done.set()
+                continue
+            self.batches += 1
+            self.scored_pairs += len(pairs)
+            offset = 0
+            for item in batch:
+                item.scores = values[offset:offset + len(item.pairs)]
+                offset += len(item.pairs)
+                item.done.set()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "batches": self.batches,
+            "avg_batch_pairs": round(self.scored_pairs / self.batches, 2) if self.batches else 0.0,
+        }
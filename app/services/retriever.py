@@ -1,16 +1,151 @@
-from typing import List, Tuple, Dict, Optional
+from typing import Any, List, Mapping, NamedTuple, Tuple, Dict, Optional, Sequence, Union
 import os
+import time
+import threading
+from functools import lru_cache
+import numpy as np
+import httpx
 from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchAny, MatchValue, SearchParams
-from sentence_transformers import SentenceTransformer, CrossEncoder
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.models import (
+    Filter, FieldCondition, MatchAny, MatchValue, SearchParams,
+    Prefetch, FusionQuery, Fusion, SparseVector
+)
 from dotenv import load_dotenv
+from app.services.embeddings import (
+    load_embedding_model, get_embedding_spec, validate_collection_embedding, embedding_mismatches,
+    EmbeddingConfigError, EMBEDDING_MODEL
+)
+from app.services.sparse_encoder import SparseEncoder, SPARSE_VOCAB_PATH, SPARSE_VECTOR_NAME
+from app.services.local_store import LocalVectorStore, dense_vector
+from app.services.reranker import RerankService
+from app.services.rag_router import FilterSpec, freeze_filters
 
 load_dotenv()
 
 # --- TASK 2: SUPPRESSION BM25 LOCAL ---
 # Suppression des imports pickle, rank_bm25 et constantes associées
 ENABLE_RERANK = os.getenv("ENABLE_RERANK", "false").lower() == "true"
-RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# Recherche hybride : dense + sparse (BM25) fusionnés par RRF dans une seule requête Qdrant
+ENABLE_HYBRID = os.getenv("ENABLE_HYBRID", "true").lower() == "true"
+# Chaque branche (dense, sparse) remonte top_k * N candidats avant la fusion
+HYBRID_PREFETCH_MULTIPLIER = int(os.getenv("HYBRID_PREFETCH_MULTIPLIER", "3"))
+
+# Projection du payload : seuls les champs lus par le generator (texte, titre, n_tokens, sources)
+# sont renvoyés par Qdrant. Le reste (structured, variables...) s'obtient via hydrate().
+# "*" = payload complet.
+RETRIEVAL_PAYLOAD_FIELDS = [
+    f.strip() for f in os.getenv("RETRIEVAL_PAYLOAD_FIELDS", "text,title,n_tokens,source,page,type,domain").split(",")
+    if f.strip()
+]
+
+# --- POLITIQUE DE RECHERCHE ADAPTATIVE ---
+# Cardinalité du filtre estimée par count() Qdrant (mis en cache), puis :
+# - peu de points filtrés : recherche exacte (pas de HNSW, rappel parfait, coût faible)
+# - filtre sélectif : ef élevé (le graphe HNSW filtré se parcourt mal, il faut explorer plus)
+# - sinon : ef bas (requêtes larges, latence minimale)
+SEARCH_EXACT_MAX = int(os.getenv("SEARCH_EXACT_MAX", "2000"))
+SEARCH_SELECTIVE_RATIO = float(os.getenv("SEARCH_SELECTIVE_RATIO", "0.1"))
+HNSW_EF_LOW = int(os.getenv("HNSW_EF_LOW", "64"))
+HNSW_EF_HIGH = int(os.getenv("HNSW_EF_HIGH", "256"))
+FILTER_COUNT_TTL = int(os.getenv("FILTER_COUNT_TTL", "300"))
+# Candidats supplémentaires remontés seulement si le cross-encoder reclasse ensuite
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "3"))
+
+# MMR (maximal marginal relevance) : parmi top_k * MMR_FETCH_MULTIPLIER candidats, garde top_k documents
+# pertinents mais peu redondants (micro-cycles quasi identiques) pour mieux remplir MAX_CONTEXT_TOKENS.
+# MMR_LAMBDA = 1 : pertinence seule ; 0 : diversité seule.
+ENABLE_MMR = os.getenv("ENABLE_MMR", "false").lower() == "true"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+MMR_FETCH_MULTIPLIER = int(os.getenv("MMR_FETCH_MULTIPLIER", "3"))
+
+# Qdrant injoignable (réseau, timeout) : seules ces erreurs, et les 5xx, basculent sur le snapshot local.
+# Un filtre invalide (400) ou un bug dans le plan de recherche remonte tel quel.
+QDRANT_CONNECTION_ERRORS = (ResponseHandlingException, httpx.TransportError, ConnectionError, TimeoutError)
+
+
+def is_qdrant_unavailable(error: BaseException) -> bool:
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code is not None and error.status_code >= 500
+    return isinstance(error, QDRANT_CONNECTION_ERRORS)
+
+
+def mmr_select(relevance: Sequence[float], vectors: np.ndarray, k: int, lambda_: float = MMR_LAMBDA) -> List[int]:
+    """
+    Greedy MMR. Returns the indices of the k selected candidates, in selection order.
+    Relevance is min-max normalised (RRF, cosine and cross-encoder scores live on different scales)
+    so that it is comparable with the cosine similarity between candidates.
+    """
+    rel = np.asarray(relevance, dtype=np.float32)
+    n = len(rel)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    spread = rel.max() - rel.min()
+    rel = (rel - rel.min()) / spread if spread > 0 else np.ones(n, dtype=np.float32)
+
+    vecs = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vecs = vecs / norms
+    sim = vecs @ vecs.T
+
+    selected = [int(np.argmax(rel))]
+    chosen = np.zeros(n, dtype=bool)
+    chosen[selected[0]] = True
+    max_sim = sim[selected[0]].copy()  # similarité max de chaque candidat avec la sélection
+    while len(selected) < k:
+        scores = lambda_ * rel - (1 - lambda_) * max_sim
+        scores[chosen] = -np.inf
+        i = int(np.argmax(scores))
+        selected.append(i)
+        chosen[i] = True
+        np.maximum(max_sim, sim[i], out=max_sim)
+    return selected
+
+
+def _min_max(values: Sequence[float]) -> List[float]:
+    lo, hi = min(values), max(values)
+    if hi == lo:
+        return [1.0] * len(values)
+    return [(v - lo) / (hi - lo) for v in values]
+
+
+class SearchPlan(NamedTuple):
+    strategy: str  # "exact" | "hnsw_low_ef" | "hnsw_high_ef"
+    params: SearchParams
+    limit: int
+    estimate: int
+    total: int
+
+
+@lru_cache(maxsize=256)
+def compile_filter(spec: Optional[FilterSpec]) -> Optional[Filter]:
+    """
+    Build the Qdrant Filter of a canonical FilterSpec. Memoized: build_filters only produces a handful
+    of distinct specs (levels x program flag), so the Filter/FieldCondition objects are built once and
+    shared by all requests (they are never mutated).
+    """
+    if not spec:
+        return None
+
+    def conditions(clause: str) -> Optional[List[FieldCondition]]:
+        out = []
+        for cond in spec.get(clause, ()):
+            key = cond.get("key")
+            match = cond.get("match", {})
+            if "value" in match:
+                out.append(FieldCondition(key=key, match=MatchValue(value=match["value"])))
+            elif "any" in match:
+                out.append(FieldCondition(key=key, match=MatchAny(any=list(match["any"]))))
+        return out or None
+
+    must, should, must_not = conditions("must"), conditions("should"), conditions("must_not")
+    if not must and not should and not must_not:
+        return None
+    return Filter(must=must, should=should, must_not=must_not)
+
 
 class HybridRetriever:
     """
@@ -18,112 +153,265 @@ class HybridRetriever:
     Fully Stateless.
     """
 
-    def __init__(self, qdrant_client: QdrantClient, collection_name: str, embedding_model: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")):
+    def __init__(self, qdrant_client: QdrantClient, collection_name: str, embedding_model: str = EMBEDDING_MODEL,
+                 local_store: Optional[LocalVectorStore] = None, payload_fields: Optional[Sequence[str]] = None,
+                 reranker: Optional[RerankService] = None, mmr: Optional[bool] = None):
         self.qdrant = qdrant_client
+        self.payload_fields = list(payload_fields or RETRIEVAL_PAYLOAD_FIELDS)
+        # Index en mémoire (snapshot exporté de Qdrant) : sert les requêtes pendant une panne Qdrant
+        self.local_store = local_store
         self.collection_name = collection_name
-        self.model = SentenceTransformer(embedding_model)
-        self._reranker = None
+        # Dimension / normalisation du modèle : registre EMBEDDING_MODELS
+        self.embedding_spec = get_embedding_spec(embedding_model)
+        # Backend choisi par EMBEDDING_BACKEND (torch | quantized | onnx)
+        self.model = load_embedding_model(embedding_model)
+        # Modèle, collection et snapshot vérifiés avant de servir : une incohérence lève EmbeddingConfigError
+        self._check_embedding_config()
+        # Cross-encoder chargé ici (démarrage de l'API) et partagé : cache + micro-batching entre requêtes
+        self.reranker = reranker or (RerankService() if ENABLE_RERANK else None)
+        self.mmr = ENABLE_MMR if mmr is None else mmr
+        # Vocabulaire/IDF écrits à l'ingestion ; absent => recherche dense seule
+        self.sparse_encoder = SparseEncoder.load(SPARSE_VOCAB_PATH) if ENABLE_HYBRID else None
+        if ENABLE_HYBRID and self.sparse_encoder is None:
+            print(f"⚠️ Sparse vocabulary not found ({SPARSE_VOCAB_PATH}): dense-only search")
+        if self.sparse_encoder is not None and not self._has_sparse_vectors():
+            print(f"⚠️ Collection '{collection_name}' has no '{SPARSE_VECTOR_NAME}' vectors: dense-only search")
+            self.sparse_encoder = None
+        # Cardinalités par filtre : {clé du filtre: (count, timestamp)}
+        self._counts: Dict[Optional[FilterSpec], Tuple[int, float]] = {}
+        # Dernière stratégie loguée par filtre : pas de print par requête, seulement aux changements
+        self._strategies: Dict[Optional[FilterSpec], str] = {}
+        self._counts_lock = threading.Lock()
+
+    def _check_embedding_config(self):
+        spec = self.embedding_spec
+        try:
+            recorded = validate_collection_embedding(self.qdrant, self.collection_name, spec, self.model)
+        except EmbeddingConfigError:
+            raise
+        except Exception as e:
+            # Qdrant indisponible au démarrage : le snapshot local (vérifié ci-dessous) sert en mode dégradé
+            print(f"⚠️ Embedding config not checked against Qdrant ({e})")
+        else:
+            if recorded is None:
+                print(f"⚠️ No embedding metadata for '{self.collection_name}' (ingested before the model registry): "
+                      f"dimension checked only")
+        if self.local_store is not None:
+            problems = embedding_mismatches(self.local_store.meta, spec)
+            if problems:
+                raise EmbeddingConfigError(f"Snapshot local incompatible avec {spec.name} : {'; '.join(problems)} "
+                                           f"(relancer scripts/export_vector_snapshot.py)")
+
+    def _has_sparse_vectors(self) -> bool:
+        try:
+            sparse = self.qdrant.get_collection(self.collection_name).config.params.sparse_vectors or {}
+        except Exception:
+            return True  # Qdrant indisponible au démarrage : on garde l'hybride, repli dense par requête
+        return SPARSE_VECTOR_NAME in sparse
+
+    @staticmethod
+    def _with_payload(fields: Optional[Sequence[str]]) -> Union[bool, List[str]]:
+        if fields is None or "*" in fields:
+            return True
+        return list(fields)
 
-    def _get_reranker(self):
-        if ENABLE_RERANK and self._reranker is None:
-            self._reranker = CrossEncoder(RERANK_MODEL)
-        return self._reranker
+    def _project(self, payload: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+        """Local index fallback: same projection as the one Qdrant applies."""
+        with_payload = self._with_payload(fields)
+        if with_payload is True:
+            return payload
+        return {k: payload[k] for k in with_payload if k in payload}
 
     def _embed(self, query: str) -> List[float]:
         return self.model.encode(query).tolist()
 
     # --- TASK 4: PRE-FILTERING ---
     def _build_filter(self, filters: Optional[Dict]) -> Optional[Filter]:
-        """Build Qdrant native Filter object from simplified dictionary."""
-        if not filters:
-            return None
-        
-        q_must = []
-        q_should = []
-        q_must_not = []
-
-        # Helper pour traiter une condition
-        def process_conditions(cond_list, target_list):
-            for cond in cond_list:
-                key = cond.get("key")
-                match = cond.get("match", {})
-                if "value" in match:
-                    target_list.append(FieldCondition(key=key, match=MatchValue(value=match["value"])))
-                elif "any" in match:
-                    target_list.append(FieldCondition(key=key, match=MatchAny(any=match["any"])))
-
-        if "must" in filters: process_conditions(filters["must"], q_must)
-        if "should" in filters: process_conditions(filters["should"], q_should)
-        if "must_not" in filters: process_conditions(filters["must_not"], q_must_not)
-
-        if not q_must and not q_should and not q_must_not:
-            return None
-
-        return Filter(must=q_must if q_must else None, 
-                      should=q_should if q_should else None, 
-                      must_not=q_must_not if q_must_not else None)
-
-    def retrieve(self, query: str, top_k: int = 10, filters: Optional[Dict] = None) -> List[Dict]:
+        """Qdrant native Filter for a build_filters() spec (or plain dict), compiled once per distinct filter."""
+        return compile_filter(freeze_filters(filters)) if filters else None
+
+    def _count(self, filters: Optional[FilterSpec], qdrant_filter: Optional[Filter]) -> int:
+        """Approximate number of points matching the filter, cached FILTER_COUNT_TTL seconds."""
+        key = filters or None
+        now = time.monotonic()
+        with self._counts_lock:
+            cached = self._counts.get(key)
+        if cached and now - cached[1] < FILTER_COUNT_TTL:
+            return cached[0]
+        count = self.qdrant.count(collection_name=self.collection_name, count_filter=qdrant_filter, exact=False).count
+        with self._counts_lock:
+            self._counts[key] = (count, now)
+        return count
+
+    def _plan_search(self, filters: Optional[FilterSpec], qdrant_filter: Optional[Filter], top_k: int) -> SearchPlan:
+        total = self._count(None, None)
+        estimate = self._count(filters, qdrant_filter) if qdrant_filter else total
+        if estimate <= SEARCH_EXACT_MAX:
+            strategy, params = "exact", SearchParams(exact=True)
+        elif total and estimate / total < SEARCH_SELECTIVE_RATIO:
+            strategy, params = "hnsw_high_ef", SearchParams(hnsw_ef=HNSW_EF_HIGH)
+        else:
+            strategy, params = "hnsw_low_ef", SearchParams(hnsw_ef=HNSW_EF_LOW)
+        return SearchPlan(strategy, params, self._fetch_limit(top_k), estimate, total)
+
+    def _log_strategy(self, filters: Optional[FilterSpec], plan: SearchPlan):
+        """Print the strategy of a filter the first time it is planned and whenever it changes."""
+        key = filters or None
+        with self._counts_lock:
+            if self._strategies.get(key) == plan.strategy:
+                return
+            self._strategies[key] = plan.strategy
+        print(f"🔎 Search strategy: {plan.strategy} (filtered ≈ {plan.estimate}/{plan.total} points, limit={plan.limit})")
+
+    def _fetch_limit(self, top_k: int) -> int:
+        """Candidates to fetch: more than top_k only when a later stage (rerank, MMR) selects among them."""
+        limit = top_k
+        if self.reranker is not None:
+            limit = max(limit, top_k * RERANK_OVERFETCH)
+        if self.mmr:
+            limit = max(limit, top_k * MMR_FETCH_MULTIPLIER)
+        return limit
+
+    def _search(self, query: str, query_vector: List[float], qdrant_filter: Optional[Filter], limit: int,
+                with_payload: Union[bool, List[str]] = True, search_params: Optional[SearchParams] = None,
+                with_vectors: bool = False):
+        """Dense + sparse prefetches fused by RRF, or dense only when no sparse query can be built."""
+        indices, values = self.sparse_encoder.encode_query(query) if self.sparse_encoder else ([], [])
+        if indices:
+            prefetch_limit = limit * HYBRID_PREFETCH_MULTIPLIER
+            try:
+                response = self.qdrant.query_points(
+                    collection_name=self.collection_name,
+                    prefetch=[
+                        Prefetch(query=query_vector, filter=qdrant_filter, limit=prefetch_limit,
+                                 params=search_params),
+                        Prefetch(query=SparseVector(indices=indices, values=values), using=SPARSE_VECTOR_NAME,
+                                 filter=qdrant_filter, limit=prefetch_limit),
+                    ],
+                    query=FusionQuery(fusion=Fusion.RRF),
+                    query_filter=qdrant_filter,
+                    limit=limit,
+                    with_payload=with_payload,
+                    with_vectors=with_vectors
+                )
+                return response.points
+            except Exception as e:
+                # Repli dense pour cette requête seulement : une erreur passagère (timeout) ne coupe pas
+                # l'hybride jusqu'au redémarrage. Collection sans vecteurs sparse : détectée au démarrage.
+                results = self._dense_search(query_vector, qdrant_filter, limit, with_payload, search_params, with_vectors)
+                print(f"⚠️ Hybrid query failed ({e}), dense-only search for this request")
+                return results
+
+        return self._dense_search(query_vector, qdrant_filter, limit, with_payload, search_params, with_vectors)
+
+    def _dense_search(self, query_vector: List[float], qdrant_filter: Optional[Filter], limit: int,
+                      with_payload: Union[bool, List[str]] = True, search_params: Optional[SearchParams] = None,
+                      with_vectors: bool = False):
+        return self.qdrant.search(
+            collection_name=self.collection_name,
+            query_vector=query_vector,
+            query_filter=qdrant_filter, # PRE-FILTERING: Filtrage côté DB
+            limit=limit,
+            with_payload=with_payload,
+            with_vectors=with_vectors,
+            search_params=search_params or SearchParams(hnsw_ef=128)
+        )
+
+    def retrieve(self, query: str, top_k: int = 10, filters: Optional[Mapping] = None,
+                 payload_fields: Optional[Sequence[str]] = None) -> List[Dict]:
         """
-        Retrieve documents using Qdrant Search with Pre-Filtering.
+        Retrieve documents using Qdrant Hybrid Search (dense + BM25 sparse, RRF) with Pre-Filtering.
+        Only `payload_fields` (default: RETRIEVAL_PAYLOAD_FIELDS, "*" for everything) are fetched;
+        use hydrate() for the other fields.
         """
         query_vector = self._embed(query)
+        filters = freeze_filters(filters)
         qdrant_filter = self._build_filter(filters)
+        fields = payload_fields or self.payload_fields
+        with_payload = self._with_payload(fields)
 
         # --- TASK 2 & 4: HYBRID SEARCH NATIVE & PRE-FILTERING ---
-        # Note: Pour l'instant, nous utilisons la recherche Dense pure avec filtre.
-        # Si des vecteurs sparse sont ajoutés plus tard, on passera à search_batch ou hybrid.
-        # Ici on simplifie pour le MVP2 robuste : Dense + Filter natif (très rapide).
-        
-        results = self.qdrant.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,
-            query_filter=qdrant_filter, # PRE-FILTERING: Filtrage côté DB
-            limit=top_k,
-            with_payload=True,
-            search_params=SearchParams(hnsw_ef=128)
-        )
+        # Les deux branches sont filtrées côté DB puis fusionnées par Qdrant (reciprocal rank fusion) :
+        # les noms exacts d'exercices et les termes techniques FR remontent même si l'embedding les rate.
+        try:
+            plan = self._plan_search(filters, qdrant_filter, top_k)
+            self._log_strategy(filters, plan)
+            results = self._search(query, query_vector, qdrant_filter, plan.limit, with_payload, plan.params,
+                                   with_vectors=self.mmr)
+        except Exception as e:
+            if self.local_store is None or not is_qdrant_unavailable(e):
+                raise
+            # Mode dégradé : recherche dense exacte sur le snapshot local, mêmes filtres
+            print(f"⚠️ Qdrant unavailable ({e}), serving from local index ({len(self.local_store)} docs)")
+            results = [h._replace(payload=self._project(h.payload, fields))
+                       for h in self.local_store.search(query_vector, filters, self._fetch_limit(top_k))]
 
         # Reranking optionnel (reste en Python mais sur moins de docs grâce au pre-filtering)
-        if ENABLE_RERANK and results:
+        if self.reranker is not None and results:
             # Conversion format simple pour reranker
             candidates = [(r.id, r.score, r.payload.get("text", "")) for r in results]
             reranked = self._cross_encode_rerank(query, candidates)
             
-            # Reconstruit la liste finale
-            final_docs = []
-            for doc_id, score, text in reranked:
-                # Retrouver le payload original (optimisation possible: map)
-                original = next((r for r in results if r.id == doc_id), None)
-                if original:
-                    final_docs.append({
-                        "id": doc_id,
-                        "text": text,
-                        "score": score,
-                        "payload": original.payload
-                    })
-            return final_docs
-        
-        # Format de sortie standard sans rerank
-        return [{
-            "id": r.id,
-            "text": r.payload.get("text", ""),
-            "score": r.score,
-            "payload": r.payload
-        } for r in results]
+            # Reconstruit la liste finale (payload original retrouvé par id)
+            by_id = {r.id: r for r in results}
+            docs = [{
+                "id": doc_id,
+                "text": text,
+                "score": score,
+                "payload": by_id[doc_id].payload
+            } for doc_id, score, text in reranked]
+        else:
+            # Format de sortie standard sans rerank
+            docs = [{
+                "id": r.id,
+                "text": r.payload.get("text", ""),
+                "score": r.score,
+                "payload": r.payload
+            } for r in results]
+
+        if self.mmr and len(docs) > top_k:
+            docs = self._diversify(docs, results, top_k)
+        return docs[:top_k]
+
+    def _diversify(self, docs: List[Dict], results, top_k: int) -> List[Dict]:
+        """MMR over the final scores, with the dense vectors returned by the search."""
+        vectors = {r.id: dense_vector(r.vector) for r in results}
+        if any(vectors.get(d["id"]) is None for d in docs):
+            return docs  # vecteurs non renvoyés : pas de sélection possible
+        selected = mmr_select([d["score"] for d in docs], np.array([vectors[d["id"]] for d in docs]), top_k)
+        return [docs[i] for i in selected]
+
+    def hydrate(self, docs: List[Dict], fields: Optional[Sequence[str]] = None) -> List[Dict]:
+        """
+        Second stage: fetch more payload fields (all of them if `fields` is None) for documents
+        returned by retrieve(), in a single call. Fields already present on a document are kept.
+        """
+        if not docs:
+            return docs
+        ids = [d["id"] for d in docs]
+        try:
+            records = self.qdrant.retrieve(collection_name=self.collection_name, ids=ids,
+                                           with_payload=self._with_payload(fields), with_vectors=False)
+            payloads = {r.id: r.payload or {} for r in records}
+        except Exception as e:
+            if self.local_store is None or not is_qdrant_unavailable(e):
+                raise
+            payloads = {i: self._project(p, fields) for i, p in self.local_store.get_payloads(ids).items()}
+        for d in docs:
+            d["payload"] = {**payloads.get(d["id"], {}), **d.get("payload", {})}
+        return docs
 
     def _cross_encode_rerank(self, query: str, candidates: List[Tuple]) -> List[Tuple]:
-        reranker = self._get_reranker()
-        if not reranker:
+        if self.reranker is None:
             return [(c[0], c[1], c[2]) for c in candidates]
         
-        pairs = [[query, c[2]] for c in candidates]
-        scores = reranker.predict(pairs)
-        
-        # Combine scores (0.7 rerank + 0.3 original dense)
-        final_results = []
-        for i, (doc_id, dense_score, text) in enumerate(candidates):
-            final_score = 0.7 * scores[i] + 0.3 * dense_score
-            final_results.append((doc_id, final_score, text))
-            
+        scores = self.reranker.score(query, [(c[0], c[2]) for c in candidates])
+
+        # Combine scores (0.7 rerank + 0.3 retrieval). Le score de retrieval est un score RRF (~0.01-0.03)
+        # en hybride, un cosinus en dense, et le cross-encoder renvoie des logits : les deux sont ramenés
+        # à [0, 1] (min-max sur les candidats) avant le mélange.
+        rerank = _min_max([scores[c[0]] for c in candidates])
+        retrieval = _min_max([c[1] for c in candidates])
+        final_results = [(doc_id, 0.7 * r + 0.3 * o, text)
+                         for (doc_id, _, text), r, o in zip(candidates, rerank, retrieval)]
         return sorted(final_results, key=lambda x: x[1], reverse=True)
\ No newline at end of file
@@ -0,0 +1,121 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import os
+import re
+import json
+import math
+import zlib
+import unicodedata
+from collections import Counter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Vocabulaire + table IDF écrits par scripts/qdrant_ingest.py, relus par le retriever au démarrage
+SPARSE_VOCAB_PATH = os.getenv("SPARSE_VOCAB_PATH", os.path.join("data", "processed", "sparse_vocab.json"))
+# Nom du vecteur sparse dans la collection Qdrant (cf. recreate_collection)
+SPARSE_VECTOR_NAME = "sparse"
+# v1 : indice = position dans le vocabulaire trié (décalé par tout ajout/retrait de terme)
+# v2 : indice = crc32 du terme, stable d'une ingestion à l'autre
+SPARSE_VOCAB_VERSION = 2
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Mots vides FR (+ quelques EN) : sans poids lexical, ils ne feraient que bruiter le score
+STOPWORDS = frozenset("""
+a au aux avec ce ces dans de des du elle en et eux il je la le les leur lui ma mais me meme mes moi mon ne nos
+notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous c d j l m n
+s t y est sont etre avoir fait faire sans sous entre chaque plus tres
+the of and or to in on for with is are be an at by
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-folded word tokens ("Séance" and "seance" match), stopwords removed."""
+    folded = unicodedata.normalize("NFKD", (text or "").lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return [t for t in _TOKEN_RE.findall(folded) if t not in STOPWORDS]
+
+
+def term_id(term: str) -> int:
+    """Sparse dimension of a term: 32-bit hash, independent of the vocabulary it was fitted with."""
+    return zlib.crc32(term.encode("utf-8"))
+
+
+class SparseEncoder:
+    """
+    BM25 sparse vectors for Qdrant.
+    Document vectors carry the full BM25 term weight (IDF x saturated, length-normalised TF) and query
+    vectors are binary, so the sparse dot product computed by Qdrant is the BM25 score of the document.
+    Dimensions are term hashes (term_id): a re-ingest that changes the vocabulary does not shift the
+    indices of the other terms, so an API holding an older vocabulary still queries the right dimensions.
+    """
+
+    def __init__(self, vocab: List[str], idf: List[float], avgdl: float, n_docs: int,
+                 k1: float = BM25_K1, b: float = BM25_B):
+        self.vocab = vocab
+        self.idf = idf
+        self.avgdl = avgdl or 1.0
+        self.n_docs = n_docs
+        self.k1 = k1
+        self.b = b
+        self._idf: Dict[str, float] = dict(zip(vocab, idf))
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    @classmethod
+    def fit(cls, texts: Iterable[str], k1: float = BM25_K1, b: float = BM25_B) -> "SparseEncoder":
+        df: Counter = Counter()
+        n_docs, total_len = 0, 0
+        for text in texts:
+            tokens = tokenize(text)
+            df.update(set(tokens))
+            n_docs += 1
+            total_len += len(tokens)
+        vocab = sorted(df)
+        # IDF BM25 "+1" : toujours positive, même pour un terme présent dans plus de la moitié des documents
+        idf = [math.log(1 + (n_docs - df[t] + 0.5) / (df[t] + 0.5)) for t in vocab]
+        return cls(vocab, idf, total_len / n_docs if n_docs else 1.0, n_docs, k1, b)
+
+    def encode_document(self, text: str) -> Tuple[List[int], List[float]]:
+        tf = Counter(t for t in tokenize(text) if t in self._idf)
+        dl = sum(tf.values())
+        norm = self.k1 * (1 - self.b + self.b * dl / self.avgdl)
+        weights: Dict[int, float] = {}
+        for term, count in tf.items():
+            # Collision de hash (rarissime) : les poids des deux termes s'additionnent sur la dimension
+            i = term_id(term)
+            weights[i] = weights.get(i, 0.0) + self._idf[term] * count * (self.k1 + 1) / (count + norm)
+        return list(weights), list(weights.values())
+
+    def encode_query(self, text: str) -> Tuple[List[int], List[float]]:
+        # Pas de filtre sur le vocabulaire : un terme ajouté par une ingestion plus récente matche quand même
+        indices = sorted({term_id(t) for t in tokenize(text)})
+        return indices, [1.0] * len(indices)
+
+    def save(self, path: str = SPARSE_VOCAB_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SPARSE_VOCAB_VERSION, "k1": self.k1, "b": self.b, "n_docs": self.n_docs, "avgdl": self.avgdl,
+                       "vocab": self.vocab, "idf": self.idf}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = SPARSE_VOCAB_PATH) -> Optional["SparseEncoder"]:
+        """
+        Encoder saved at ingest time, or None if the collection was ingested without sparse vectors
+        or with positional term ids (vocabulary v1: its points must be re-ingested).
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SPARSE_VOCAB_VERSION:
+            print(f"⚠️ Sparse vocabulary {path} is version {data.get('version')} (expected {SPARSE_VOCAB_VERSION}): "
+                  f"re-run scripts/qdrant_ingest.py --force to rebuild the sparse vectors")
+            return None
+        return cls(data["vocab"], data["idf"], data["avgdl"], data["n_docs"], data["k1"], data["b"])
@@ -15,20 +15,23 @@ from supabase import create_client, Client
 # sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Imports relatifs propres (suppose lancement module)
-from app.services.retriever import HybridRetriever
+from app.services.retriever import HybridRetriever, QDRANT_CONNECTION_ERRORS
+from app.services.local_store import LocalVectorStore, LOCAL_INDEX_PATH
 from app.services.generator import RAGGenerator
 from app.services.rag_router import build_filters
+from app.services.indexer import missing_payload_indexes
+from app.services.embeddings import DEFAULT_EMBEDDING_MODEL
 from qdrant_client import QdrantClient
 
 # Note: scripts.generate_plan pourrait nécessiter d'être déplacé dans app/services
 # pour un import propre, ou gardé tel quel si lancé depuis la racine.
 # Pour l'instant on garde l'import mais on s'attend à ce que le PYTHONPATH soit correct.
 try:
-    from scripts.generate_plan import generate_weekly_plan
+    from scripts.generate_plan import generate_weekly_plan, planner_profile
 except ImportError:
     # Fallback si scripts n'est pas un package
     print("⚠️ Warning: scripts.generate_plan not found via module import.")
-    generate_weekly_plan = None
+    generate_weekly_plan = planner_profile = None
 
 load_dotenv()
 
@@ -37,8 +40,10 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "coach_mike")
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL)
 ENABLE_AUTH = os.getenv("ENABLE_AUTH", "true").lower() == "true"
+# Documents passés au generator (le retriever sur-échantillonne lui-même si le rerank est actif)
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
 
 if not SUPABASE_URL or not SUPABASE_ANON_KEY:
     print("CRITICAL: Supabase credentials missing.")
@@ -61,12 +66,35 @@ else:
 supabase: Client = create_client(SUPABASE_URL, KEY_TO_USE)
 qdrant_client = QdrantClient(url=QDRANT_URL)
 
+# Snapshot local (scripts/export_vector_snapshot.py) : mode dégradé si Qdrant tombe
+local_store = None
+if LocalVectorStore.exists(LOCAL_INDEX_PATH):
+    local_store = LocalVectorStore.load(LOCAL_INDEX_PATH)
+    print(f"✅ Local vector index loaded ({len(local_store)} docs, fallback if Qdrant is down)")
+
+try:
+    # Index de payload des champs filtrés : créés à l'ingestion (qdrant_ingest), seulement vérifiés ici
+    # (pas d'écriture de schéma depuis chaque worker de l'API)
+    missing = missing_payload_indexes(qdrant_client, COLLECTION_NAME)
+    if missing:
+        print(f"⚠️ Missing payload indexes on '{COLLECTION_NAME}': {', '.join(missing)} "
+              f"(filtered search scans payloads; re-run scripts/qdrant_ingest.py to create them)")
+except QDRANT_CONNECTION_ERRORS as e:
+    if local_store is None:
+        print(f"⚠️ Qdrant unreachable at startup ({e}) and no local index at {LOCAL_INDEX_PATH}: retrieval will fail until Qdrant is back")
+    else:
+        print(f"⚠️ Qdrant unreachable at startup ({e}): DEGRADED MODE, serving retrieval from the local index")
+except Exception as e:
+    # Qdrant répond mais la vérification échoue (droits, collection absente, schéma) : pas une panne réseau
+    print(f"⚠️ Payload index check failed on '{COLLECTION_NAME}': {type(e).__name__}: {e}")
+
 # Initialize RAG Services
 try:
     retriever = HybridRetriever(
         qdrant_client=qdrant_client, 
         collection_name=COLLECTION_NAME,
-        embedding_model=EMBEDDING_MODEL
+        embedding_model=EMBEDDING_MODEL,
+        local_store=local_store
     )
     generator = RAGGenerator()
     print("✅ RAG Services Initialized")
@@ -94,6 +122,10 @@ class PlanRequest(BaseModel):
     days_per_week: Optional[int] = None
     # We might accept overrides here, but primarily we use the DB profile
 
+class StructuredPlanRequest(BaseModel):
+    days_per_week: Optional[int] = None
+    render: bool = False  # If True, the LLM only renders the structured plan as Markdown
+
 class SaveProgramRequest(BaseModel):
     user_id: str
     title: str
@@ -130,7 +162,13 @@ async def verify_supabase_token(authorization: str = Header(None)) -> Dict[str,
 
 @app.get("/health")
 def health_check():
-    return {"status": "active", "service": "Coach Mike AI"}
+    return {
+        "status": "active",
+        "service": "Coach Mike AI",
+        "llm_cache": generator.response_cache.stats(),
+        "local_index": len(local_store) if local_store else None,
+        "reranker": retriever.reranker.stats() if retriever.reranker else None
+    }
 
 @app.post("/generate_plan")
 async def generate_plan_endpoint(
@@ -185,7 +223,7 @@ async def generate_plan_endpoint(
         
         # --- TASK 1: ASYNC WRAPPER ---
         # Appel non-bloquant du retriever
-        retrieved_docs = await asyncio.to_thread(retriever.retrieve, retrieval_query, top_k=5, filters=filters)
+        retrieved_docs = await asyncio.to_thread(retriever.retrieve, retrieval_query, top_k=RETRIEVAL_TOP_K, filters=filters)
         
         # Appel non-bloquant du générateur
         result = await asyncio.to_thread(generator.generate, prompt, retrieved_docs)
@@ -196,6 +234,51 @@ async def generate_plan_endpoint(
         print(f"RAG Error: {e}")
         raise HTTPException(status_code=500, detail=f"Plan generation failed: {str(e)}")
 
+@app.post("/plan_structured")
+async def plan_structured_endpoint(
+    user: dict = Depends(verify_supabase_token),
+    request_body: Optional[StructuredPlanRequest] = Body(None)
+):
+    """
+    Fast path: builds the weekly plan with the deterministic catalog planner (no Qdrant, no LLM).
+    The LLM is only called if render=True, to turn the JSON plan into Markdown.
+    """
+    if generate_weekly_plan is None:
+        raise HTTPException(status_code=503, detail="Catalog planner unavailable")
+
+    user_id = user["id"]
+    print(f"🧩 Structured plan for User: {user_id}")
+
+    # 1. Fetch Profile from Supabase
+    try:
+        response = supabase.table("user_profiles").select("*").eq("user_id", user_id).execute()
+    except Exception as e:
+        print(f"DB Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    if not response.data:
+        raise HTTPException(status_code=404, detail="User profile not found. Please complete onboarding.")
+
+    # Colonnes nulles (profil partiellement rempli) : valeurs par défaut, pas de 500
+    profile = planner_profile(response.data[0], request_body.days_per_week if request_body else None)
+
+    # 2. Deterministic planner (in process, catalogs cached after first call)
+    plan = await asyncio.to_thread(generate_weekly_plan, profile)
+    if "error" in plan:
+        raise HTTPException(status_code=404, detail=plan["error"])
+
+    if not (request_body and request_body.render):
+        return {"plan": plan}
+
+    # 3. Optional prose rendering (LLM only formats, it does not choose the structure)
+    try:
+        plan_text = await asyncio.to_thread(generator.render_plan, plan)
+    except Exception as e:
+        print(f"Render Error: {e}")
+        raise HTTPException(status_code=500, detail=f"Plan rendering failed: {str(e)}")
+
+    return {"plan": plan, "plan_text": plan_text}
+
 @app.post("/save_program")
 async def save_program_endpoint(
     request: SaveProgramRequest,
@@ -237,7 +320,7 @@ async def chat_coach_endpoint(
         filters = build_filters(stage="auto", profile={}, extra={"query": query})
         
         # --- TASK 1: ASYNC WRAPPER ---
-        retrieved_docs = await asyncio.to_thread(retriever.retrieve, query, top_k=5, filters=filters)
+        retrieved_docs = await asyncio.to_thread(retriever.retrieve, query, top_k=RETRIEVAL_TOP_K, filters=filters)
         
         if not retrieved_docs:
             return {"answer": "I couldn't find specific information in my database to answer that. Could you rephrase?", "sources": []}
@@ -0,0 +1,408 @@
+"""
+Snapshot binaire colonnaire des catalogues JSONL (data2/*.jsonl, catalogues v2).
+
+Chaque fichier JSONL est compilé en un dossier <nom>.snap/ : une colonne par champ de premier niveau,
+en tableaux NumPy (.npy) ouverts par memory map. Les workers de l'API et les outils n'ont plus à
+parser le JSON au démarrage, et plusieurs process partagent les mêmes pages via le cache de l'OS.
+Les colonnes sont décodées paresseusement : seul ce qu'un appelant lit est décodé.
+
+Encodage des colonnes :
+- bool / int / float : tableau NumPy natif
+- cat  : chaînes à faible cardinalité (niveau, objectif...) -> codes int32 + dictionnaire
+- str  : table de chaînes (offsets int64 + blob UTF-8)
+- json : valeurs imbriquées ou types mixtes, stockées en texte JSON dans une table de chaînes
+Un masque de présence distingue un champ absent d'une valeur, et l'ordre des clés de chaque record
+est conservé : un record relu est identique à la ligne JSONL d'origine.
+
+Usage:
+    python scripts/catalog_snapshot.py                 # compile data2/*.jsonl (+ catalogues v2 s'ils existent)
+    from scripts.catalog_snapshot import open_catalog
+    meso = open_catalog("data2/meso_catalog.jsonl")   # snapshot à jour, sinon JSONL (et snapshot reconstruit)
+    niveaux = meso.column("niveau").to_list()
+"""
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from scripts.jsonl_io import iter_jsonl, loads
+except ImportError:
+    # Lancé en script : scripts/ est dans sys.path
+    from jsonl_io import iter_jsonl, loads
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SNAPSHOT_DIR = Path(os.getenv("CATALOG_SNAPSHOT_DIR", str(BASE_DIR / ".cache" / "catalog_snapshot")))
+# Reconstruit le snapshot à la volée quand il manque ou que le JSONL source a changé
+SNAPSHOT_AUTOBUILD = os.getenv("CATALOG_SNAPSHOT_AUTOBUILD", "true").lower() == "true"
+
+# À incrémenter si l'encodage des colonnes change
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Une colonne de chaînes est encodée en dictionnaire si elle a au plus 1 valeur distincte pour 2 lignes
+_CAT_MAX_RATIO = 0.5
+
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+
+# Champ absent du record (différent d'une valeur null)
+MISSING = _Missing()
+
+
+# --- TABLES DE CHAÎNES ---
+
+def _encode_strings(values: Sequence[str]) -> Dict[str, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    # Octet de bourrage : un tableau vide ne peut pas être memory-mappé
+    blob = np.frombuffer(b"".join(encoded) + b"\0", dtype=np.uint8)
+    return {"offsets": offsets, "blob": blob}
+
+
+class _StringTable:
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get_bytes(self, i: int) -> bytes:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._blob[start:end].tobytes()
+
+    def __getitem__(self, i: int) -> str:
+        return self.get_bytes(i).decode("utf-8")
+
+    def all_bytes(self) -> List[bytes]:
+        # Une seule copie du blob puis des slices Python : bien plus rapide qu'un accès NumPy par ligne
+        raw = self._blob.tobytes()
+        offsets = self._offsets.tolist()
+        return [raw[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+# --- COLONNES ---
+
+def _column_kind(values: List[Any]) -> str:
+    types = {type(v) for v in values}
+    if types == {bool}:
+        return "bool"
+    if types == {int} and all(-2**63 <= v < 2**63 for v in values):
+        return "int"
+    if types == {float}:
+        return "float"
+    if types == {str}:
+        return "cat" if len(set(values)) <= max(1, len(values) * _CAT_MAX_RATIO) else "str"
+    return "json"
+
+
+def _encode_column(rows: List[Any]) -> Dict[str, Any]:
+    """rows: one value per record, MISSING where the key is absent."""
+    present = np.array([v is not MISSING for v in rows], dtype=np.uint8)
+    values = [v for v in rows if v is not MISSING]
+    kind = _column_kind(values)
+    # Les lignes sans valeur prennent une valeur neutre, masquée par "present"
+    if kind == "bool":
+        arrays = {"values": np.array([bool(v) if v is not MISSING else False for v in rows], dtype=np.uint8)}
+    elif kind == "int":
+        arrays = {"values": np.array([v if v is not MISSING else 0 for v in rows], dtype=np.int64)}
+    elif kind == "float":
+        arrays = {"values": np.array([v if v is not MISSING else 0.0 for v in rows], dtype=np.float64)}
+    elif kind == "cat":
+        categories = list(dict.fromkeys(values))
+        index = {c: i for i, c in enumerate(categories)}
+        codes = np.array([index[v] if v is not MISSING else -1 for v in rows], dtype=np.int32)
+        arrays = {"codes": codes, **{f"dict_{k}": a for k, a in _encode_strings(categories).items()}}
+    elif kind == "str":
+        arrays = _encode_strings([v if v is not MISSING else "" for v in rows])
+    else:
+        arrays = _encode_strings([json.dumps(v, ensure_ascii=False) if v is not MISSING else "" for v in rows])
+    if not present.all():
+        arrays["present"] = present
+    return {"kind": kind, "arrays": arrays}
+
+
+class Column:
+    """Lazily decoded column. col[i] returns the value of row i, or MISSING if the key is absent."""
+
+    def __init__(self, kind: str, arrays: Dict[str, np.ndarray]):
+        self.kind = kind
+        self._arrays = arrays
+        self._present = arrays.get("present")
+        self._categories = None
+        if kind in ("str", "json"):
+            self._strings = _StringTable(arrays["offsets"], arrays["blob"])
+
+    def __len__(self) -> int:
+        return len(self._strings) if self.kind in ("str", "json") else len(
+            self._arrays["codes" if self.kind == "cat" else "values"])
+
+    def is_present(self, i: int) -> bool:
+        return self._present is None or bool(self._present[i])
+
+    def __getitem__(self, i: int) -> Any:
+        if not self.is_present(i):
+            return MISSING
+        kind = self.kind
+        if kind == "cat":
+            return self.categories[int(self._arrays["codes"][i])]
+        if kind == "str":
+            return self._strings[i]
+        if kind == "json":
+            return loads(self._strings.get_bytes(i))
+        value = self._arrays["values"][i]
+        return bool(value) if kind == "bool" else value.item()
+
+    @property
+    def categories(self) -> List[str]:
+        """Distinct values of a "cat" column (decoded once)."""
+        if self._categories is None:
+            table = _StringTable(self._arrays["dict_offsets"], self._arrays["dict_blob"])
+            self._categories = [table[i] for i in range(len(table))]
+        return self._categories
+
+    def values(self) -> List[Any]:
+        """Whole column decoded in bulk (MISSING where the key is absent)."""
+        kind = self.kind
+        if kind == "cat":
+            categories = self.categories
+            values = [categories[c] for c in self._arrays["codes"].tolist()]
+        elif kind == "str":
+            values = [b.decode("utf-8") for b in self._strings.all_bytes()]
+        elif kind == "json":
+            # Un seul appel au parseur pour toute la colonne ; les lignes absentes valent "null"
+            values = loads(b"[" + b",".join(b or b"null" for b in self._strings.all_bytes()) + b"]")
+        elif kind == "bool":
+            values = [bool(v) for v in self._arrays["values"].tolist()]
+        else:
+            values = self._arrays["values"].tolist()
+        if self._present is not None:
+            values = [v if p else MISSING for v, p in zip(values, self._present.tolist())]
+        return values
+
+    def to_list(self, default: Any = None) -> List[Any]:
+        return [default if v is MISSING else v for v in self.values()]
+
+
+# --- SNAPSHOT ---
+
+class CatalogSnapshot:
+    """
+    Read-only, record-sequence view of a catalog: len(), iteration and indexing return dicts,
+    column(name) gives lazy access to a single field.
+    """
+
+    def __init__(self, meta: Dict[str, Any], load_array):
+        self.meta = meta
+        self._load_array = load_array
+        self._columns: Dict[str, Column] = {}
+        self._specs = {c["name"]: c for c in meta["columns"]}
+        self._shape_keys = [tuple(keys) for keys in meta["shapes"]]
+        self._shape_ids = None
+
+    @classmethod
+    def open(cls, snap_dir: Path) -> "CatalogSnapshot":
+        snap_dir = Path(snap_dir)
+        with (snap_dir / "meta.json").open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(meta, lambda name: np.load(snap_dir / f"{name}.npy", mmap_mode="r"))
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], source: Optional[Dict[str, Any]] = None) -> "CatalogSnapshot":
+        """In-memory snapshot (same API), e.g. when no on-disk snapshot is available."""
+        meta, arrays = _build(records, source or {})
+        return cls(meta, arrays.__getitem__)
+
+    def __len__(self) -> int:
+        return self.meta["n_rows"]
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._specs)
+
+    def column(self, name: str) -> Column:
+        if name not in self._columns:
+            spec = self._specs.get(name)
+            if spec is None:
+                raise KeyError(name)
+            arrays = {part: self._load_array(f"{spec['file']}.{part}") for part in spec["parts"]}
+            self._columns[name] = Column(spec["kind"], arrays)
+        return self._columns[name]
+
+    def _shapes(self) -> np.ndarray:
+        if self._shape_ids is None:
+            self._shape_ids = self._load_array("_shape")
+        return self._shape_ids
+
+    def record(self, i: int, fields: Optional[Sequence[str]] = None) -> dict:
+        """Row i as a dict, keys in their original order. `fields` restricts (and only decodes) those keys."""
+        keys = self._shape_keys[int(self._shapes()[i])]
+        if fields is not None:
+            wanted = set(fields)
+            keys = [k for k in keys if k in wanted]
+        return {k: self.column(k)[i] for k in keys}
+
+    def __getitem__(self, i: int) -> dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.record(i)
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.records()
+
+    def records(self, fields: Optional[Sequence[str]] = None) -> Iterator[dict]:
+        """All rows as dicts, decoded column by column (only `fields` if given)."""
+        names = [n for n in self._specs if fields is None or n in set(fields)]
+        values = {n: self.column(n).values() for n in names}
+        shapes = [[k for k in keys if k in values] for keys in self._shape_keys]
+        for i, shape_id in enumerate(self._shapes().tolist()):
+            yield {k: values[k][i] for k in shapes[shape_id]}
+
+
+def _build(records: Iterable[dict], source: Dict[str, Any]):
+    records = list(records)
+    names: Dict[str, None] = {}
+    shapes: Dict[tuple, int] = {}
+    shape_ids = np.zeros(len(records), dtype=np.int32)
+    for i, rec in enumerate(records):
+        keys = tuple(rec)
+        names.update(dict.fromkeys(keys))
+        shape_ids[i] = shapes.setdefault(keys, len(shapes))
+
+    arrays: Dict[str, np.ndarray] = {"_shape": shape_ids}
+    columns = []
+    for n, name in enumerate(names):
+        encoded = _encode_column([rec.get(name, MISSING) for rec in records])
+        file = f"c{n}"
+        for part, array in encoded["arrays"].items():
+            arrays[f"{file}.{part}"] = array
+        columns.append({"name": name, "kind": encoded["kind"], "file": file, "parts": list(encoded["arrays"])})
+
+    meta = {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "n_rows": len(records),
+        "columns": columns,
+        "shapes": [list(keys) for keys in shapes],
+        **source,
+    }
+    return meta, arrays
+
+
+# --- FICHIERS ---
+
+def _source_info(jsonl_path: Path) -> Dict[str, Any]:
+    stat = jsonl_path.stat()
+    return {"source": str(jsonl_path.resolve()), "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns}
+
+
+def snapshot_path(jsonl_path: Path) -> Path:
+    jsonl_path = Path(jsonl_path).resolve()
+    # Deux catalogues de même nom dans des dossiers différents ne partagent pas de snapshot
+    tag = hashlib.sha256(str(jsonl_path).encode("utf-8")).hexdigest()[:8]
+    return SNAPSHOT_DIR / f"{jsonl_path.stem}.{tag}.snap"
+
+
+def is_fresh(jsonl_path: Path, snap_dir: Optional[Path] = None) -> bool:
+    """The snapshot exists and was built from the current version of the JSONL file (size + mtime)."""
+    meta_path = (snap_dir or snapshot_path(jsonl_path)) / "meta.json"
+    if not meta_path.exists():
+        return False
+    try:
+        with meta_path.open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    source = _source_info(Path(jsonl_path))
+    return meta.get("format") == SNAPSHOT_FORMAT_VERSION and all(meta.get(k) == v for k, v in source.items())
+
+
+def build_snapshot(jsonl_path: Path, records: Optional[Iterable[dict]] = None) -> Path:
+    """Compile a JSONL file into its snapshot directory (written to a temp dir, then swapped in)."""
+    jsonl_path = Path(jsonl_path)
+    source = _source_info(jsonl_path)
+    meta, arrays = _build(records if records is not None else iter_jsonl(jsonl_path, on_error="raise"), source)
+
+    target = snapshot_path(jsonl_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{target.name}.", dir=target.parent))
+    try:
+        for name, array in arrays.items():
+            np.save(tmp / f"{name}.npy", array)
+        # meta.json en dernier : un snapshot sans meta n'est jamais considéré comme valide
+        with (tmp / "meta.json").open("w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        old = None
+        if target.exists():
+            old = target.with_name(f".{target.name}.old.{os.getpid()}")
+            os.replace(target, old)
+        os.replace(tmp, target)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return target
+
+
+def open_catalog(jsonl_path, autobuild: bool = SNAPSHOT_AUTOBUILD) -> CatalogSnapshot:
+    """
+    Catalog records from the memory-mapped snapshot when it is up to date. Otherwise the JSONL
+    is parsed once and, with autobuild, the snapshot is rebuilt for the next process.
+    """
+    jsonl_path = Path(jsonl_path)
+    snap_dir = snapshot_path(jsonl_path)
+    if is_fresh(jsonl_path, snap_dir):
+        return CatalogSnapshot.open(snap_dir)
+
+    records = list(iter_jsonl(jsonl_path, on_error="raise"))
+    if autobuild:
+        try:
+            return CatalogSnapshot.open(build_snapshot(jsonl_path, records))
+        except OSError as e:
+            print(f"⚠️ Catalog snapshot not written ({e}), using JSONL")
+    return CatalogSnapshot.from_records(records, _source_info(jsonl_path))
+
+
+def default_sources() -> List[Path]:
+    paths = sorted((BASE_DIR / "data2").glob("*.jsonl"))
+    logic_dir = BASE_DIR / "data" / "processed" / "raw_v2" / "logic_jsonl_v2"
+    paths += sorted(logic_dir.glob("*.jsonl")) if logic_dir.exists() else []
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compile JSONL catalogs into memory-mappable columnar snapshots")
+    ap.add_argument("paths", nargs="*", help="JSONL files (default: data2/*.jsonl + logic_jsonl_v2/*.jsonl)")
+    ap.add_argument("--force", action="store_true", help="Rebuild even if the snapshot is up to date")
+    args = ap.parse_args()
+
+    paths = [Path(p) for p in args.paths] or default_sources()
+    if not paths:
+        print("No JSONL catalog found.")
+        sys.exit(1)
+    for path in paths:
+        if not args.force and is_fresh(path):
+            print(f"   = {path.name}: up to date")
+            continue
+        target = build_snapshot(path)
+        snap = CatalogSnapshot.open(target)
+        kinds = ", ".join(f"{c['name']}:{c['kind']}" for c in snap.meta["columns"])
+        print(f"   ✓ {path.name}: {len(snap)} rows -> {target.name} ({kinds})")
+
+
+if __name__ == "__main__":
+    main()
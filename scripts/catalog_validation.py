@@ -0,0 +1,352 @@
+"""
+Validation des catalogues JSONL par JSON Schema compilé.
+
+- Chaque schéma est vérifié et compilé une seule fois (mis en cache par empreinte), au lieu de
+  reconstruire un Draft202012Validator à chaque record. Si fastjsonschema est installé, le schéma est
+  compilé en code Python : les records valides (cas courant) ne passent que par ce chemin rapide,
+  jsonschema n'est utilisé que pour détailler les erreurs des records invalides
+- Validation d'un fichier par blocs, en parallèle (process pool) pour les gros catalogues
+- Rapport agrégé : erreurs par champ et par règle, premiers exemples avec numéro de ligne
+- ValidationGate : filtre en ligne pour l'ingestion (warn = compte seulement, strict = rejette)
+
+Usage:
+    from scripts.catalog_validation import SCHEMAS, validate_jsonl
+    report = validate_jsonl("data2/meso_catalog.jsonl", SCHEMAS["meso_ref"], workers=4)
+    report.print_summary()
+"""
+import os
+import re
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from jsonschema.validators import validator_for
+except ImportError:
+    raise ImportError("jsonschema n'est pas installé. Installe-le avec `pip install jsonschema`.")
+
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
+try:
+    from scripts.jsonl_io import iter_jsonl_with_errors
+except ImportError:
+    # Lancé en script : scripts/ est dans sys.path
+    from jsonl_io import iter_jsonl_with_errors
+
+VALIDATION_CHUNK_SIZE = int(os.getenv("VALIDATION_CHUNK_SIZE", "2000"))
+# Nombre d'exemples d'erreurs conservés dans un rapport
+MAX_ERROR_EXAMPLES = 20
+
+# Valeur non vide au sens des anciens contrôles Python (`not rec[field]`).
+# Mots-clés propres à chaque type plutôt qu'un "not" : pas de sous-validation par champ.
+_NON_EMPTY = {"type": ["string", "number", "boolean", "array", "object"],
+              "minLength": 1, "minItems": 1, "minProperties": 1}
+
+MESO_OBJECTIFS = [
+    "reconditionnement", "renforcement", "hypertrophie", "mobilite",
+    "perte_de_masse", "endurance_cardio", "performance",
+    "sante_longevite", "recuperation", "preparation_objectif",
+    "fonctionnel", "maintenance", "autre"
+]
+
+_NIVEAU = {"type": "string",
+           "pattern": r"(?i)^(debutant|intermediaire|avance|débutant|intermédiaire|confirmé|avancé|tous niveaux)$"}
+_INT_OR_NULL = {"type": ["integer", "null"]}
+
+# Catalogue meso (data2/meso_catalog.jsonl) : mêmes règles que l'ancien validate_meso_jsonl
+MESO_CATALOG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "type", "meso_id", "objectif", "niveau", "nom", "methode",
+        "variables", "sollicitation_neuromusculaire", "systeme_energetique",
+        "intention", "groupe", "niveau_bloc", "text"
+    ],
+    "properties": {
+        "type": {"const": "meso_ref"},
+        # "MC1.1" ou "1.1"
+        "meso_id": {"type": "string", "pattern": r"^(MC)?[\d.]*\d[\d.]*$"},
+        "objectif": {"enum": MESO_OBJECTIFS},
+        "niveau": {"type": "string", "pattern": r"(?i)^(debutant|intermediaire|avance|débutant|intermédiaire|confirmé|avancé)$"},
+        "nom": _NON_EMPTY,
+        "methode": _NON_EMPTY,
+        "sollicitation_neuromusculaire": _NON_EMPTY,
+        "systeme_energetique": _NON_EMPTY,
+        "intention": _NON_EMPTY,
+        "groupe": _NON_EMPTY,
+        "niveau_bloc": _NON_EMPTY,
+        "text": _NON_EMPTY,
+        "variables": {
+            "type": "object",
+            "required": ["I", "T", "S", "RE", "RY"],
+            "properties": {v: _NON_EMPTY for v in ["I", "T", "S", "RE", "RY"]},
+        },
+    },
+}
+
+# Schémas connus, par valeur du champ "type" des records
+SCHEMAS: Dict[str, dict] = {
+    "meso_ref": MESO_CATALOG_SCHEMA,
+}
+
+# Catalogues v2 (scripts/migrate_db_safe.py) : records data2 + champs dérivés
+# ("constraints" pour les meso, "structured" pour les micro). Textes libres, pas d'enum d'objectif.
+MESO_CATALOG_V2_SCHEMA = {
+    "type": "object",
+    "required": ["type", "meso_id", "nom", "niveau", "variables", "text", "constraints"],
+    "properties": {
+        "type": {"const": "meso_ref"},
+        "meso_id": {"type": "string", "pattern": r"^(MC)?[\d.]*\d[\d.]*$"},
+        "nom": _NON_EMPTY,
+        "niveau": _NIVEAU,
+        "text": _NON_EMPTY,
+        "variables": {"type": "object"},
+        "constraints": {
+            "type": "object",
+            "required": ["intensity_pct", "rest_sec", "sets"],
+            "properties": {k: _INT_OR_NULL for k in
+                           ["intensity_pct", "rest_sec", "sets", "reps_min", "reps_max", "reps_target"]},
+        },
+    },
+}
+
+MICRO_CATALOG_V2_SCHEMA = {
+    "type": "object",
+    "required": ["type", "micro_id", "nom", "niveau", "variables", "text", "structured"],
+    "properties": {
+        "type": {"const": "micro_ref"},
+        "micro_id": _NON_EMPTY,
+        "nom": _NON_EMPTY,
+        "niveau": _NIVEAU,
+        "text": _NON_EMPTY,
+        "variables": {"type": "object"},
+        "structured": {
+            "type": "object",
+            "required": ["equipment_detected", "focus_detected", "tempo_detected"],
+            "properties": {
+                "equipment_detected": {"type": "array", "items": {"type": "string"}},
+                "focus_detected": {"enum": ["general", "hypertrophy", "strength", "endurance", "mobility", "power"]},
+                "tempo_detected": {"type": ["string", "null"]},
+            },
+        },
+    },
+}
+
+# Schéma de chaque fichier ingéré par scripts/qdrant_ingest.py (nom de fichier -> schéma).
+# Un fichier absent de cette table n'est pas validé.
+INGEST_SCHEMAS: Dict[str, dict] = {
+    "meso_catalog_v2.jsonl": MESO_CATALOG_V2_SCHEMA,
+    "micro_catalog_v2.jsonl": MICRO_CATALOG_V2_SCHEMA,
+}
+
+
+# --- COMPILATION ---
+
+def _fingerprint(schema: dict) -> str:
+    return json.dumps(schema, sort_keys=True, ensure_ascii=False)
+
+
+class CompiledSchema:
+    """jsonschema validator, plus a fastjsonschema-generated check used as the fast path when available."""
+
+    def __init__(self, schema: dict):
+        cls = validator_for(schema)
+        cls.check_schema(schema)  # une seule fois par schéma, pas à chaque record
+        self._validator = cls(schema)
+        self._fast = None
+        if fastjsonschema is not None:
+            try:
+                self._fast = fastjsonschema.compile(schema)
+            except Exception:
+                pass  # mot-clé non supporté par fastjsonschema : on reste sur jsonschema
+
+    def is_valid(self, record: Any) -> bool:
+        if self._fast is None:
+            return self._validator.is_valid(record)
+        try:
+            self._fast(record)
+            return True
+        except fastjsonschema.JsonSchemaException:
+            return False
+
+    def iter_errors(self, record: Any) -> Iterator:
+        if self._fast is not None and self.is_valid(record):
+            return iter(())
+        return self._validator.iter_errors(record)
+
+
+@lru_cache(maxsize=32)
+def _compile(fingerprint: str) -> CompiledSchema:
+    return CompiledSchema(json.loads(fingerprint))
+
+
+def compile_schema(schema: dict) -> CompiledSchema:
+    """Compiled validator for this schema, built once per process."""
+    return _compile(_fingerprint(schema))
+
+
+# --- RAPPORT ---
+
+_REQUIRED_RE = re.compile(r"^'(.+)' is a required property$")
+
+
+def _error_field(error) -> str:
+    path = "/".join(str(p) for p in error.absolute_path)
+    if error.validator == "required":
+        m = _REQUIRED_RE.match(error.message)
+        if m:
+            return f"{path}/{m.group(1)}" if path else m.group(1)
+    return path or "<record>"
+
+
+class ValidationReport:
+    def __init__(self):
+        self.total = 0
+        self.valid = 0
+        self.json_errors = 0
+        self.by_field: Counter = Counter()
+        self.by_rule: Counter = Counter()
+        self.examples: List[str] = []
+
+    @property
+    def invalid(self) -> int:
+        return self.total - self.valid
+
+    @property
+    def n_errors(self) -> int:
+        return sum(self.by_rule.values()) + self.json_errors
+
+    def add_example(self, message: str):
+        if len(self.examples) < MAX_ERROR_EXAMPLES:
+            self.examples.append(message)
+
+    def add(self, line_num: int, errors) -> bool:
+        """Record the validation errors of one record. Returns True if the record is valid."""
+        self.total += 1
+        if not errors:
+            self.valid += 1
+            return True
+        for error in errors:
+            field = _error_field(error)
+            self.by_field[field] += 1
+            self.by_rule[error.validator] += 1
+            self.add_example(f"Ligne {line_num}: {field}: {error.message}")
+        return False
+
+    def add_json_error(self, line_num: int, message: str):
+        self.json_errors += 1
+        self.add_example(f"Ligne {line_num}: JSON invalide: {message}")
+
+    def merge(self, other: "ValidationReport") -> "ValidationReport":
+        self.total += other.total
+        self.valid += other.valid
+        self.json_errors += other.json_errors
+        self.by_field.update(other.by_field)
+        self.by_rule.update(other.by_rule)
+        for message in other.examples:
+            self.add_example(message)
+        return self
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total, "valid": self.valid, "invalid": self.invalid,
+            "json_errors": self.json_errors, "errors": self.n_errors,
+            "by_field": dict(self.by_field.most_common()), "by_rule": dict(self.by_rule.most_common()),
+        }
+
+    def print_summary(self, top: int = 10):
+        print(f"Total: {self.total} lignes")
+        print(f"Valides: {self.valid}")
+        print(f"Erreurs: {self.n_errors}")
+        if self.json_errors:
+            print(f"JSON invalide: {self.json_errors} lignes")
+        if self.by_field:
+            print("\nErreurs par champ:")
+            for field, n in self.by_field.most_common(top):
+                print(f"  {field:<32} {n}")
+            print("Erreurs par règle: " + ", ".join(f"{rule}={n}" for rule, n in self.by_rule.most_common()))
+        if self.examples:
+            print("\nERREURS DETECTEES:")
+            for message in self.examples:
+                print(f"  - {message}")
+            if self.n_errors > len(self.examples):
+                print(f"\n... et {self.n_errors - len(self.examples)} autres erreurs")
+
+
+# --- VALIDATION ---
+
+def _validate_chunk(args: Tuple[str, List[Tuple[int, Any, Optional[str]]]]) -> ValidationReport:
+    fingerprint, chunk = args
+    validator = _compile(fingerprint)
+    report = ValidationReport()
+    for line_num, record, json_error in chunk:
+        if json_error:
+            report.add_json_error(line_num, json_error)
+        else:
+            report.add(line_num, list(validator.iter_errors(record)))
+    return report
+
+
+def _chunks(it: Iterator, size: int) -> Iterator[list]:
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_jsonl(path, schema: dict, workers: int = 1,
+                   chunk_size: int = VALIDATION_CHUNK_SIZE) -> ValidationReport:
+    """
+    Validate every line of a JSONL file against `schema`.
+    With workers > 1, chunks of lines are validated in a process pool (results merged in file order).
+    """
+    fingerprint = _fingerprint(schema)
+    tasks = ((fingerprint, chunk) for chunk in _chunks(iter_jsonl_with_errors(path), chunk_size))
+    report = ValidationReport()
+    if workers <= 1:
+        for task in tasks:
+            report.merge(_validate_chunk(task))
+        return report
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(_validate_chunk, tasks):
+            report.merge(partial)
+    return report
+
+
+class ValidationGate:
+    """
+    Inline validation for ingestion pipelines. Records with a schema are checked, the schema being
+    looked up by `key` (e.g. the source file name, see INGEST_SCHEMAS) or else by the record "type";
+    in strict mode invalid ones are dropped, otherwise they pass and are only counted.
+    """
+
+    def __init__(self, schemas: Dict[str, dict] = SCHEMAS, strict: bool = False):
+        self.validators = {t: compile_schema(s) for t, s in schemas.items()}
+        self.strict = strict
+        self.report = ValidationReport()
+
+    def has_schema(self, key: str) -> bool:
+        return key in self.validators
+
+    def check(self, record: dict, key: Optional[str] = None, line_num: int = 0) -> bool:
+        if key is None and isinstance(record, dict):
+            key = record.get("type")
+        validator = self.validators.get(key)
+        if validator is None:
+            return True
+        ok = self.report.add(line_num, list(validator.iter_errors(record)))
+        return ok or not self.strict
+
+    def filter(self, records: Iterable[dict], key: Optional[str] = None) -> Iterator[dict]:
+        if key is not None and key not in self.validators:
+            yield from records  # pas de schéma pour cette source : rien à valider
+            return
+        for i, record in enumerate(records, 1):
+            if self.check(record, key, i):
+                yield record
@@ -0,0 +1,60 @@
+"""
+Vérifie qu'un backend d'embedding (quantized / onnx) reste fidèle au modèle PyTorch
+avec lequel la collection a été indexée, et (re)génère l'export ONNX si demandé.
+
+Usage:
+    python scripts/embedding_parity.py --backend onnx --export
+    python scripts/embedding_parity.py --backend quantized --min-cosine 0.99
+"""
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.services.embeddings import (
+    EMBEDDING_MODEL, EMBEDDING_PARITY_MIN_COSINE, PARITY_TEXTS, check_parity, export_onnx, load_embedding_model, onnx_model_dir
+)
+
+load_dotenv()
+
+DEFAULT_MODEL = EMBEDDING_MODEL
+
+
+def _latency_ms(model, runs: int = 20) -> float:
+    model.encode(PARITY_TEXTS[0])
+    t0 = time.perf_counter()
+    for i in range(runs):
+        model.encode(PARITY_TEXTS[i % len(PARITY_TEXTS)])
+    return (time.perf_counter() - t0) * 1000 / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding backend parity check against the PyTorch model")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--backend", choices=["quantized", "onnx"], default="onnx")
+    parser.add_argument("--export", action="store_true", help="(Re)export the ONNX model before checking")
+    parser.add_argument("--min-cosine", type=float, default=EMBEDDING_PARITY_MIN_COSINE)
+    args = parser.parse_args()
+
+    if args.backend == "onnx" and (args.export or not os.path.exists(os.path.join(onnx_model_dir(args.model), "meta.json"))):
+        print(f"📦 Exporting {args.model} to ONNX...")
+        export_onnx(args.model, min_cosine=args.min_cosine)
+
+    reference = SentenceTransformer(args.model, device="cpu")
+    candidate = load_embedding_model(args.model, backend=args.backend)
+    report = check_parity(candidate, reference, min_cosine=args.min_cosine, raise_on_error=False)
+
+    print(f"\nParity {args.backend} vs torch on {report['n']} texts:")
+    print(f"  min cosine : {report['min_cosine']:.4f} (required {args.min_cosine})")
+    print(f"  mean cosine: {report['mean_cosine']:.4f}")
+    print(f"  query latency: torch {_latency_ms(reference):.1f} ms, {args.backend} {_latency_ms(candidate):.1f} ms")
+    print("✅ OK" if report["ok"] else "❌ FAILED")
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,10 @@ import textwrap
 from pathlib import Path
 
 try:
-    import pdfplumber
+    from scripts.pdf_text_cache import get_pages
 except ImportError:
-    pdfplumber = None
-    # L'utilisateur devra installer pdfplumber : pip install pdfplumber
+    # Lancé en script (python scripts/etl_rules.py) : scripts/ est dans sys.path
+    from pdf_text_cache import get_pages
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -20,19 +20,13 @@ DATA_DIR = BASE_DIR / "data2"
 def read_pdf_text(pdf_path: Path) -> str:
     """
     Lit tout le texte d'un PDF et renvoie une chaîne nettoyée.
+    Le texte par page est servi par le cache d'extraction (clé = hash du PDF).
     """
-    if pdfplumber is None:
-        raise ImportError("pdfplumber n'est pas installé. Installe-le avec `pip install pdfplumber`.")
-
     if not pdf_path.exists():
         print(f"[WARN] Fichier PDF non trouvé : {pdf_path}")
         return ""
 
-    texts = []
-    with pdfplumber.open(str(pdf_path)) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text() or ""
-            texts.append(page_text)
+    texts = get_pages(pdf_path, extractor="pdfplumber")
 
     text = "\n".join(texts)
     # Nettoyage minimum
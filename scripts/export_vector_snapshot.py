@@ -0,0 +1,41 @@
+"""
+Exporte la collection Qdrant (vecteurs denses + payloads) vers un snapshot local
+chargé par app/services/local_store.LocalVectorStore : mode dégradé de l'API si Qdrant
+est indisponible, et tests sans serveur.
+
+Usage:
+    python scripts/export_vector_snapshot.py [--out .cache/vector_snapshot]
+"""
+import os
+import sys
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+from qdrant_client import QdrantClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.services.local_store import export_snapshot, LOCAL_INDEX_PATH
+from app.services.embeddings import read_collection_embedding, EMBEDDING_MODEL
+
+load_dotenv()
+
+COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "coach_mike")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Qdrant collection to a local vector snapshot")
+    parser.add_argument("--out", default=LOCAL_INDEX_PATH, help=f"Snapshot directory (default: {LOCAL_INDEX_PATH})")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=os.getenv("QDRANT_URL", "http://localhost:6333"), api_key=os.getenv("QDRANT_API_KEY", None))
+    print(f"📤 Exporting '{args.collection}' to {args.out}...")
+    # Modèle enregistré à l'ingestion (le retriever compare le snapshot au modèle servi)
+    recorded = read_collection_embedding(client, args.collection)
+    embedding_model = recorded["embedding_model"] if recorded else EMBEDDING_MODEL
+    count = export_snapshot(client, args.collection, args.out, embedding_model=embedding_model)
+    print(f"✅ {count} points exported")
+
+
+if __name__ == "__main__":
+    main()
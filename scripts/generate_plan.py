@@ -1,6 +1,13 @@
 import json
 import os
 import random
+from functools import lru_cache
+
+try:
+    from scripts.catalog_snapshot import open_catalog
+except ImportError:
+    # Lancé en script (python scripts/generate_plan.py) : scripts/ est dans sys.path
+    from catalog_snapshot import open_catalog
 
 # Paths (Dynamic based on current file location)
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -10,15 +17,19 @@ MICRO_PATH = os.path.join(BASE_DIR, "micro_catalog_v2.jsonl")
 PLANNER_PATH = os.path.join(BASE_DIR, "planner_schema.jsonl")
 
 def load_jsonl(path):
-    data = []
     if not os.path.exists(path):
         print(f"Error: File not found {path}")
         return []
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if line.strip():
-                data.append(json.loads(line))
-    return data
+    # Snapshot colonnaire memory-mappé (scripts/catalog_snapshot.py) : pas de parsing JSONL au démarrage
+    return list(open_catalog(path))
+
+@lru_cache(maxsize=1)
+def load_catalogs():
+    """
+    Loads the meso and micro catalogs once per process.
+    The API calls the planner on every request, so the JSONL files are parsed only on first use.
+    """
+    return load_jsonl(MESO_PATH), load_jsonl(MICRO_PATH)
 
 def get_split_strategy(days):
     if days == 3:
@@ -120,26 +131,41 @@ def find_micro(catalog, theme, allowed_equipment):
             
     return candidates[0] if candidates else None
 
+def planner_profile(profile_row, days_per_week=None):
+    """
+    Planner input from a user_profiles row. Columns can be present but null:
+    `or` (not get(key, default)) so a null falls back to the default too.
+    """
+    return {
+        "level": profile_row.get("level") or "Intermédiaire",
+        "goal": profile_row.get("goal") or "Renforcement",
+        "schedule": days_per_week or profile_row.get("days_per_week") or 3,
+        "equipment": profile_row.get("equipment") or []
+    }
+
 def generate_weekly_plan(profile):
     """
     Generates a weekly plan based on the user profile.
     profile: dict with keys 'level', 'goal', 'schedule', 'equipment'
     """
-    meso_catalog = load_jsonl(MESO_PATH)
-    micro_catalog = load_jsonl(MICRO_PATH)
+    meso_catalog, micro_catalog = load_catalogs()
     
-    # Map frontend levels (English) to Catalog levels (French)
+    # Map frontend levels (English) and DB profile levels (French) to Catalog levels
     level_map = {
         "beginner": "Débutant",
         "intermediate": "Intermédiaire",
-        "advanced": "Confirmé"
+        "advanced": "Confirmé",
+        "débutant": "Débutant",
+        "intermédiaire": "Intermédiaire",
+        "confirmé": "Confirmé",
+        "avancé": "Confirmé"
     }
     
-    user_level = profile.get("level", "intermediate").lower()
+    user_level = (profile.get("level") or "intermediate").lower()
     target_level = level_map.get(user_level, "Intermédiaire")
     
-    split = get_split_strategy(profile.get("schedule", 3))
-    meso = find_meso(meso_catalog, target_level, profile.get("goal", "Renforcement"))
+    split = get_split_strategy(profile.get("schedule") or 3)
+    meso = find_meso(meso_catalog, target_level, profile.get("goal") or "Renforcement")
     
     if not meso:
         return {"error": "No suitable Meso-cycle found."}
@@ -150,7 +176,7 @@ def generate_weekly_plan(profile):
     days = [1, 3, 5] 
     
     for i, theme in enumerate(split["sessions"]):
-        micro = find_micro(micro_catalog, theme, profile.get("equipment", []))
+        micro = find_micro(micro_catalog, theme, profile.get("equipment") or [])
         
         session = {
             "day": days[i] if i < len(days) else i+1,
@@ -1,6 +1,12 @@
 import json
 import os
 
+try:
+    from scripts.catalog_snapshot import open_catalog
+except ImportError:
+    # Lancé en script (python scripts/inspect_data.py) : scripts/ est dans sys.path
+    from catalog_snapshot import open_catalog
+
 MESO_PATH = r"c:\Dossier Walid\rag-mvp2\data\processed\raw_v2\logic_jsonl_v2\meso_catalog_v2.jsonl"
 MICRO_PATH = r"c:\Dossier Walid\rag-mvp2\data\processed\raw_v2\logic_jsonl_v2\micro_catalog_v2.jsonl"
 
@@ -14,16 +20,14 @@ def inspect_meso():
     matches_perte = []
     matches_metabolic = []
 
-    with open(MESO_PATH, 'r', encoding='utf-8') as f:
-        for line in f:
-            data = json.loads(line)
-            unique_objectifs.add(data.get('objectif', ''))
-            
-            text_dump = json.dumps(data, ensure_ascii=False).lower()
-            if "perte de poids" in text_dump:
-                matches_perte.append(data['meso_id'])
-            if "metabolic" in text_dump:
-                matches_metabolic.append(data['meso_id'])
+    for data in open_catalog(MESO_PATH):
+        unique_objectifs.add(data.get('objectif', ''))
+
+        text_dump = json.dumps(data, ensure_ascii=False).lower()
+        if "perte de poids" in text_dump:
+            matches_perte.append(data['meso_id'])
+        if "metabolic" in text_dump:
+            matches_metabolic.append(data['meso_id'])
 
     print(f"Unique Objectifs (first 10): {list(unique_objectifs)[:10]}")
     print(f"Matches 'Perte de poids': {matches_perte}")
@@ -38,14 +42,13 @@ def inspect_micro():
     unique_focus = set()
     unique_equipment = set()
 
-    with open(MICRO_PATH, 'r', encoding='utf-8') as f:
-        for line in f:
-            data = json.loads(line)
-            structured = data.get('structured', {})
-            if structured:
-                unique_focus.add(structured.get('focus_detected'))
-                for eq in structured.get('equipment_detected', []):
-                    unique_equipment.add(eq)
+    # Seule la colonne "structured" est décodée
+    for data in open_catalog(MICRO_PATH).records(fields=["structured"]):
+        structured = data.get('structured', {})
+        if structured:
+            unique_focus.add(structured.get('focus_detected'))
+            for eq in structured.get('equipment_detected', []):
+                unique_equipment.add(eq)
 
     print(f"Unique Focus: {unique_focus}")
     print(f"Unique Equipment: {unique_equipment}")
@@ -0,0 +1,240 @@
+"""
+Lecture / écriture JSONL en streaming, partagée par les scripts ETL et les outils.
+
+- Lecture ligne à ligne (mémoire constante), compression transparente selon l'extension :
+  .gz (gzip, stdlib) et .zst (zstandard, optionnel)
+- Lecture avec un backend JSON rapide (orjson) s'il est installé, sinon json de la stdlib ; les lignes
+  qu'orjson ne traite pas à l'identique (NaN/Infinity, entiers > 64 bits) passent par la stdlib
+- Écriture au format de json.dumps(..., ensure_ascii=False), quel que soit le backend
+- Lignes invalides : ignorées, levées, ou mises en quarantaine dans un fichier à part
+- Écriture atomique : fichier temporaire dans le même dossier puis os.replace,
+  un run interrompu ne laisse jamais de fichier partiel à la place de l'ancien
+
+Usage:
+    from scripts.jsonl_io import iter_jsonl, write_jsonl, jsonl_writer
+    for rec in iter_jsonl("data2/meso_catalog.jsonl", quarantine="data2/meso_catalog.bad.jsonl"):
+        ...
+    with jsonl_writer("out.jsonl.gz") as w:
+        w.write({"a": 1})
+"""
+import io
+import os
+import re
+import gzip
+import json
+import stat
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PathLike = Union[str, Path]
+
+# on_error : "skip" (défaut, comportement historique des scripts), "raise", ou quarantaine si un chemin est fourni
+ON_ERROR_SKIP = "skip"
+ON_ERROR_RAISE = "raise"
+
+
+class JsonlError(ValueError):
+    """Ligne JSONL invalide (avec on_error="raise")."""
+
+    def __init__(self, path: PathLike, line_num: int, message: str):
+        super().__init__(f"{path}:{line_num}: {message}")
+        self.path = path
+        self.line_num = line_num
+
+
+# --- BACKEND JSON ---
+
+# orjson lit les entiers hors int64/uint64 en float : ces lignes (rares) passent par la stdlib, exacte
+_LONG_NUMBER_RE = re.compile(rb"\d{19,}")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        raw = data.encode("utf-8") if isinstance(data, str) else data
+        if not _LONG_NUMBER_RE.search(raw):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass  # NaN / Infinity : refusés par orjson, acceptés par la stdlib (comportement historique)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Une ligne JSON, octet pour octet comme json.dumps(..., ensure_ascii=False) (séparateurs ", " / ": ").
+    orjson n'a pas d'option de séparateurs : l'écriture reste sur la stdlib, pour que réécrire un
+    fichier inchangé ne change ni ses octets, ni son hash, ni les manifestes.
+    """
+    return json.dumps(obj, ensure_ascii=False)
+
+
+# Exceptions levées par loads() sur une ligne invalide
+DECODE_ERRORS: Tuple[type, ...] = (json.JSONDecodeError, UnicodeDecodeError)
+if orjson is not None:
+    DECODE_ERRORS += (orjson.JSONDecodeError,)
+
+
+# --- COMPRESSION ---
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstandard n'est pas installé. Installe-le avec `pip install zstandard` pour lire/écrire les .zst.")
+    return zstandard
+
+
+def _open_binary_read(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")
+    if path.suffix == ".zst":
+        raw = path.open("rb")
+        return io.BufferedReader(_zstd().ZstdDecompressor().stream_reader(raw, closefd=True))
+    return path.open("rb")
+
+
+def _wrap_binary_write(path: Path, raw):
+    if path.suffix == ".gz":
+        # mtime=0 : même contenu => mêmes octets (diffs et hash de contenu stables)
+        return gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+    if path.suffix == ".zst":
+        return _zstd().ZstdCompressor().stream_writer(raw, closefd=False)
+    return None
+
+
+# --- LECTURE ---
+
+def iter_lines(path: PathLike) -> Iterator[Tuple[int, bytes]]:
+    """(numéro de ligne, ligne brute) pour chaque ligne non vide."""
+    with _open_binary_read(Path(path)) as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                yield line_num, line
+
+
+def iter_jsonl(path: PathLike, on_error: str = ON_ERROR_SKIP,
+               quarantine: Optional[PathLike] = None) -> Iterator[Any]:
+    """
+    Stream the records of a JSONL file (optionally .gz / .zst).
+    Invalid lines are skipped, raised as JsonlError (on_error="raise"), and/or
+    appended to `quarantine` as {"source", "line", "error", "raw"} for later inspection.
+    """
+    for line_num, record, error in iter_jsonl_with_errors(path):
+        if error is None:
+            yield record
+            continue
+        if quarantine is not None:
+            quarantine_line(quarantine, path, line_num, error, record)
+        if on_error == ON_ERROR_RAISE:
+            raise JsonlError(path, line_num, error)
+
+
+def iter_jsonl_with_errors(path: PathLike) -> Iterator[Tuple[int, Any, Optional[str]]]:
+    """(line_num, record, None) for valid lines, (line_num, raw_text, error) for invalid ones."""
+    for line_num, line in iter_lines(path):
+        try:
+            yield line_num, loads(line), None
+        except DECODE_ERRORS as e:
+            yield line_num, line.decode("utf-8", errors="replace"), str(e)
+
+
+def load_jsonl(path: PathLike, **kwargs) -> list:
+    """Whole file as a list. Prefer iter_jsonl for large files."""
+    return list(iter_jsonl(path, **kwargs))
+
+
+def quarantine_line(quarantine: PathLike, source: PathLike, line_num: int, error: str, raw: str):
+    q = Path(quarantine)
+    q.parent.mkdir(parents=True, exist_ok=True)
+    with q.open("a", encoding="utf-8") as f:
+        f.write(dumps({"source": str(source), "line": line_num, "error": error, "raw": raw}) + "\n")
+
+
+# --- ÉCRITURE ---
+
+def _current_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Lu une fois à l'import : os.umask() est global au process, pas de bascule pendant les écritures
+_UMASK = _current_umask()
+
+
+def _target_mode(path: Path) -> int:
+    """Mode of the file being replaced, or the umask default of a new file (mkstemp creates 0600)."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+class JsonlWriter:
+    def __init__(self, stream):
+        self._stream = stream
+        self.count = 0
+
+    def write(self, record: Any):
+        self.write_line(dumps(record))
+
+    def write_line(self, line: str):
+        """Already serialized JSON record (no trailing newline)."""
+        self._stream.write(line.encode("utf-8") + b"\n")
+        self.count += 1
+
+    def write_many(self, records: Iterable[Any]):
+        for record in records:
+            self.write(record)
+
+
+@contextmanager
+def atomic_open(path: PathLike, mode: str = "wb"):
+    """
+    Temp file in the destination directory, renamed over `path` on success only.
+    On error the temp file is removed and any previous version of `path` stays untouched.
+    The result keeps the permissions of the file it replaces (umask default for a new file).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, _target_mode(path))
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@contextmanager
+def jsonl_writer(path: PathLike) -> Iterator[JsonlWriter]:
+    """Streaming, atomic JSONL writer (compressed according to the extension)."""
+    path = Path(path)
+    with atomic_open(path, "wb") as raw:
+        compressed = _wrap_binary_write(path, raw)
+        writer = JsonlWriter(compressed or raw)
+        yield writer
+        if compressed is not None:
+            compressed.close()
+
+
+def write_jsonl(path: PathLike, records: Iterable[Any]) -> int:
+    """Write all records atomically. Returns the number of lines written."""
+    with jsonl_writer(path) as w:
+        w.write_many(records)
+    return w.count
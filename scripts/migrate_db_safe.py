@@ -1,6 +1,19 @@
-import json
 import re
 import os
+import json
+import time
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from scripts import jsonl_io
+    from scripts.jsonl_io import iter_lines, loads, dumps, jsonl_writer, atomic_open, DECODE_ERRORS, quarantine_line
+except ImportError:
+    # Lancé en script (python scripts/migrate_db_safe.py) : scripts/ est dans sys.path
+    import jsonl_io
+    from jsonl_io import iter_lines, loads, dumps, jsonl_writer, atomic_open, DECODE_ERRORS, quarantine_line
 
 # Define paths
 BASE_DIR = r"c:\Dossier Walid\rag-mvp2\data\processed\raw_v2\logic_jsonl_v2"
@@ -9,12 +22,22 @@ MICRO_INPUT = os.path.join(BASE_DIR, "micro_catalog.jsonl")
 MESO_OUTPUT = os.path.join(BASE_DIR, "meso_catalog_v2.jsonl")
 MICRO_OUTPUT = os.path.join(BASE_DIR, "micro_catalog_v2.jsonl")
 
+# Records par tâche envoyée au process pool
+MIGRATION_CHUNK_SIZE = int(os.getenv("MIGRATION_CHUNK_SIZE", "500"))
+
+# Regex compilées une fois (et non à chaque appel de parse_*)
+_FIRST_INT_RE = re.compile(r"(\d+)")
+_MIN_SEC_RE = re.compile(r"(\d+)'\s*(\d+)")
+_MIN_RE = re.compile(r"(\d+)'")
+_SEC_RE = re.compile(r"(\d+)\"")
+_TEMPO_RE = re.compile(r"(\d-\d-\d(?:-\d)?)")
+
 def parse_intensity(value):
     """Parses intensity string to integer percentage."""
     if not value:
         return None
     # Extract first number found
-    match = re.search(r"(\d+)", str(value))
+    match = _FIRST_INT_RE.search(str(value))
     if match:
         return int(match.group(1))
     return None
@@ -40,28 +63,28 @@ def parse_time(value):
     # Strategy: Look for Minutes ' Seconds " pattern first
     
     # Pattern: 1'30 or 1'30"
-    match_min_sec = re.search(r"(\d+)'\s*(\d+)", value)
+    match_min_sec = _MIN_SEC_RE.search(value)
     if match_min_sec:
         minutes = int(match_min_sec.group(1))
         seconds = int(match_min_sec.group(2))
         return minutes * 60 + seconds
         
     # Pattern: 1' (minutes only)
-    match_min = re.search(r"(\d+)'", value)
+    match_min = _MIN_RE.search(value)
     if match_min and '"' not in value: # Ensure it's not 1'30" handled above (though regex above would catch it)
         # Check if it might be seconds denoted wrongly? 
         # But standard is ' = min.
         return int(match_min.group(1)) * 60
         
     # Pattern: 30" (seconds only)
-    match_sec = re.search(r"(\d+)\"", value)
+    match_sec = _SEC_RE.search(value)
     if match_sec:
         return int(match_sec.group(1))
         
     # Fallback: just a number? "30" -> assume seconds usually
     # But if it says "1.5" -> could be minutes?
     # Let's look for simple integers.
-    match_num = re.search(r"(\d+)", value)
+    match_num = _FIRST_INT_RE.search(value)
     if match_num:
         return int(match_num.group(1))
         
@@ -73,7 +96,7 @@ def parse_sets(value):
         return None
     # "3-4" -> take min? or max? Let's take max to be safe for volume, or min for beginners.
     # Let's take the first number found.
-    match = re.search(r"(\d+)", str(value))
+    match = _FIRST_INT_RE.search(str(value))
     if match:
         return int(match.group(1))
     return None
@@ -84,7 +107,7 @@ def parse_reps(value):
         return None, None
     
     # "10-12"
-    nums = re.findall(r"(\d+)", str(value))
+    nums = _FIRST_INT_RE.findall(str(value))
     if len(nums) >= 2:
         return int(nums[0]), int(nums[1])
     elif len(nums) == 1:
@@ -150,7 +173,7 @@ def extract_micro_structure(data):
     
     # Extract Tempo
     # Look for patterns like "2-0-2" or "3-1-1"
-    tempo_match = re.search(r"(\d-\d-\d(?:-\d)?)", data.get("variables", {}).get("RY", "") or text)
+    tempo_match = _TEMPO_RE.search(data.get("variables", {}).get("RY", "") or text)
     if tempo_match:
         structured["tempo_detected"] = tempo_match.group(1)
     else:
@@ -159,41 +182,155 @@ def extract_micro_structure(data):
     data["structured"] = structured
     return data
 
-def process_file(input_path, output_path, transformer):
+# --- RUNNER ---
+# Un record dont la ligne d'entrée est identique au run précédent (même hash) n'est pas retransformé :
+# sa ligne de sortie est recopiée telle quelle. Le manifeste <sortie>.migrate.json garde, dans l'ordre
+# des lignes de sortie, le hash de chaque ligne d'entrée, plus l'empreinte du code qui produit les
+# lignes : ce script, jsonl_io (loads/dumps) et son backend JSON. Toute modification invalide le cache.
+
+def _json_backend():
+    orjson = jsonl_io.orjson
+    return f"orjson {orjson.__version__}" if orjson is not None else "json (stdlib)"
+
+def _code_fingerprint():
+    h = hashlib.sha256()
+    for path in (__file__, jsonl_io.__file__):
+        with open(path, "rb") as f:
+            h.update(f.read())
+    h.update(_json_backend().encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def _line_hash(raw):
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+def _manifest_path(output_path):
+    return f"{output_path}.migrate.json"
+
+def load_previous_outputs(output_path, transformer):
+    """input line hash -> output line of the previous migration, when it is still valid for this code."""
+    manifest_path = _manifest_path(output_path)
+    if not (os.path.exists(manifest_path) and os.path.exists(output_path)):
+        return {}
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (manifest.get("transformer") != transformer.__name__
+            or manifest.get("code") != _code_fingerprint()
+            or manifest.get("output_size") != os.path.getsize(output_path)):
+        return {}
+    lines = [raw.decode("utf-8") for _, raw in iter_lines(output_path)]
+    if len(lines) != len(manifest["input_hashes"]):
+        return {}
+    return dict(zip(manifest["input_hashes"], lines))
+
+def _transform_chunk(args):
+    """Worker: parse + transform a chunk of raw lines. Returns (line_num, output_line, error) per line."""
+    transformer, lines = args
+    results = []
+    for line_num, raw in lines:
+        try:
+            record = loads(raw)
+        except DECODE_ERRORS as e:
+            results.append((line_num, None, str(e)))
+            continue
+        results.append((line_num, dumps(transformer(record)), None))
+    return results
+
+def process_file(input_path, output_path, transformer, workers=None,
+                 chunk_size=MIGRATION_CHUNK_SIZE, force=False):
     print(f"Processing {input_path} -> {output_path}")
-    processed_count = 0
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    previous = {} if force else load_previous_outputs(output_path, transformer)
+    stats = {"records": 0, "transformed": 0, "unchanged": 0, "rejected": 0}
     examples = []
-    
-    with open(input_path, 'r', encoding='utf-8') as infile, \
-         open(output_path, 'w', encoding='utf-8') as outfile:
-        
-        for line in infile:
-            if not line.strip():
-                continue
-            
-            try:
-                original = json.loads(line)
-                # Deep copy for comparison
-                before = json.loads(line)
-                
-                transformed = transformer(original)
-                
-                outfile.write(json.dumps(transformed, ensure_ascii=False) + "\n")
-                
-                if processed_count < 3:
-                    examples.append((before, transformed))
-                
-                processed_count += 1
-            except json.JSONDecodeError:
-                print(f"Skipping invalid JSON line: {line[:50]}...")
-                
+    input_hashes = []
+    rejected_path = f"{output_path}.rejected.jsonl"
+    if os.path.exists(rejected_path):
+        os.remove(rejected_path)  # ne garder que les rejets de ce run
+
+    pool = None
+    pending = deque()  # (entries du bloc, future ou résultats), dans l'ordre du fichier
+
+    def submit(entries):
+        nonlocal pool
+        todo = [(line_num, raw) for line_num, raw, _, prev in entries if prev is None]
+        # Pool seulement si le fichier fait plus d'un bloc : pas de coût de démarrage pour les petits catalogues
+        if pool is None and workers > 1 and todo and len(entries) == chunk_size:
+            pool = ProcessPoolExecutor(max_workers=workers)
+        if pool is not None and todo:
+            pending.append((entries, pool.submit(_transform_chunk, (transformer, todo))))
+        else:
+            pending.append((entries, _transform_chunk((transformer, todo))))
+
+    def drain(outfile, keep):
+        # Écriture dans l'ordre ; au plus `keep` blocs en vol pour borner la mémoire
+        while len(pending) > keep:
+            entries, result = pending.popleft()
+            results = iter(result.result() if hasattr(result, "result") else result)
+            for line_num, raw, line_hash, prev in entries:
+                if prev is not None:
+                    line = prev
+                    stats["unchanged"] += 1
+                else:
+                    _, line, error = next(results)
+                    if error:
+                        quarantine_line(rejected_path, input_path, line_num, error, raw.decode("utf-8", errors="replace"))
+                        stats["rejected"] += 1
+                        continue
+                    stats["transformed"] += 1
+                if len(examples) < 3:
+                    examples.append((loads(raw), loads(line)))
+                outfile.write_line(line)
+                input_hashes.append(line_hash)
+                stats["records"] += 1
+
+    try:
+        # Sortie écrite dans un fichier temporaire puis renommée : jamais de catalogue v2 à moitié écrit
+        with jsonl_writer(output_path) as outfile:
+            entries = []
+            for line_num, raw in iter_lines(input_path):
+                line_hash = _line_hash(raw)
+                entries.append((line_num, raw, line_hash, previous.get(line_hash)))
+                if len(entries) == chunk_size:
+                    submit(entries)
+                    entries = []
+                    drain(outfile, keep=2 * workers)
+            if entries:
+                submit(entries)
+            drain(outfile, keep=0)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    with atomic_open(_manifest_path(output_path), "w") as f:
+        json.dump({"transformer": transformer.__name__, "code": _code_fingerprint(),
+                   "output_size": os.path.getsize(output_path), "input_hashes": input_hashes}, f)
+
+    elapsed = time.perf_counter() - start
+    rate = stats["records"] / elapsed if elapsed > 0 else 0.0
+    print(f"   {stats['records']} records in {elapsed:.2f}s ({rate:,.0f} records/s, "
+          f"{workers if pool is not None else 1} worker(s)): {stats['transformed']} transformed, "
+          f"{stats['unchanged']} unchanged (reused), {stats['rejected']} rejected")
     return examples
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-dir", default=BASE_DIR, help="Dossier des catalogues meso/micro")
+    ap.add_argument("--workers", type=int, default=None, help="Process pool (défaut: nombre de CPU)")
+    ap.add_argument("--chunk-size", type=int, default=MIGRATION_CHUNK_SIZE)
+    ap.add_argument("--force", action="store_true", help="Retransformer tous les records, même inchangés")
+    args = ap.parse_args()
+    paths = {name: os.path.join(args.base_dir, os.path.basename(path)) for name, path in
+             [("meso_in", MESO_INPUT), ("meso_out", MESO_OUTPUT), ("micro_in", MICRO_INPUT), ("micro_out", MICRO_OUTPUT)]}
+    options = {"workers": args.workers, "chunk_size": args.chunk_size, "force": args.force}
+
     print("Starting Migration...")
     
     # 1. Process Meso Catalog
-    meso_examples = process_file(MESO_INPUT, MESO_OUTPUT, transform_meso)
+    meso_examples = process_file(paths["meso_in"], paths["meso_out"], transform_meso, **options)
     
     print("\n--- Meso Catalog Examples ---")
     for i, (before, after) in enumerate(meso_examples):
@@ -202,7 +339,7 @@ def main():
         print(f"After Constraints: {after.get('constraints')}")
 
     # 2. Process Micro Catalog
-    micro_examples = process_file(MICRO_INPUT, MICRO_OUTPUT, extract_micro_structure)
+    micro_examples = process_file(paths["micro_in"], paths["micro_out"], extract_micro_structure, **options)
     
     print("\n--- Micro Catalog Examples ---")
     for i, (before, after) in enumerate(micro_examples):
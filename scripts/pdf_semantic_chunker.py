@@ -1,19 +1,39 @@
+import os
 import re
 import json
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
 
+try:
+    from scripts.pdf_text_cache import load_pages, store_pages, sha256_file
+except ImportError:
+    # Lancé en script (python scripts/pdf_semantic_chunker.py) : scripts/ est dans sys.path
+    from pdf_text_cache import load_pages, store_pages, sha256_file
+
 # Regular expressions to detect meso- and micro-cycle headers.
 # These patterns can be adapted as needed.
 MESO_HEADER_RE = re.compile(r"^MC\d+(?:\.\d+)?\s*[-–]\s*.*", re.IGNORECASE)
 MICRO_HEADER_RE = re.compile(r"^mc[A-Z]\d{2}\s*[-–]\s*.*", re.IGNORECASE)
 
-def pdf_to_text(path: Path) -> str:
-    doc = fitz.open(path.as_posix())
-    texts = []
-    for page in doc:
-        texts.append(page.get_text())
-    return "\n".join(texts)
+# Big PDFs are split into page ranges so that a single file does not serialize the pool.
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "50"))
+
+def extract_page_range(path: str, start: int, end: int) -> list:
+    """Worker task: text of pages [start, end) of one PDF."""
+    with fitz.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, end)]
+
+def plan_tasks(pdf_files: list, pages_per_task: int = PAGES_PER_TASK) -> list:
+    """One (path, start, end) task per PDF, or per page range for PDFs longer than pages_per_task."""
+    tasks = []
+    for pdf_file in pdf_files:
+        with fitz.open(pdf_file.as_posix()) as doc:
+            page_count = doc.page_count
+        for start in range(0, max(page_count, 1), pages_per_task):
+            tasks.append((pdf_file.as_posix(), start, min(start + pages_per_task, page_count)))
+    return tasks
 
 def split_blocks(text: str, header_re: re.Pattern) -> list:
     lines = text.split("\n")
@@ -60,15 +80,41 @@ def parse_meso_block(block: str) -> dict:
         "meta": meta,
     }
 
-def process_pdf_dir(in_dir="data/raw/pdfs", out_micro="data/processed/microcycles.jsonl", out_meso="data/processed/mesocycles.jsonl"):
+def process_pdf_dir(in_dir="data/raw/pdfs", out_micro="data/processed/microcycles.jsonl", out_meso="data/processed/mesocycles.jsonl",
+                    workers: int = None, pages_per_task: int = PAGES_PER_TASK):
+    """
+    Extracts PDF text in a process pool (one task per PDF or page range), then parses and
+    writes from the main process only. PDFs already in the extraction cache skip the pool. PDFs are handled in sorted order and page ranges are
+    re-assembled in order, so the output is identical to a sequential run.
+    """
     in_path = Path(in_dir)
     out_micro_path = Path(out_micro)
     out_meso_path = Path(out_meso)
     out_micro_path.parent.mkdir(parents=True, exist_ok=True)
     out_meso_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_micro_path.open("w", encoding="utf-8") as f_micro, out_meso_path.open("w", encoding="utf-8") as f_meso:
-        for pdf_file in in_path.glob("*.pdf"):
-            text = pdf_to_text(pdf_file)
+
+    pdf_files = sorted(in_path.glob("*.pdf"))
+    # Extraction cache (keyed by file hash): only uncached PDFs go to the pool
+    hashes = {pdf_file: sha256_file(pdf_file) for pdf_file in pdf_files}
+    cached = {pdf_file: load_pages(pdf_file, "pymupdf", hashes[pdf_file]) for pdf_file in pdf_files}
+    tasks = plan_tasks([p for p in pdf_files if cached[p] is None], pages_per_task)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            out_micro_path.open("w", encoding="utf-8") as f_micro, \
+            out_meso_path.open("w", encoding="utf-8") as f_meso:
+        futures = {}
+        for path, start, end in tasks:
+            futures.setdefault(path, []).append(pool.submit(extract_page_range, path, start, end))
+
+        # Single writer: consume PDFs in order while the pool keeps extracting the next ones
+        for pdf_file in pdf_files:
+            pages = cached[pdf_file]
+            if pages is None:
+                pages = []
+                for future in futures[pdf_file.as_posix()]:
+                    pages.extend(future.result())
+                store_pages(pdf_file, "pymupdf", pages, hashes[pdf_file])
+            text = "\n".join(pages)
             # Extract micro cycles
             micro_blocks = split_blocks(text, MICRO_HEADER_RE)
             for block in micro_blocks:
@@ -81,4 +127,8 @@ def process_pdf_dir(in_dir="data/raw/pdfs", out_micro="data/processed/microcycle
                 f_meso.write(json.dumps(row, ensure_ascii=False) + "\n")
 
 if __name__ == "__main__":
-    process_pdf_dir()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--pages-per-task", type=int, default=PAGES_PER_TASK, help="Page range size for big PDFs")
+    args = parser.parse_args()
+    process_pdf_dir(workers=args.workers, pages_per_task=args.pages_per_task)
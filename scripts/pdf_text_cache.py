@@ -0,0 +1,121 @@
+"""
+Cache disque du texte extrait des PDFs, partagé par les scripts ETL.
+
+Clé = (sha256 du PDF, extracteur, version de l'extracteur). Le texte est stocké page par page,
+donc chaque script retrouve exactement ce que son extracteur aurait renvoyé, sans re-parser le PDF.
+Un PDF modifié, un autre extracteur ou une nouvelle version de la librairie => nouvelle entrée.
+
+Usage:
+    from scripts.pdf_text_cache import get_text, get_pages
+    text = get_text(Path("data/raw/pdfs/meso.pdf"), extractor="pdfminer")
+"""
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CACHE_DIR = Path(os.getenv("PDF_TEXT_CACHE_DIR", str(BASE_DIR / ".cache" / "pdf_text")))
+
+# À incrémenter si la façon dont on découpe les pages change
+CACHE_FORMAT_VERSION = 1
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# --- EXTRACTEURS ---
+# Imports paresseux : chaque script n'a besoin que de la librairie de son propre extracteur.
+
+def _pymupdf_version() -> str:
+    import fitz
+    return fitz.VersionBind
+
+def _pymupdf_pages(path: Path) -> List[str]:
+    import fitz
+    with fitz.open(path.as_posix()) as doc:
+        return [page.get_text() for page in doc]
+
+def _pdfplumber_version() -> str:
+    try:
+        import pdfplumber
+    except ImportError:
+        raise ImportError("pdfplumber n'est pas installé. Installe-le avec `pip install pdfplumber`.")
+    return pdfplumber.__version__
+
+def _pdfplumber_pages(path: Path) -> List[str]:
+    import pdfplumber
+    with pdfplumber.open(str(path)) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+def _pdfminer_version() -> str:
+    import pdfminer
+    return pdfminer.__version__
+
+def _pdfminer_pages(path: Path) -> List[str]:
+    from pdfminer.high_level import extract_text
+    # pdfminer sépare les pages par un saut de page : "\f".join(pages) redonne le texte exact
+    return extract_text(str(path)).split("\f")
+
+
+EXTRACTORS: Dict[str, Tuple[Callable[[], str], Callable[[Path], List[str]], str]] = {
+    # nom: (version, extraction, séparateur de pages pour reconstituer le texte)
+    "pymupdf": (_pymupdf_version, _pymupdf_pages, "\n"),
+    "pdfplumber": (_pdfplumber_version, _pdfplumber_pages, "\n"),
+    "pdfminer": (_pdfminer_version, _pdfminer_pages, "\f"),
+}
+
+
+def _cache_path(pdf_hash: str, extractor: str) -> Path:
+    version = EXTRACTORS[extractor][0]()
+    return CACHE_DIR / f"{pdf_hash}.{extractor}-{version}.v{CACHE_FORMAT_VERSION}.json"
+
+
+def load_pages(pdf_path: Path, extractor: str, pdf_hash: Optional[str] = None) -> Optional[List[str]]:
+    """Cached pages for this PDF/extractor, or None on a miss."""
+    path = _cache_path(pdf_hash or sha256_file(pdf_path), extractor)
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)["pages"]
+
+
+def store_pages(pdf_path: Path, extractor: str, pages: List[str], pdf_hash: Optional[str] = None) -> None:
+    path = _cache_path(pdf_hash or sha256_file(pdf_path), extractor)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Fichier temporaire unique : deux extractions concurrentes du même PDF n'écrivent pas dans le même tmp
+    f = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, prefix=f".{path.name}.",
+                                    suffix=".tmp", delete=False)
+    try:
+        with f:
+            json.dump({"source": Path(pdf_path).name, "extractor": extractor, "pages": pages}, f, ensure_ascii=False)
+        os.replace(f.name, path)
+    except BaseException:
+        try:
+            os.unlink(f.name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def get_pages(pdf_path: Path, extractor: str = "pymupdf") -> List[str]:
+    """Page-level text of a PDF, extracted once per (file content, extractor, version)."""
+    pdf_path = Path(pdf_path)
+    pdf_hash = sha256_file(pdf_path)
+    pages = load_pages(pdf_path, extractor, pdf_hash)
+    if pages is None:
+        pages = EXTRACTORS[extractor][1](pdf_path)
+        store_pages(pdf_path, extractor, pages, pdf_hash)
+    return pages
+
+
+def get_text(pdf_path: Path, extractor: str = "pymupdf") -> str:
+    """Full text, joined exactly as the extractor itself would have returned it."""
+    return EXTRACTORS[extractor][2].join(get_pages(pdf_path, extractor))
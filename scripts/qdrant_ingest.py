@@ -2,7 +2,9 @@ import json
 import os
 import uuid
 import glob
+import sys
 import argparse  # <--- TASK 5
+from pathlib import Path
 from typing import Iterable, Dict, Any
 from dotenv import load_dotenv
 
@@ -10,9 +12,28 @@ from qdrant_client import QdrantClient
 from qdrant_client.models import (
     Distance, VectorParams, PointStruct,
     OptimizersConfigDiff, ScalarQuantization, ScalarQuantizationConfig,
-    SparseVectorParams  # <--- TASK 2
+    SparseVectorParams, SparseVector  # <--- TASK 2
 )
 from sentence_transformers import SentenceTransformer
+import tiktoken
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.services.sparse_encoder import SparseEncoder, SPARSE_VOCAB_PATH, SPARSE_VECTOR_NAME
+from app.services.indexer import ensure_payload_indexes
+from app.services.embeddings import (
+    load_embedding_model, get_embedding_spec, check_model_dimension, record_collection_embedding,
+    validate_collection_embedding, EMBEDDING_MODEL
+)
+
+try:
+    from scripts.jsonl_io import iter_jsonl
+    from scripts.catalog_validation import ValidationGate, INGEST_SCHEMAS
+    from scripts.catalog_snapshot import open_catalog, is_fresh
+except ImportError:
+    # Lancé en script (python scripts/qdrant_ingest.py) : scripts/ est dans sys.path
+    from jsonl_io import iter_jsonl
+    from catalog_validation import ValidationGate, INGEST_SCHEMAS
+    from catalog_snapshot import open_catalog, is_fresh
 
 # --- CONFIGURATION ---
 load_dotenv()
@@ -20,8 +41,22 @@ load_dotenv()
 COLLECTION_NAME = os.getenv("QDRANT_COLLECTION", "coach_mike")
 
 # MULTILINGUAL UPGRADE: Using a model that understands French queries better
-MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-VECTOR_SIZE = 384  # CRITICAL: This model outputs 384 dim vectors
+# (default of EMBEDDING_MODEL; dimension comes from the EMBEDDING_MODELS registry, same as the retriever)
+MODEL_NAME = EMBEDDING_MODEL
+EMBEDDING_SPEC = get_embedding_spec(MODEL_NAME)
+VECTOR_SIZE = EMBEDDING_SPEC.dim
+
+# Same encoding as RAGGenerator: token counts are stored once in the payload ("n_tokens")
+# so the generator does not re-tokenize every retrieved chunk on each request.
+TOKEN_ENCODING = "cl100k_base"
+
+# Les vecteurs indexés sont la référence (torch) ; les backends de service (quantized / onnx)
+# sont vérifiés à ce modèle près (EMBEDDING_PARITY_MIN_COSINE)
+INGEST_EMBEDDING_BACKEND = os.getenv("INGEST_EMBEDDING_BACKEND", "torch")
+
+# Validation des catalogues avant indexation (schémas compilés de catalog_validation) :
+# "off", "warn" (compte et affiche les erreurs) ou "strict" (les records invalides ne sont pas indexés)
+INGEST_VALIDATION = os.getenv("INGEST_VALIDATION", "warn").lower()
 
 # --- PATHS (Based on your file structure) ---
 # Logic: Single JSONL files
@@ -35,24 +70,27 @@ def get_qdrant_client() -> QdrantClient:
     print(f"🔌 Connecting to Qdrant at {url}...")
     return QdrantClient(url=url, api_key=api_key)
 
+def get_token_encoder():
+    return tiktoken.get_encoding(TOKEN_ENCODING)
+
 def get_embedding_model() -> SentenceTransformer:
     print(f"🧠 Loading Multilingual model: {MODEL_NAME}...")
-    return SentenceTransformer(MODEL_NAME)
+    model = load_embedding_model(MODEL_NAME, backend=INGEST_EMBEDDING_BACKEND)
+    check_model_dimension(model, EMBEDDING_SPEC)
+    return model
 
 def load_jsonl(path: str) -> Iterable[dict]:
     """Reads a single JSONL file."""
     if not os.path.exists(path):
         print(f"   ⚠️ Logic file not found: {path}")
         return []
+    if is_fresh(path):
+        print(f"   📖 Reading Logic: {os.path.basename(path)} (snapshot)")
+        yield from open_catalog(path)
+        return
     print(f"   📖 Reading Logic: {os.path.basename(path)}")
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                try:
-                    yield json.loads(line)
-                except json.JSONDecodeError:
-                    pass
+    # Lignes invalides mises de côté dans <fichier>.rejected.jsonl au lieu d'être perdues en silence
+    yield from iter_jsonl(path, quarantine=f"{path}.rejected.jsonl")
 
 def load_json_directory(directory: str) -> Iterable[dict]:
     """Iterates over all .json files in the exercise directory."""
@@ -78,7 +116,7 @@ def load_json_directory(directory: str) -> Iterable[dict]:
             print(f"   ⚠️ Error reading {os.path.basename(file_path)}")
 
 def recreate_collection(client: QdrantClient):
-    """Resets the collection to fit the new Vector Size (384) AND Sparse config."""
+    """Resets the collection to fit the model's vector size (VECTOR_SIZE) AND Sparse config."""
     if client.collection_exists(COLLECTION_NAME):
         print(f"♻️  Deleting old collection '{COLLECTION_NAME}'...")
         client.delete_collection(COLLECTION_NAME)
@@ -90,13 +128,19 @@ def recreate_collection(client: QdrantClient):
         collection_name=COLLECTION_NAME,
         vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE, on_disk=True),
         sparse_vectors_config={
-            "sparse": SparseVectorParams()
+            SPARSE_VECTOR_NAME: SparseVectorParams()
         },
         optimizers_config=OptimizersConfigDiff(indexing_threshold=1000),
         quantization_config=ScalarQuantization(
             scalar=ScalarQuantizationConfig(type="int8", quantile=0.99, always_ram=True)
         )
     )
+    # Index de payload des champs filtrés (FILTER_SCHEMA de rag_router) : filtrage HNSW sans scan des payloads
+    created = ensure_payload_indexes(client, COLLECTION_NAME)
+    print(f"🗂️  Payload indexes: {', '.join(created) or 'none'}")
+    # Modèle / dimension / normalisation enregistrés avec la collection, vérifiés au démarrage du retriever
+    record_collection_embedding(client, COLLECTION_NAME, EMBEDDING_SPEC, backend=INGEST_EMBEDDING_BACKEND)
+    print(f"🏷️  Embedding metadata: {MODEL_NAME} ({VECTOR_SIZE}d, normalize={EMBEDDING_SPEC.normalize})")
 
 def construct_vector_text(record: Dict[str, Any], domain: str) -> str:
     """Builds the string to be embedded based on domain context."""
@@ -121,6 +165,7 @@ def construct_vector_text(record: Dict[str, Any], domain: str) -> str:
     return " ".join([str(p) for p in parts if p]).strip()
 
 def process_and_ingest(client: QdrantClient, model: SentenceTransformer):
+    encoder = get_token_encoder()
     
     # 1. Define Logic Files to Ingest (The Brain)
     logic_files = [
@@ -134,23 +179,29 @@ def process_and_ingest(client: QdrantClient, model: SentenceTransformer):
         ("balanced_session_examples.jsonl", "example", "session_example")
     ]
 
-    total_points = 0
-    batch = []
+    # Les poids BM25 dépendent de tout le corpus (IDF, longueur moyenne) :
+    # on prépare d'abord tous les documents, puis on encode et on upsert par batch.
+    items = []  # (point_id, text_vector, payload)
     batch_size = 100
 
     # --- STEP A: INGEST LOGIC (JSONL) ---
     print("\n--- PHASE 1: INGESTING LOGIC ---")
+    # Schéma choisi par fichier source (INGEST_SCHEMAS) : les fichiers sans schéma ne sont pas validés
+    gate = ValidationGate(INGEST_SCHEMAS, strict=INGEST_VALIDATION == "strict") if INGEST_VALIDATION != "off" else None
     for filename, domain, doc_type in logic_files:
         path = os.path.join(LOGIC_DIR, filename)
-        for record in load_jsonl(path):
+        records = load_jsonl(path)
+        if gate:
+            records = gate.filter(records, key=filename)
+        for record in records:
             
             text_vector = construct_vector_text(record, domain)
             if not text_vector: continue
 
             # Prepare Point
-            vector = model.encode(text_vector).tolist()
             payload = record.copy()
             payload["text"] = text_vector
+            payload["n_tokens"] = len(encoder.encode(text_vector))
             payload["domain"] = domain
             payload["type"] = doc_type
             
@@ -158,17 +209,14 @@ def process_and_ingest(client: QdrantClient, model: SentenceTransformer):
             rec_id = record.get("id") or record.get("meso_id") or record.get("micro_id")
             point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, str(rec_id) if rec_id else text_vector))
 
-            batch.append(PointStruct(id=point_id, vector=vector, payload=payload))
+            items.append((point_id, text_vector, payload))
 
-            if len(batch) >= batch_size:
-                client.upsert(collection_name=COLLECTION_NAME, points=batch)
-                total_points += len(batch)
-                batch = []
-    
-    if batch:
-        client.upsert(collection_name=COLLECTION_NAME, points=batch)
-        total_points += len(batch)
-        batch = []
+    if gate and gate.report.total:
+        report = gate.report
+        action = "skipped" if gate.strict else "ingested anyway"
+        print(f"   🔎 Validation: {report.valid}/{report.total} valid records ({report.invalid} invalid, {action})")
+        for field, n in report.by_field.most_common(5):
+            print(f"      - {field}: {n}")
 
     # --- STEP B: INGEST EXERCISES (FOLDER OF JSONs) ---
     print("\n--- PHASE 2: INGESTING EXERCISES ---")
@@ -177,9 +225,9 @@ def process_and_ingest(client: QdrantClient, model: SentenceTransformer):
         text_vector = construct_vector_text(record, "exercise")
         if not text_vector: continue
 
-        vector = model.encode(text_vector).tolist()
         payload = record.copy()
         payload["text"] = text_vector
+        payload["n_tokens"] = len(encoder.encode(text_vector))
         payload["domain"] = "exercise"
         payload["type"] = "exercise_ref"
         
@@ -187,17 +235,28 @@ def process_and_ingest(client: QdrantClient, model: SentenceTransformer):
         ex_name = record.get("exercise", "unknown")
         point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, ex_name))
 
-        batch.append(PointStruct(id=point_id, vector=vector, payload=payload))
+        items.append((point_id, text_vector, payload))
 
-        if len(batch) >= batch_size:
-            client.upsert(collection_name=COLLECTION_NAME, points=batch)
-            total_points += len(batch)
-            print(f"   -> Processed {total_points} total items...", end="\r")
-            batch = []
+    # --- STEP C: SPARSE VOCABULARY (BM25) ---
+    sparse_encoder = SparseEncoder.fit(text for _, text, _ in items)
+    sparse_encoder.save(SPARSE_VOCAB_PATH)
+    print(f"\n   🔤 Sparse vocabulary: {len(sparse_encoder)} terms over {sparse_encoder.n_docs} docs -> {SPARSE_VOCAB_PATH}")
 
-    if batch:
+    # --- STEP D: EMBED + UPSERT ---
+    total_points = 0
+    for start in range(0, len(items), batch_size):
+        chunk = items[start:start + batch_size]
+        dense = model.encode([text for _, text, _ in chunk])
+        batch = []
+        for (point_id, text_vector, payload), vector in zip(chunk, dense):
+            indices, values = sparse_encoder.encode_document(text_vector)
+            batch.append(PointStruct(id=point_id, payload=payload, vector={
+                "": vector.tolist(),
+                SPARSE_VECTOR_NAME: SparseVector(indices=indices, values=values),
+            }))
         client.upsert(collection_name=COLLECTION_NAME, points=batch)
         total_points += len(batch)
+        print(f"   -> Processed {total_points} total items...", end="\r")
 
     print(f"\n\n🎉 INGESTION COMPLETE! Total documents in '{COLLECTION_NAME}': {total_points}")
     print("You can now use the Planner Agent.")
@@ -220,5 +279,12 @@ if __name__ == "__main__":
             recreate_collection(client)
         else:
             print(f"✅ Collection '{COLLECTION_NAME}' exists. Switching to UPSERT mode (Non-destructive).")
+            # Upsert avec un autre modèle que celui de la collection : refusé (EmbeddingConfigError)
+            if validate_collection_embedding(client, COLLECTION_NAME, EMBEDDING_SPEC, model) is None:
+                record_collection_embedding(client, COLLECTION_NAME, EMBEDDING_SPEC, backend=INGEST_EMBEDDING_BACKEND)
+            # Index de payload manquants (l'API ne fait que les signaler) : créés ici
+            created = ensure_payload_indexes(client, COLLECTION_NAME)
+            if created:
+                print(f"🗂️  Missing payload indexes created: {', '.join(created)}")
 
     process_and_ingest(client, model)
\ No newline at end of file
@@ -50,19 +50,11 @@ retriever = HybridRetriever(qdrant_client=qdrant_client, collection_name=COLLECT
 generator = RAGGenerator()
 monitor = RAGMonitor()
 
-# --- Chargement BM25 sans rebalayer Qdrant ---
-print("Chargement de l'index BM25...")
-loaded = retriever.load_bm25_state_if_any()
-if not loaded:
-    print("Index BM25 non trouve, construction depuis Qdrant...")
-    try:
-        all_docs = qdrant_client.scroll(collection_name=COLLECTION_NAME, limit=10000)[0]
-        retriever.build_bm25_index(all_docs)
-        print("Index BM25 construit !")
-    except Exception as e:
-        print(f"Erreur BM25 : {e}")
+# --- BM25 : vecteurs sparse calculés à l'ingestion, fusionnés côté Qdrant (RRF) ---
+if retriever.sparse_encoder:
+    print(f"Recherche hybride active (vocabulaire sparse : {len(retriever.sparse_encoder)} termes)")
 else:
-    print("Index BM25 charge depuis le pickle (pas de scan Qdrant) !")
+    print("Vocabulaire sparse absent : recherche dense seule (relancer scripts/qdrant_ingest.py)")
 
 # --- Optionnel : ingestion si demandée ---
 RESET = "--reset" in sys.argv
@@ -85,13 +77,6 @@ if "--ingest" in sys.argv:
                 print(f"[test] Erreur lors de l'ingestion avec reset (code {result.returncode})")
         else:
             ingest_logic_and_program_jsonl()
-        print("\nReconstruction de l'index BM25 après ingestion...")
-        try:
-            all_docs = qdrant_client.scroll(collection_name=COLLECTION_NAME, limit=10000)[0]
-            retriever.build_bm25_index(all_docs)
-            print("Index BM25 reconstruit !\n")
-        except Exception as e:
-            print(f"Erreur lors de la reconstruction BM25 : {e}\n")
     else:
         print("[test] Module d'ingestion non disponible\n")
 
@@ -203,6 +188,8 @@ if ROUTER_AVAILABLE:
     
     print(f"Documents trouvés avec filtres {filters}: {len(retrieved3)}")
     if retrieved3:
+        # Payload projeté par défaut : les champs affichés ici sont récupérés en 2e étape
+        retriever.hydrate(retrieved3[:3], fields=["meso_id", "nom", "niveau", "objectif"])
         for i, doc in enumerate(retrieved3[:3], 1):
             payload = doc.get("payload", {})
             print(f"  {i}. {payload.get('type')} - {payload.get('meso_id', 'N/A')} - {payload.get('nom', 'N/A')[:50]}")
@@ -224,6 +211,7 @@ if ROUTER_AVAILABLE:
     
     print(f"Documents trouvés avec filtres {filters4}: {len(retrieved4)}")
     if retrieved4:
+        retriever.hydrate(retrieved4[:3], fields=["id", "role_micro", "rule_text"])
         for i, doc in enumerate(retrieved4[:3], 1):
             payload = doc.get("payload", {})
             print(f"  {i}. {payload.get('type')} - {payload.get('id', 'N/A')}")
@@ -247,6 +235,7 @@ if ROUTER_AVAILABLE:
     
     print(f"Documents trouvés avec filtres {filters5}: {len(retrieved5)}")
     if retrieved5:
+        retriever.hydrate(retrieved5[:2], fields=["id", "blocks", "rule_text"])
         for i, doc in enumerate(retrieved5[:2], 1):
             payload = doc.get("payload", {})
             print(f"  {i}. {payload.get('type')} - {payload.get('id', 'N/A')}")
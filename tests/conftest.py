@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Imports "app.*" / "scripts.*" depuis la racine du dépôt, comme les scripts
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def byte_encoding():
+    """tiktoken encoding with one token per byte: cl100k_base is downloaded, unusable offline."""
+    import tiktoken
+    return tiktoken.Encoding(
+        name="bytes",
+        pat_str=r""" ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+""",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
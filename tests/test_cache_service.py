@@ -0,0 +1,79 @@
+import os
+import time
+
+from app.services.cache_service import ResponseCache
+
+
+class BrokenRedis:
+    def get(self, *args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+    def set(self, *args, **kwargs):
+        raise ConnectionError("Connection refused")
+
+
+def test_backend_errors_are_misses_not_exceptions():
+    cache = ResponseCache(backend="redis")
+    cache.r = BrokenRedis()
+    assert cache.get("k") is None
+    cache.set("k", {"answer": "a"})  # ne lève pas
+    # La réponse reste servie par le LRU mémoire
+    assert cache.get("k") == {"answer": "a"}
+    stats = cache.stats()
+    assert stats["errors"] == 2 and stats["misses"] == 1 and stats["hits"] == 1
+
+
+def test_disk_write_failure_does_not_raise(tmp_path):
+    cache = ResponseCache(backend="disk", cache_dir=str(tmp_path))
+    # Dossier devenu inutilisable (ici un fichier) : l'écriture échoue comme sur un disque plein
+    (tmp_path / "not_a_dir").write_text("x")
+    cache.cache_dir = str(tmp_path / "not_a_dir")
+    cache.set("k", {"answer": "a"})
+    assert cache.stats()["errors"] == 1
+
+
+def test_disk_entries_expire_after_ttl(tmp_path):
+    cache = ResponseCache(backend="disk", cache_dir=str(tmp_path), ttl=60)
+    cache.set("old", {"answer": "a"})
+    path = tmp_path / "old.json"
+    os.utime(path, (time.time() - 120, time.time() - 120))
+
+    fresh = ResponseCache(backend="disk", cache_dir=str(tmp_path), ttl=60)  # LRU mémoire vide
+    assert fresh.get("old") is None
+    assert not path.exists()
+
+
+def test_disk_size_is_bounded(tmp_path):
+    cache = ResponseCache(backend="disk", cache_dir=str(tmp_path), disk_max=10)
+    now = time.time()
+    for i in range(25):
+        cache.set(f"k{i:02d}", {"answer": i})
+        os.utime(tmp_path / f"k{i:02d}.json", (now - 100 + i, now - 100 + i))
+    files = sorted(p.name for p in tmp_path.glob("*.json"))
+    assert len(files) <= 10
+    assert "k24.json" in files and "k00.json" not in files  # les plus anciennes partent
+
+
+def test_memory_entries_expire_after_ttl(monkeypatch):
+    cache = ResponseCache(backend="memory", ttl=60)
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+    cache.set("k", {"answer": "a"})
+    assert cache.get("k") == {"answer": "a"}
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["misses"] == 1
+
+
+def test_memory_copy_of_disk_entry_keeps_its_disk_age(tmp_path, monkeypatch):
+    cache = ResponseCache(backend="disk", cache_dir=str(tmp_path), ttl=60)
+    cache.set("k", {"answer": "a"})
+    now = time.time()
+    os.utime(tmp_path / "k.json", (now - 50, now - 50))
+
+    fresh = ResponseCache(backend="disk", cache_dir=str(tmp_path), ttl=60)
+    assert fresh.get("k") == {"answer": "a"}  # 50 s sur disque, chargée en mémoire
+    # 15 s plus tard la réponse a 65 s : expirée partout, la copie mémoire comprise
+    monkeypatch.setattr(time, "time", lambda: now + 15)
+    assert fresh.get("k") is None
+    assert not (tmp_path / "k.json").exists()
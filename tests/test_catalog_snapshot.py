@@ -0,0 +1,133 @@
+import json
+import math
+import os
+
+import pytest
+
+import scripts.catalog_snapshot as catalog_snapshot
+from scripts.jsonl_io import load_jsonl
+from scripts.catalog_snapshot import CatalogSnapshot, MISSING, build_snapshot, is_fresh, open_catalog, snapshot_path
+
+RECORDS = [
+    {"id": "m1", "niveau": "Débutant", "séries": 3, "charge": 0.5, "actif": True,
+     "variables": {"I": "70%", "T": "30''", "détail": {"tempo": "3-1-1", "liste": [1, 2.5, None]}},
+     "mixte": 1, "big": 2 ** 70, "nan": float("nan"), "vide": None},
+    {"niveau": "Avancé", "id": "m2", "séries": 5, "charge": float("inf"), "actif": False,
+     "variables": {}, "mixte": "deux", "tags": ["force", "jambes"], "nan": 1.0},
+    {"id": "m3", "niveau": "Débutant", "charge": -0.25, "actif": True, "variables": {"I": None},
+     "mixte": [3], "tags": [], "nan": float("-inf"), "texte": "ligne\navec \"guillemets\" et  "},
+    {"id": "m4", "niveau": "Débutant", "séries": 0, "charge": 1e-300, "actif": False, "variables": {"S": 4},
+     "mixte": None, "nan": float("nan")},
+]
+
+
+def _canonical(records):
+    # NaN != NaN : comparaison sur le texte JSON, ordre des clés compris
+    return [json.dumps(r, ensure_ascii=False) for r in records]
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_snapshot, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    return tmp_path / "snapshots"
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "meso_catalog.jsonl"
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in RECORDS), encoding="utf-8")
+    return path
+
+
+def test_round_trip_from_disk(source, snapshot_dir):
+    snap = CatalogSnapshot.open(build_snapshot(source))
+    assert len(snap) == len(RECORDS)
+    assert _canonical(snap) == _canonical(RECORDS)
+    assert _canonical(snap[i] for i in range(len(snap))) == _canonical(RECORDS)
+    assert _canonical([snap[-1]]) == _canonical(RECORDS[-1:])
+    # Ordre des clés de chaque record conservé
+    assert [list(r) for r in snap] == [list(r) for r in RECORDS]
+
+
+def test_round_trip_in_memory_and_column_kinds():
+    snap = CatalogSnapshot.from_records(RECORDS)
+    assert _canonical(snap) == _canonical(RECORDS)
+    kinds = {c["name"]: c["kind"] for c in snap.meta["columns"]}
+    assert kinds["niveau"] == "cat" and kinds["id"] == "str"
+    assert kinds["séries"] == "int" and kinds["charge"] == "float" and kinds["actif"] == "bool"
+    assert kinds["variables"] == kinds["mixte"] == kinds["big"] == "json"
+
+
+def test_missing_keys_are_not_nulls():
+    snap = CatalogSnapshot.from_records(RECORDS)
+    assert snap.column("séries")[2] is MISSING
+    assert "séries" not in snap[2]
+    assert snap.column("vide")[0] is None and snap.column("vide")[1] is MISSING
+    assert snap.column("tags").to_list() == [None, ["force", "jambes"], [], None]
+    assert snap.column("séries").to_list(default=-1) == [3, 5, -1, 0]
+
+
+def test_non_finite_floats_survive():
+    snap = CatalogSnapshot.from_records(RECORDS)
+    nan = snap.column("nan").values()
+    assert math.isnan(nan[0]) and nan[1] == 1.0 and nan[2] == -math.inf and math.isnan(nan[3])
+    assert snap.column("charge")[1] == math.inf
+    assert snap.column("big")[0] == 2 ** 70
+
+
+def test_field_projection():
+    snap = CatalogSnapshot.from_records(RECORDS)
+    assert snap.record(1, fields=["id", "variables"]) == {"id": "m2", "variables": {}}
+    assert list(snap.records(fields=["niveau"])) == [{"niveau": r["niveau"]} for r in RECORDS]
+    with pytest.raises(KeyError):
+        snap.column("absent")
+
+
+def test_open_catalog_builds_then_reuses_snapshot(source, snapshot_dir):
+    assert not is_fresh(source)
+    first = open_catalog(source)
+    assert is_fresh(source) and (snapshot_path(source) / "meta.json").exists()
+    assert _canonical(first) == _canonical(RECORDS)
+    meta_mtime = os.stat(snapshot_path(source) / "meta.json").st_mtime_ns
+    assert _canonical(open_catalog(source)) == _canonical(RECORDS)
+    assert os.stat(snapshot_path(source) / "meta.json").st_mtime_ns == meta_mtime
+
+
+def test_source_change_triggers_rebuild(source, snapshot_dir):
+    open_catalog(source)
+    with source.open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "m5", "niveau": "Avancé"}, ensure_ascii=False) + "\n")
+    assert not is_fresh(source)
+    snap = open_catalog(source)
+    assert is_fresh(source)
+    assert len(snap) == 5 and snap[4] == {"id": "m5", "niveau": "Avancé"}
+
+
+def test_same_size_edit_is_detected_by_mtime(source, snapshot_dir):
+    open_catalog(source)
+    text = source.read_text(encoding="utf-8").replace('"m1"', '"x1"')
+    stat = source.stat()
+    source.write_text(text, encoding="utf-8")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert source.stat().st_size == stat.st_size
+    assert not is_fresh(source)
+    assert open_catalog(source)[0]["id"] == "x1"
+
+
+def test_without_autobuild_reads_jsonl_and_writes_nothing(source, snapshot_dir):
+    snap = open_catalog(source, autobuild=False)
+    assert _canonical(snap) == _canonical(RECORDS)
+    assert not snapshot_path(source).exists()
+
+
+def test_format_version_change_invalidates(source, snapshot_dir, monkeypatch):
+    build_snapshot(source)
+    assert is_fresh(source)
+    monkeypatch.setattr(catalog_snapshot, "SNAPSHOT_FORMAT_VERSION", catalog_snapshot.SNAPSHOT_FORMAT_VERSION + 1)
+    assert not is_fresh(source)
+
+
+@pytest.mark.parametrize("name", ["meso_catalog.jsonl", "micro_catalog.jsonl", "macro_to_micro_rules.jsonl"])
+def test_data2_catalogs_round_trip(name):
+    records = load_jsonl(catalog_snapshot.BASE_DIR / "data2" / name)
+    assert _canonical(CatalogSnapshot.from_records(records)) == _canonical(records)
@@ -0,0 +1,44 @@
+import copy
+from pathlib import Path
+
+from scripts.catalog_validation import ValidationGate, INGEST_SCHEMAS
+from scripts.jsonl_io import load_jsonl
+from scripts.migrate_db_safe import transform_meso, extract_micro_structure
+
+DATA2 = Path(__file__).resolve().parent.parent / "data2"
+
+
+def _v2(path, transform):
+    # Records v2 = records data2 passés par les transformations de migrate_db_safe
+    return [transform(copy.deepcopy(r)) for r in load_jsonl(path)]
+
+
+def test_v2_meso_records_pass_strict_gate():
+    records = _v2(DATA2 / "meso_catalog.jsonl", transform_meso)
+    gate = ValidationGate(INGEST_SCHEMAS, strict=True)
+    kept = list(gate.filter(records, key="meso_catalog_v2.jsonl"))
+    assert len(kept) == len(records) > 0
+    assert gate.report.invalid == 0, gate.report.examples
+
+
+def test_v2_micro_records_pass_strict_gate():
+    records = _v2(DATA2 / "micro_catalog.jsonl", extract_micro_structure)
+    gate = ValidationGate(INGEST_SCHEMAS, strict=True)
+    kept = list(gate.filter(records, key="micro_catalog_v2.jsonl"))
+    assert len(kept) == len(records) > 0
+    assert gate.report.invalid == 0, gate.report.examples
+
+
+def test_invalid_v2_record_is_dropped_in_strict_mode():
+    record = transform_meso(copy.deepcopy(load_jsonl(DATA2 / "meso_catalog.jsonl")[0]))
+    del record["constraints"]
+    gate = ValidationGate(INGEST_SCHEMAS, strict=True)
+    assert list(gate.filter([record], key="meso_catalog_v2.jsonl")) == []
+    assert gate.report.by_field["constraints"] == 1
+
+
+def test_file_without_schema_is_not_gated():
+    gate = ValidationGate(INGEST_SCHEMAS, strict=True)
+    records = [{"type": "planner_rule", "anything": None}]
+    assert list(gate.filter(records, key="planner_schema.jsonl")) == records
+    assert gate.report.total == 0
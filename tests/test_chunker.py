@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from app.services import chunker as chunker_module
+from app.services.chunker import SemanticChunker
+
+# Pages PDF typiques : sauts de page (\x0c), séparateurs \x1c /   laissés par l'extraction
+PAGES = [
+    "MOBILITÉ DES HANCHES\nÉchauffement articulaire\x0cconsignes:\ngarder le dos droit",
+    "1. Squat bulgare\n- 3 séries\x1c- tempo lent  Variantes\n",
+    "",
+    "Fentes avant\r\nGainage\r",
+    "Erreurs fréquentes\x0c\x0cgenoux rentrés\n\n",
+    "Pompes inclinées " * 40,
+]
+METADATA = {"source": "test.pdf"}
+
+
+@pytest.fixture
+def chunker(monkeypatch, byte_encoding):
+    monkeypatch.setattr(chunker_module.tiktoken, "get_encoding", lambda name: byte_encoding)
+    return SemanticChunker(chunk_size=64, overlap=8)
+
+
+def test_iter_lines_splits_text_like_splitlines():
+    rng = random.Random(0)
+    alphabet = ["a", "B", " ", "\n", "\r", "\r\n", "\x0b", "\x0c", "\x1c", "\x1e", "\x85", " ", " "]
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        assert list(SemanticChunker._iter_lines(text)) == text.splitlines()
+
+
+def test_iter_chunks_matches_chunk_document_for_text(chunker):
+    text = "\n".join(PAGES)
+    assert list(chunker.iter_chunks(text, METADATA)) == chunker.chunk_document(text, METADATA)
+
+
+def test_iter_chunks_matches_chunk_document_for_pages(chunker):
+    expected = chunker.chunk_document("\n".join(PAGES), METADATA)
+    assert list(chunker.iter_chunks(iter(PAGES), METADATA)) == expected
+    assert len(expected) > 5
+
+
+def test_iter_chunks_matches_chunk_document_for_random_pages(chunker):
+    rng = random.Random(1)
+    alphabet = ["exercice", "SÉRIES LOURDES", "- item", " ", "\n", "\r", "\r\n", "\x0c", "\x1c", " "]
+    for _ in range(200):
+        pages = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8))) for _ in range(rng.randint(1, 4))]
+        assert list(chunker.iter_chunks(pages, METADATA)) == chunker.chunk_document("\n".join(pages), METADATA)
@@ -0,0 +1,75 @@
+import copy
+
+import pytest
+
+from app.services.context_packer import ContextPacker
+
+
+def doc(doc_id, score, n_tokens=None, text=None):
+    d = {"id": doc_id, "score": score, "text": text if text is not None else doc_id}
+    if n_tokens is not None:
+        d["payload"] = {"n_tokens": n_tokens}
+    return d
+
+
+@pytest.fixture
+def packer(byte_encoding):
+    return ContextPacker(byte_encoding, max_docs=5, allow_truncation=False)
+
+
+def ids(docs):
+    return [d["id"] for d in docs]
+
+
+def test_knapsack_beats_greedy_when_first_doc_is_long(packer):
+    # Glouton par score : "a" (60) puis "b" ne rentre plus => 0.9 ; sac à dos : b + c => 1.5
+    docs = [doc("a", 0.9, 60), doc("b", 0.8, 50), doc("c", 0.7, 50)]
+    assert ids(packer.pack(docs, 100)) == ["b", "c"]
+    # Budget suffisant pour le plus long seul : le mieux noté gagne
+    assert ids(packer.pack(docs, 60)) == ["a"]
+
+
+def test_negative_scores_are_still_packed(packer):
+    # Scores de cross-encoder (logits) négatifs : décalés, jamais ignorés
+    docs = [doc("a", -1.0, 200), doc("b", -2.0, 60), doc("c", -3.0, 40)]
+    assert ids(packer.pack(docs, 100)) == ["b", "c"]
+    assert ids(packer.pack(docs, 50)) == ["c"]
+
+
+def test_zero_budget_packs_nothing(packer):
+    assert packer.pack([doc("a", 1.0, 10)], 0) == []
+    assert packer.pack([], 100) == []
+
+
+def test_max_docs_is_respected(byte_encoding):
+    packer = ContextPacker(byte_encoding, max_docs=2, allow_truncation=False)
+    docs = [doc(str(i), 1.0 - i / 10, 5) for i in range(5)]
+    assert ids(packer.pack(docs, 1000)) == ["0", "1"]
+
+
+def test_retrieval_results_are_not_mutated(packer):
+    docs = [doc("a", 0.9, text="Squat bulgare."), doc("b", 0.5, 12)]
+    before = copy.deepcopy(docs)
+    packer.pack(docs, 100)
+    assert docs == before
+    assert packer.count_tokens(docs[0]) == len("Squat bulgare.")
+
+
+def test_truncated_fragment_ends_on_sentence_and_fits_budget(byte_encoding):
+    packer = ContextPacker(byte_encoding, max_docs=5, allow_truncation=True, min_fragment_tokens=10)
+    long_text = "Garder le dos droit. Descendre lentement ! Pousser sur les talons ? Expirer en montant; Répéter."
+    docs = [doc("a", 0.9, 30), doc("b", 0.5, text=long_text)]
+    for budget in range(40, 30 + len(long_text.encode("utf-8"))):
+        packed = packer.pack(docs, budget)
+        assert packed[0]["id"] == "a"
+        if len(packed) == 1:
+            continue
+        fragment = packed[1]
+        n_tokens = fragment["payload"]["n_tokens"]
+        assert fragment["payload"]["truncated"] is True
+        assert n_tokens == len(byte_encoding.encode(fragment["text"]))
+        assert 30 + n_tokens <= budget
+        assert long_text.startswith(fragment["text"]) and fragment["text"][-1] in ".!?;"
+    # Budget trop court pour une phrase complète de min_fragment_tokens : pas de fragment
+    assert ids(packer.pack(docs, 45)) == ["a"]
+    assert "payload" not in docs[1]
@@ -0,0 +1,78 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import app.services.embeddings as embeddings
+from app.services.embeddings import load_embedding_model, pool, check_parity
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_import_does_not_load_sentence_transformers():
+    # Backend onnx : ni torch ni sentence_transformers dans le process de l'API
+    code = ("import sys; import app.services.embeddings, app.services.retriever; "
+            "print('sentence_transformers' in sys.modules, 'torch' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["False", "False"]
+
+
+def test_onnx_backend_without_export_fails_fast(tmp_path, monkeypatch):
+    monkeypatch.setattr(embeddings, "EMBEDDING_ONNX_DIR", str(tmp_path))
+    with pytest.raises(FileNotFoundError, match="embedding_parity.py"):
+        load_embedding_model("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2", backend="onnx")
+    assert list(tmp_path.iterdir()) == []  # rien exporté au démarrage
+
+
+def test_mean_pooling_ignores_padding():
+    tokens = np.array([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0]])
+    assert np.allclose(pool(tokens, mask), [[2.0, 3.0]])
+    normalized = pool(tokens, mask, normalize=True)
+    assert np.isclose(np.linalg.norm(normalized), 1.0)
+    assert np.allclose(pool(tokens, mask, mode="cls"), [[1.0, 2.0]])
+
+
+def _tiny_sentence_transformer(path: Path):
+    """Random 2-layer BERT + mean pooling saved as a sentence-transformers model directory."""
+    from transformers import BertConfig, BertModel, BertTokenizer
+    from sentence_transformers import SentenceTransformer, models
+
+    words = sorted({w for text in embeddings.PARITY_TEXTS for w in text.lower().split()})
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words
+    hf_dir = path / "hf"
+    hf_dir.mkdir()
+    (hf_dir / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    BertTokenizer(str(hf_dir / "vocab.txt")).save_pretrained(hf_dir)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=128)
+    BertModel(config).save_pretrained(hf_dir)
+    transformer = models.Transformer(str(hf_dir), max_seq_length=64)
+    st_dir = path / "st"
+    SentenceTransformer(modules=[transformer, models.Pooling(32)]).save(str(st_dir))
+    return str(st_dir)
+
+
+def test_onnx_export_matches_torch(tmp_path, monkeypatch):
+    pytest.importorskip("torch")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("transformers")
+    pytest.importorskip("sentence_transformers")
+    from sentence_transformers import SentenceTransformer
+
+    model_path = _tiny_sentence_transformer(tmp_path)
+    monkeypatch.setattr(embeddings, "EMBEDDING_ONNX_DIR", str(tmp_path / "onnx"))
+    out_dir = embeddings.export_onnx(model_path, quantize=False)
+
+    onnx_model = embeddings.OnnxEmbedder(out_dir)
+    reference = SentenceTransformer(model_path, device="cpu")
+    assert onnx_model.get_sentence_embedding_dimension() == 32
+    assert onnx_model.encode("Tabata modifié").shape == (32,)
+    report = check_parity(onnx_model, reference, min_cosine=0.999)
+    assert report["ok"]
+    # Même sortie que le modèle torch, pas seulement la même direction
+    a = onnx_model.encode(list(embeddings.PARITY_TEXTS))
+    b = reference.encode(list(embeddings.PARITY_TEXTS))
+    assert np.allclose(a, b, atol=1e-4)
@@ -0,0 +1,38 @@
+import copy
+from pathlib import Path
+
+import pytest
+
+import scripts.generate_plan as generate_plan
+from scripts.generate_plan import generate_weekly_plan, planner_profile
+from scripts.jsonl_io import load_jsonl
+from scripts.migrate_db_safe import transform_meso, extract_micro_structure
+
+DATA2 = Path(__file__).resolve().parent.parent / "data2"
+
+
+@pytest.fixture(autouse=True)
+def v2_catalogs(monkeypatch):
+    # Catalogues v2 reconstruits depuis data2 (data/processed n'est pas versionné)
+    meso = [transform_meso(copy.deepcopy(r)) for r in load_jsonl(DATA2 / "meso_catalog.jsonl")]
+    micro = [extract_micro_structure(copy.deepcopy(r)) for r in load_jsonl(DATA2 / "micro_catalog.jsonl")]
+    monkeypatch.setattr(generate_plan, "load_catalogs", lambda: (meso, micro))
+
+
+def test_null_profile_fields_use_defaults():
+    row = {"user_id": "u1", "level": None, "goal": None, "days_per_week": None, "equipment": None}
+    profile = planner_profile(row)
+    assert profile == {"level": "Intermédiaire", "goal": "Renforcement", "schedule": 3, "equipment": []}
+    plan = generate_weekly_plan(profile)
+    assert "error" not in plan
+    assert len(plan["sessions"]) == 3
+
+
+def test_request_override_wins_over_null_column():
+    assert planner_profile({"days_per_week": None}, days_per_week=4)["schedule"] == 4
+    assert planner_profile({"days_per_week": 5})["schedule"] == 5
+
+
+def test_planner_tolerates_null_fields_directly():
+    plan = generate_weekly_plan({"level": None, "goal": None, "schedule": None, "equipment": None})
+    assert "error" not in plan and len(plan["sessions"]) == 3
@@ -0,0 +1,67 @@
+import json
+import os
+import math
+import stat
+
+from scripts.jsonl_io import dumps, loads, write_jsonl, load_jsonl
+
+
+def _mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_new_file_gets_umask_default_mode(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        path = tmp_path / "out.jsonl"
+        write_jsonl(path, [{"a": 1}])
+    finally:
+        os.umask(umask)
+    # pas le 0600 de mkstemp
+    assert _mode(path) & 0o044 == 0o044
+
+
+def test_rewrite_keeps_mode_of_replaced_file(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    path.write_text('{"a": 1}\n', encoding="utf-8")
+    os.chmod(path, 0o640)
+    write_jsonl(path, [{"a": 2}])
+    assert _mode(path) == 0o640
+    assert load_jsonl(path) == [{"a": 2}]
+
+
+def test_nan_and_infinity_round_trip():
+    record = loads(b'{"x": NaN, "y": Infinity, "z": -Infinity, "n": null}')
+    assert math.isnan(record["x"]) and record["y"] == math.inf and record["z"] == -math.inf
+    assert record["n"] is None
+    again = loads(dumps(record))
+    assert math.isnan(again["x"]) and again["y"] == math.inf and again["n"] is None
+
+
+def test_nan_lines_are_read_not_quarantined(tmp_path):
+    path = tmp_path / "in.jsonl"
+    path.write_text('{"a": NaN}\n{"a": 1}\n', encoding="utf-8")
+    quarantine = tmp_path / "bad.jsonl"
+    records = load_jsonl(path, quarantine=quarantine)
+    assert len(records) == 2 and math.isnan(records[0]["a"])
+    assert not quarantine.exists()
+
+
+def test_output_matches_stdlib_format_byte_for_byte(tmp_path):
+    records = [
+        {"nom": "Séance « full body »", "durée": 45.5, "tags": ["a", "b"], "meta": {"x": None, "y": True}},
+        {"big": 2 ** 70, "nan": float("nan"), "sep": "a,b:c", "ligne": " "},
+    ]
+    expected = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+    assert [dumps(r) for r in records] == [json.dumps(r, ensure_ascii=False) for r in records]
+    path = tmp_path / "out.jsonl"
+    write_jsonl(path, records)
+    assert path.read_bytes() == expected
+
+
+def test_rewriting_unchanged_file_keeps_its_bytes(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    path.write_text('{"id": "m1", "niveau": "Débutant", "séries": [3, 4]}\n', encoding="utf-8")
+    before = path.read_bytes()
+    write_jsonl(path, load_jsonl(path))
+    assert path.read_bytes() == before
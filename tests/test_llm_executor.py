@@ -0,0 +1,97 @@
+import sys
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+from llm_executor import LLMExecutor, is_retryable  # noqa: E402
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeClient:
+    """AsyncOpenAI-like client: answers "ok:<prompt>", or raises for prompts listed in `errors` (status or exception)."""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        self.calls += 1
+        prompt = request["messages"][0]["content"]
+        if prompt in self.errors:
+            error = self.errors[prompt]
+            raise error if isinstance(error, Exception) else HTTPError(error)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"ok:{prompt}"))])
+
+
+def _items(*prompts):
+    return [(p, {"model": "m", "messages": [{"role": "user", "content": p}], "max_tokens": 10}) for p in prompts]
+
+
+def test_journal_survives_run_until_cleared(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    first = LLMExecutor(journal_path=journal, client=FakeClient())
+    assert first.run_all(_items("a", "b")) == {"a": "ok:a", "b": "ok:b"}
+    # Sortie pas encore écrite (crash simulé) : le journal est toujours là
+    assert journal.exists()
+
+    client = FakeClient()
+    second = LLMExecutor(journal_path=journal, client=client)
+    assert second.run_all(_items("a", "b")) == {"a": "ok:a", "b": "ok:b"}
+    assert client.calls == 0 and second.stats["resumed"] == 2
+
+    second.clear_journal()
+    assert not journal.exists()
+
+
+def test_client_error_is_not_retried_and_reported_as_permanent(tmp_path, capsys):
+    client = FakeClient(errors={"bad": 400, "busy": 503})
+    executor = LLMExecutor(journal_path=tmp_path / "j.jsonl", client=client, max_retries=0)
+    results = executor.run_all(_items("bad", "busy", "good"))
+    assert results == {"bad": None, "busy": None, "good": "ok:good"}
+    assert executor.failures == {"bad": False, "busy": True}
+    assert executor.failure_hint("bad") == "erreur non récupérable, requête à corriger"
+    assert executor.failure_hint("busy") == "relancer le script pour reprendre"
+    err = capsys.readouterr().err
+    assert "bad: erreur non récupérable (HTTP 400" in err
+    assert "busy: échec après 0 retries" in err and "relancer pour reprendre" in err
+
+
+_REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+@pytest.mark.parametrize("error", [
+    HTTPError(429), HTTPError(500), HTTPError(503),
+    openai.APIConnectionError(request=_REQUEST), openai.APITimeoutError(request=_REQUEST),
+    asyncio.TimeoutError(), ConnectionResetError(), OSError("network unreachable"),
+])
+def test_transient_errors_are_retryable(error):
+    assert is_retryable(error)
+
+
+@pytest.mark.parametrize("error", [
+    HTTPError(400), HTTPError(401), HTTPError(404), HTTPError(422),
+    KeyError("choices"), TypeError("bug"), ValueError("bad"), json.JSONDecodeError("x", "", 0),
+])
+def test_bugs_and_client_errors_are_not_retryable(error):
+    assert not is_retryable(error)
+
+
+def test_bug_is_not_retried_with_backoff(tmp_path, capsys):
+    client = FakeClient(errors={"bug": KeyError("choices")})
+    executor = LLMExecutor(journal_path=tmp_path / "j.jsonl", client=client, max_retries=5)
+    assert executor.run_all(_items("bug")) == {"bug": None}
+    assert client.calls == 1 and executor.stats["retries"] == 0
+    assert executor.failures == {"bug": False}
+    assert "bug: erreur non récupérable (KeyError" in capsys.readouterr().err
@@ -0,0 +1,90 @@
+import numpy as np
+
+from app.services.local_store import LocalVectorStore, matches_filter
+from app.services.rag_router import build_filters
+
+PAYLOADS = [
+    {"text": "squat", "domain": "exercise", "niveau": "Débutant", "tags": ["jambes", "force"]},
+    {"text": "pompes", "domain": "exercise", "niveau": "Avancé", "tags": ["pecs"]},
+    {"text": "programme 3 jours", "domain": "program", "niveau": "Débutant", "meta": {"split": "full_body"}},
+    {"text": "gainage", "domain": "exercise", "niveau": "Intermédiaire", "tags": ["abdos", "force"]},
+]
+
+
+def make_store():
+    # Vecteurs 2-D : le cosinus avec [1, 0] décroît de l'id 1 à l'id 4
+    angles = np.radians([0, 30, 60, 90])
+    vectors = np.stack([np.cos(angles), np.sin(angles)], axis=1).astype(np.float32)
+    return LocalVectorStore([1, 2, 3, 4], vectors, PAYLOADS)
+
+
+def cond(key, **match):
+    return {"key": key, "match": match}
+
+
+def test_search_orders_by_cosine_and_honours_limit():
+    store = make_store()
+    hits = store.search([2.0, 0.0], limit=3)
+    assert [h.id for h in hits] == [1, 2, 3]
+    assert hits[0].score == np.float32(1.0) and hits[0].score > hits[1].score > hits[2].score
+    assert [h.id for h in store.search([0.0, 1.0], limit=10)] == [4, 3, 2, 1]
+    assert store.search([1.0, 0.0], limit=0) == []
+
+
+def test_search_limit_capped_by_filtered_count():
+    store = make_store()
+    hits = store.search([1.0, 0.0], {"must": [cond("domain", value="program")]}, limit=5)
+    assert [h.id for h in hits] == [3]
+    assert store.search([1.0, 0.0], {"must": [cond("domain", value="absent")]}, limit=5) == []
+
+
+def test_matches_filter_clauses():
+    squat, pompes, programme, gainage = PAYLOADS
+    must = {"must": [cond("domain", value="exercise"), cond("niveau", value="Débutant")]}
+    assert matches_filter(squat, must) and not matches_filter(pompes, must) and not matches_filter(programme, must)
+
+    should = {"should": [cond("niveau", value="Avancé"), cond("domain", value="program")]}
+    assert [matches_filter(p, should) for p in PAYLOADS] == [False, True, True, False]
+
+    must_not = {"must_not": [cond("niveau", value="Avancé")]}
+    assert [matches_filter(p, must_not) for p in PAYLOADS] == [True, False, True, True]
+
+    # Tableau dans le payload : match si l'une des valeurs correspond, comme Qdrant
+    any_tag = {"must": [cond("tags", any=["abdos", "pecs"])]}
+    assert [matches_filter(p, any_tag) for p in PAYLOADS] == [False, True, False, True]
+
+    nested = {"must": [cond("meta.split", value="full_body")]}
+    assert [matches_filter(p, nested) for p in PAYLOADS] == [False, False, True, False]
+
+    combined = {"must": [cond("tags", value="force")], "must_not": [cond("niveau", value="Débutant")]}
+    assert [matches_filter(p, combined) for p in PAYLOADS] == [False, False, False, True]
+    assert matches_filter(squat, None) and matches_filter(squat, {})
+
+
+def test_build_filters_spec_is_evaluated_like_a_plain_dict():
+    spec = build_filters("retrieval", {"level": "débutant"}, {"query": "un programme sur 3 semaines"})
+    payloads = [
+        {"domain": "program", "difficulty_level": "Débutant"},
+        {"domain": "program", "difficulty_level": "Avancé"},
+        {"domain": "program"},
+        {"domain": "exercise", "difficulty_level": "Débutant"},
+    ]
+    plain = {clause: [dict(c) for c in spec.get(clause, ())] for clause in ("must", "should", "must_not")}
+    assert [matches_filter(p, spec) for p in payloads] == [matches_filter(p, plain) for p in payloads]
+    assert [matches_filter(p, spec) for p in payloads] == [True, False, False, False]
+
+
+def test_filter_mask_is_cached_per_canonical_filter():
+    store = make_store()
+    a = {"must": [cond("domain", value="exercise"), cond("tags", value="force")]}
+    reordered = {"must": [cond("tags", value="force"), cond("domain", value="exercise")]}
+    first = store.search([1.0, 0.0], a, limit=4)
+    assert len(store._masks) == 1
+    mask = next(iter(store._masks.values()))
+    assert [h.id for h in store.search([1.0, 0.0], reordered, limit=4)] == [h.id for h in first] == [1, 4]
+    assert len(store._masks) == 1 and next(iter(store._masks.values())) is mask
+    assert mask.tolist() == [True, False, False, True]
+    store.search([1.0, 0.0], {"must": [cond("domain", value="program")]}, limit=4)
+    assert len(store._masks) == 2
+    store.search([1.0, 0.0], None, limit=4)
+    assert len(store._masks) == 2
@@ -0,0 +1,81 @@
+import json
+from pathlib import Path
+
+import pytest
+
+import scripts.migrate_db_safe as migrate
+from scripts.jsonl_io import load_jsonl
+
+DATA2 = Path(__file__).resolve().parent.parent / "data2"
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    lines = (DATA2 / "meso_catalog.jsonl").read_text(encoding="utf-8").splitlines()[:20]
+    src = tmp_path / "meso_catalog.jsonl"
+    src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return src, tmp_path / "meso_catalog_v2.jsonl"
+
+
+@pytest.fixture
+def transformed():
+    calls = []
+
+    def transform_meso(record):
+        calls.append(record["meso_id"])
+        return migrate.transform_meso(record)
+
+    return transform_meso, calls
+
+
+def run(catalog, transformer):
+    src, out = catalog
+    migrate.process_file(str(src), str(out), transformer, workers=1)
+    return out.read_bytes()
+
+
+def test_second_run_reuses_unchanged_lines(catalog, transformed):
+    transformer, calls = transformed
+    first = run(catalog, transformer)
+    assert len(calls) == 20
+    calls.clear()
+    assert run(catalog, transformer) == first
+    assert calls == []
+
+
+def test_edited_line_is_reprocessed(catalog, transformed):
+    transformer, calls = transformed
+    src, out = catalog
+    run(catalog, transformer)
+    lines = src.read_text(encoding="utf-8").splitlines()
+    record = json.loads(lines[3])
+    record["variables"]["S"] = "5"
+    lines[3] = json.dumps(record, ensure_ascii=False)
+    src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    calls.clear()
+    run(catalog, transformer)
+    assert calls == [record["meso_id"]]
+    output = load_jsonl(out)
+    assert len(output) == 20
+    assert output[3] == migrate.transform_meso(record)
+
+
+def test_serializer_change_invalidates_previous_outputs(catalog, transformed, monkeypatch, tmp_path):
+    transformer, calls = transformed
+    run(catalog, transformer)
+
+    # Backend JSON différent (orjson absent / installé) : plus rien n'est réutilisé
+    monkeypatch.setattr(migrate, "_json_backend", lambda: "other backend")
+    calls.clear()
+    run(catalog, transformer)
+    assert len(calls) == 20
+
+    # Source de jsonl_io modifiée
+    jsonl_io_copy = tmp_path / "jsonl_io.py"
+    jsonl_io_copy.write_text(Path(migrate.jsonl_io.__file__).read_text(encoding="utf-8") + "\n# changed\n",
+                             encoding="utf-8")
+    monkeypatch.setattr(migrate.jsonl_io, "__file__", str(jsonl_io_copy))
+    calls.clear()
+    run(catalog, transformer)
+    assert len(calls) == 20
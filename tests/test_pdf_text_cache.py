@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+import scripts.pdf_text_cache as pdf_text_cache
+from scripts.pdf_text_cache import get_pages, get_text, load_pages, store_pages
+
+
+class FakeExtractor:
+    """Stands in for a PDF library: pages = the file's lines, counts extractions."""
+
+    def __init__(self):
+        self.version = "1.0"
+        self.calls = 0
+
+    def pages(self, path):
+        self.calls += 1
+        return path.read_text(encoding="utf-8").split("\n")
+
+
+@pytest.fixture
+def extractor(tmp_path, monkeypatch):
+    fake = FakeExtractor()
+    monkeypatch.setattr(pdf_text_cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setitem(pdf_text_cache.EXTRACTORS, "fake", (lambda: fake.version, fake.pages, "\f"))
+    return fake
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "meso.pdf"
+    path.write_text("page 1\npage 2 — séries", encoding="utf-8")
+    return path
+
+
+def test_miss_then_hit(extractor, pdf):
+    assert load_pages(pdf, "fake") is None
+    assert get_pages(pdf, "fake") == ["page 1", "page 2 — séries"]
+    assert get_pages(pdf, "fake") == ["page 1", "page 2 — séries"]
+    assert extractor.calls == 1
+    assert get_text(pdf, "fake") == "page 1\fpage 2 — séries"
+    assert extractor.calls == 1
+
+
+def test_changed_pdf_is_extracted_again(extractor, pdf):
+    get_pages(pdf, "fake")
+    pdf.write_text("page 1\npage 2 corrigée", encoding="utf-8")
+    assert get_pages(pdf, "fake") == ["page 1", "page 2 corrigée"]
+    assert extractor.calls == 2
+
+
+def test_new_extractor_version_invalidates(extractor, pdf):
+    get_pages(pdf, "fake")
+    extractor.version = "2.0"
+    get_pages(pdf, "fake")
+    assert extractor.calls == 2
+    # L'entrée de l'ancienne version reste, celle de la nouvelle sert désormais
+    get_pages(pdf, "fake")
+    assert extractor.calls == 2
+    assert len(list(pdf_text_cache.CACHE_DIR.glob("*.json"))) == 2
+
+
+def test_concurrent_writers_do_not_share_a_temp_file(extractor, pdf, monkeypatch):
+    # Un second extracteur écrit la même entrée pendant que le premier est en cours d'écriture
+    real_dump = json.dump
+    nested = []
+
+    def dump(obj, f, **kwargs):
+        if not nested:
+            nested.append(True)
+            store_pages(pdf, "fake", ["autre"])
+        real_dump(obj, f, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(pdf_text_cache.json, "dump", dump)
+        store_pages(pdf, "fake", ["page 1", "page 2"])
+
+    assert load_pages(pdf, "fake") == ["page 1", "page 2"]
+    assert list(pdf.parent.glob("cache/*.tmp")) == [] and list(pdf.parent.glob("cache/.*.tmp")) == []
+
+
+def test_failed_write_leaves_no_temp_file(extractor, pdf):
+    with pytest.raises(TypeError):
+        store_pages(pdf, "fake", [object()])
+    assert list(pdf_text_cache.CACHE_DIR.iterdir()) == []
+    assert load_pages(pdf, "fake") is None
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+from openai.types import CompletionUsage
+from openai.types.completion_usage import PromptTokensDetails
+
+import app.services.generator as generator_module
+from app.services.prompts import SYSTEM_PROMPT, build_messages, build_plan_messages, extract_usage
+
+DOCS = [
+    {"id": 1, "text": "Squat bulgare, 3x10.", "score": 0.9, "payload": {"title": "Squat", "n_tokens": 8}},
+    {"id": 2, "text": "Pompes inclinées.", "score": 0.5, "payload": {"title": "Pompes", "n_tokens": 6}},
+]
+
+
+def test_system_prompt_is_byte_identical_across_requests():
+    conversations = [
+        build_messages("Programme pour débutant ?", DOCS),
+        build_messages("Et pour un avancé ?", DOCS[:1], context_text="Semaine 2 : jambes"),
+        build_messages("", [], context_text=None),
+        build_plan_messages('{"days": []}'),
+    ]
+    prefixes = {messages[0]["content"].encode("utf-8") for messages in conversations}
+    assert prefixes == {SYSTEM_PROMPT.encode("utf-8")}
+    assert all(messages[0]["role"] == "system" for messages in conversations)
+
+
+def test_variable_parts_only_in_user_message():
+    messages = build_messages("Combien de séries ?", DOCS, context_text="Semaine 2 : jambes")
+    user = messages[-1]["content"]
+    assert len(messages) == 2 and messages[-1]["role"] == "user"
+    # Ordre : contexte programme, documents, question (la question en dernier)
+    assert user.index("Semaine 2") < user.index("[Document 1] Squat") < user.index("[Document 2] Pompes")
+    assert user.endswith("Question: Combien de séries ?")
+    for dynamic in ("Semaine 2", "Squat bulgare", "Combien de séries"):
+        assert dynamic not in messages[0]["content"]
+
+
+def test_generator_sends_the_same_prefix_on_every_call(monkeypatch, byte_encoding):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(generator_module.tiktoken, "get_encoding", lambda name: byte_encoding)
+    sent = []
+
+    def create(**request):
+        sent.append(request["messages"])
+        message = SimpleNamespace(content="## Day 1: Jambes (Document 1)")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    generator = generator_module.RAGGenerator(model="test-model")
+    generator.response_cache.enabled = False
+    generator.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    generator.generate("Séance jambes ?", DOCS)
+    generator.generate("Séance haut du corps ?", DOCS[1:], context_text="Programme en cours")
+    assert len(sent) == 2
+    assert sent[0][0]["content"].encode("utf-8") == sent[1][0]["content"].encode("utf-8") == SYSTEM_PROMPT.encode("utf-8")
+
+
+@pytest.mark.parametrize("usage, cached", [
+    (SimpleNamespace(prompt_tokens=120, completion_tokens=30), 0),  # SDK / proxy sans le champ
+    (SimpleNamespace(prompt_tokens=120, completion_tokens=30, prompt_tokens_details=None), 0),
+    (SimpleNamespace(prompt_tokens=120, completion_tokens=30, prompt_tokens_details=SimpleNamespace()), 0),
+    (CompletionUsage(prompt_tokens=120, completion_tokens=30, total_tokens=150), 0),
+    (CompletionUsage(prompt_tokens=120, completion_tokens=30, total_tokens=150,
+                     prompt_tokens_details=PromptTokensDetails(cached_tokens=None)), 0),
+    (CompletionUsage(prompt_tokens=120, completion_tokens=30, total_tokens=150,
+                     prompt_tokens_details=PromptTokensDetails(cached_tokens=96)), 96),
+])
+def test_extract_usage_with_and_without_cache_details(usage, cached):
+    assert extract_usage(SimpleNamespace(usage=usage)) == {
+        "prompt_tokens": 120, "completion_tokens": 30, "cached_tokens": cached}
+
+
+def test_extract_usage_without_usage():
+    expected = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    assert extract_usage(SimpleNamespace()) == expected
+    assert extract_usage(SimpleNamespace(usage=None)) == expected
@@ -0,0 +1,38 @@
+from app.services.reranker import RerankService
+
+
+class CountingModel:
+    """Cross-encoder stand-in: score = number of query words found in the doc."""
+
+    def __init__(self):
+        self.pairs = []
+
+    def predict(self, pairs, **kwargs):
+        self.pairs.extend(pairs)
+        return [len(set(q.lower().split()) & set(d.lower().split())) for q, d in pairs]
+
+
+def make_service():
+    model = CountingModel()
+    service = RerankService(model_name="fake", model=model, batch_wait_ms=0)
+    model.pairs.clear()  # warmup
+    return service, model
+
+
+def test_repeated_query_hits_cache():
+    service, model = make_service()
+    docs = [(1, "squat bulgare"), (2, "pompes inclinées")]
+    first = service.score("squat lourd", docs)
+    second = service.score("squat lourd", docs)
+    assert first == second == {1: 1.0, 2: 0.0}
+    assert len(model.pairs) == 2
+    assert service.stats()["hits"] == 2
+
+
+def test_changed_text_under_same_id_is_rescored():
+    service, model = make_service()
+    assert service.score("pompes", [(7, "squat bulgare")]) == {7: 0.0}
+    # Point ré-ingéré : même id, texte corrigé
+    assert service.score("pompes", [(7, "pompes inclinées")]) == {7: 1.0}
+    assert model.pairs == [["pompes", "squat bulgare"], ["pompes", "pompes inclinées"]]
+    assert service.stats()["hits"] == 0
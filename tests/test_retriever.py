@@ -0,0 +1,153 @@
+import httpx
+import numpy as np
+import pytest
+
+from qdrant_client import QdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.models import VectorParams, Distance, SparseVectorParams, PointStruct, SparseVector
+
+import app.services.retriever as retriever_module
+from app.services.embeddings import get_embedding_spec, record_collection_embedding, EMBEDDING_MODEL
+from app.services.sparse_encoder import SparseEncoder, SPARSE_VECTOR_NAME
+from app.services.local_store import LocalVectorStore, export_snapshot
+
+COLLECTION = "test_coach"
+DOCS = ["squat bulgare haltères", "pompes tempo gainage", "fentes poids du corps", "gainage planche"]
+
+
+class FakeModel:
+    dim = get_embedding_spec(EMBEDDING_MODEL).dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, text, **kwargs):
+        v = np.zeros(self.dim, dtype=np.float32)
+        for w in text.split():
+            v[sum(map(ord, w)) % self.dim] += 1
+        return v / (np.linalg.norm(v) or 1)
+
+
+class FakeReranker:
+    def __init__(self, scores):
+        self.scores = scores
+
+    def score(self, query, docs):
+        return {doc_id: self.scores[doc_id] for doc_id, _ in docs}
+
+
+class FlakyClient:
+    """In-memory Qdrant whose next `failures` hybrid queries raise (transient timeout)."""
+
+    def __init__(self, client, failures=0):
+        self._client = client
+        self.failures = failures
+        self.hybrid_calls = 0
+
+    def query_points(self, *args, **kwargs):
+        self.hybrid_calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise TimeoutError("timed out")
+        return self._client.query_points(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+@pytest.fixture
+def retriever(monkeypatch, tmp_path):
+    model = FakeModel()
+    encoder = SparseEncoder.fit(DOCS)
+    vocab = str(tmp_path / "vocab.json")
+    encoder.save(vocab)
+    monkeypatch.setattr(retriever_module, "SPARSE_VOCAB_PATH", vocab)
+    monkeypatch.setattr(retriever_module, "ENABLE_HYBRID", True)
+    monkeypatch.setattr(retriever_module, "load_embedding_model", lambda name, backend=None: model)
+
+    client = QdrantClient(":memory:")
+    client.create_collection(COLLECTION, vectors_config=VectorParams(size=model.dim, distance=Distance.COSINE),
+                             sparse_vectors_config={SPARSE_VECTOR_NAME: SparseVectorParams()})
+    record_collection_embedding(client, COLLECTION, get_embedding_spec(EMBEDDING_MODEL))
+    points = []
+    for i, text in enumerate(DOCS, 1):
+        indices, values = encoder.encode_document(text)
+        points.append(PointStruct(id=i, payload={"text": text}, vector={
+            "": model.encode(text).tolist(), SPARSE_VECTOR_NAME: SparseVector(indices=indices, values=values)}))
+    client.upsert(COLLECTION, points=points)
+    flaky = FlakyClient(client)
+    return retriever_module.HybridRetriever(flaky, COLLECTION, reranker=FakeReranker({}), mmr=False)
+
+
+def test_transient_hybrid_failure_falls_back_for_one_request_only(retriever):
+    retriever.reranker = None
+    retriever.qdrant.failures = 1
+    assert retriever.retrieve("gainage", top_k=2)  # servie en dense
+    assert retriever.sparse_encoder is not None
+    docs = retriever.retrieve("gainage", top_k=2)
+    assert retriever.qdrant.hybrid_calls == 2
+    assert {d["text"] for d in docs} == {"pompes tempo gainage", "gainage planche"}
+
+
+def test_rerank_mix_uses_normalized_scores(retriever):
+    # Scores RRF (~0.01-0.03) : sans normalisation, le terme 0.3 ne départage jamais rien
+    retriever.reranker = FakeReranker({"a": 2.0, "b": 1.9, "c": -3.0})
+    candidates = [("a", 0.016, "a"), ("b", 0.033, "b"), ("c", 0.030, "c")]
+    ranked = retriever._cross_encode_rerank("q", candidates)
+    assert [doc_id for doc_id, _, _ in ranked] == ["b", "a", "c"]
+    assert all(0.0 <= score <= 1.0 for _, score, _ in ranked)
+
+
+def _http_error(status):
+    return UnexpectedResponse(status_code=status, reason_phrase="", content=b"", headers=httpx.Headers())
+
+
+@pytest.mark.parametrize("error", [
+    ResponseHandlingException(httpx.ConnectError("connection refused")),
+    httpx.ReadTimeout("timed out"),
+    ConnectionError("reset"),
+    _http_error(503),
+])
+def test_qdrant_outage_is_served_from_local_index(retriever, tmp_path, error):
+    path = str(tmp_path / "snapshot")
+    export_snapshot(retriever.qdrant, COLLECTION, path, embedding_model=EMBEDDING_MODEL)
+    retriever.local_store = LocalVectorStore.load(path)
+    retriever.reranker = None
+    expected = [d["id"] for d in retriever.retrieve("planche gainage", top_k=2)]
+
+    def down(*args, **kwargs):
+        raise error
+
+    retriever.qdrant.count = down
+    retriever._counts.clear()
+    docs = retriever.retrieve("planche gainage", top_k=2)
+    assert len(docs) == 2 and docs[0]["id"] == expected[0] == 4
+    assert docs[0]["payload"]["text"] == "gainage planche"
+
+
+@pytest.mark.parametrize("error", [_http_error(400), KeyError("bug"), TypeError("bug")])
+def test_request_errors_and_bugs_are_not_masked_by_local_index(retriever, tmp_path, error):
+    path = str(tmp_path / "snapshot")
+    export_snapshot(retriever.qdrant, COLLECTION, path, embedding_model=EMBEDDING_MODEL)
+    retriever.local_store = LocalVectorStore.load(path)
+
+    def broken(*args, **kwargs):
+        raise error
+
+    retriever.qdrant.count = broken
+    retriever._counts.clear()
+    with pytest.raises(type(error)):
+        retriever.retrieve("planche gainage", top_k=2)
+
+
+def test_search_strategy_logged_only_when_it_changes(retriever, capsys, monkeypatch):
+    retriever.reranker = None
+    for _ in range(3):
+        retriever.retrieve("gainage", top_k=2)
+    assert capsys.readouterr().out.count("Search strategy: exact") == 1
+
+    # Collection qui grossit : le filtre passe en HNSW, la nouvelle stratégie est loguée une fois
+    monkeypatch.setattr(retriever_module, "SEARCH_EXACT_MAX", 0)
+    for _ in range(3):
+        retriever.retrieve("gainage", top_k=2)
+    assert capsys.readouterr().out.count("Search strategy: hnsw_low_ef") == 1
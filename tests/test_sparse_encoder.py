@@ -0,0 +1,43 @@
+import json
+
+from app.services.sparse_encoder import SparseEncoder, term_id
+
+DOCS = ["Squat bulgare avec haltères", "Pompes tempo et gainage", "Fentes contrôlées au poids du corps"]
+
+
+def test_term_ids_do_not_shift_when_vocabulary_changes():
+    before = SparseEncoder.fit(DOCS)
+    # "abdos" se trie avant tous les autres termes : avec des indices positionnels, tout serait décalé
+    after = SparseEncoder.fit(DOCS + ["Abdos"])
+    assert before.encode_query("squat gainage")[0] == after.encode_query("squat gainage")[0]
+    assert set(before.encode_document(DOCS[0])[0]) == set(after.encode_document(DOCS[0])[0])
+
+
+def test_query_dimensions_match_document_dimensions():
+    encoder = SparseEncoder.fit(DOCS)
+    doc_indices, doc_values = encoder.encode_document(DOCS[1])
+    query_indices, _ = encoder.encode_query("séance de pompes")
+    assert term_id("pompes") in doc_indices and term_id("pompes") in query_indices
+    assert len(doc_indices) == len(set(doc_indices)) and all(v > 0 for v in doc_values)
+
+
+def test_older_vocabulary_still_queries_new_terms(tmp_path):
+    # API restée sur l'ancien vocabulaire, points ré-ingérés avec un terme nouveau
+    old = SparseEncoder.fit(DOCS)
+    new = SparseEncoder.fit(DOCS + ["Kettlebell swing"])
+    assert term_id("kettlebell") in old.encode_query("kettlebell")[0]
+    assert term_id("kettlebell") in new.encode_document("Kettlebell swing")[0]
+
+
+def test_save_load_round_trip_and_positional_vocabulary_rejected(tmp_path):
+    path = str(tmp_path / "vocab.json")
+    encoder = SparseEncoder.fit(DOCS)
+    encoder.save(path)
+    assert SparseEncoder.load(path).encode_document(DOCS[2]) == encoder.encode_document(DOCS[2])
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data["version"] = 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    assert SparseEncoder.load(path) is None
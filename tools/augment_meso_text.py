@@ -6,6 +6,9 @@ sans modifier les autres champs. Utilise OpenAI pour formuler proprement.
 - Lit:      data2/meso_catalog.jsonl
 - Sauvegarde une copie: data2/meso_catalog.jsonl.bak
 - Écrit:    data2/meso_catalog.jsonl (enrichi)
+- Mémo persistant: .cache/llm_memo/augment_meso_text.jsonl
+  (clé = hash du prompt build_llm_prompt + réglages modèle ; avec REGENERATE=1,
+   seuls les records dont la source a changé repartent vers le LLM)
 
 Requiert:
 - OPENAI_API_KEY dans l'environnement (.env accepté)
@@ -23,7 +26,7 @@ except Exception:
 
 # OpenAI SDK v1
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
 except Exception as e:
     print("Le package 'openai' v1 est requis: pip install openai python-dotenv", file=sys.stderr)
     raise
@@ -34,11 +37,36 @@ if not API_KEY:
     print("ERREUR: OPENAI_API_KEY manquant (mets la clé dans .env)", file=sys.stderr)
     sys.exit(1)
 
-client = OpenAI(api_key=API_KEY)
+# Exécuteur concurrent (RPM/TPM, retries, journal de reprise)
+from llm_executor import LLMExecutor, LLM_JOURNAL_DIR, request_hash
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scripts.jsonl_io import atomic_open
 
 SRC = Path("data2/meso_catalog.jsonl")
 BAK = Path("data2/meso_catalog.jsonl.bak")
 DST = Path("data2/meso_catalog.jsonl")
+MEMO = Path(os.getenv("AUGMENT_MEMO_PATH", ".cache/llm_memo/augment_meso_text.jsonl"))
+
+def load_memo(path: Path) -> dict:
+    memo = {}
+    if path.exists():
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                memo[entry["key"]] = entry["text"]
+    return memo
+
+def append_memo(path: Path, entries: list):
+    if not entries:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        for key, text in entries:
+            f.write(json.dumps({"key": key, "text": text}, ensure_ascii=False) + "\n")
 
 def norm(s: str) -> str:
     s = unicodedata.normalize("NFKC", s or "")
@@ -136,18 +164,19 @@ def build_llm_prompt(rec: dict) -> str:
         f"DONNÉES:\n{json.dumps(bloc, ensure_ascii=False)}"
     )
 
-def llm_summarize(rec: dict) -> str:
-    prompt = build_llm_prompt(rec)
-    resp = client.chat.completions.create(
-        model=MODEL,
-        temperature=0.2,
-        max_tokens=220,
-        messages=[
+def build_summary_request(rec: dict) -> dict:
+    return {
+        "model": MODEL,
+        "temperature": 0.2,
+        "max_tokens": 220,
+        "messages": [
             {"role":"system","content":"Tu es un coach sportif francophone. Tu écris des synthèses claires et concises."},
-            {"role":"user","content": prompt}
+            {"role":"user","content": build_llm_prompt(rec)}
         ]
-    )
-    txt = resp.choices[0].message.content.strip()
+    }
+
+def clean_summary(txt: str) -> str:
+    txt = txt.strip()
     # nettoyage doux
     txt = norm(txt)
     # éviter de réintroduire 'I(' etc.
@@ -165,6 +194,7 @@ def main():
     BAK.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
     out = []
+    todo = []  # (position dans out, record) à enrichir
     for i, line in enumerate(lines, 1):
         obj = json.loads(line)
         if obj.get("type") != "meso_ref":
@@ -176,19 +206,48 @@ def main():
             out.append(json.dumps(obj, ensure_ascii=False))
             continue
 
-        try:
-            txt = llm_summarize(obj)
-            obj["text"] = txt
-        except Exception as e:
-            # en cas d'échec, on met un text minimal
+        out.append(None)
+        todo.append((len(out) - 1, obj))
+
+    # Mémo : clé = hash de la requête (prompt + modèle/température/max_tokens)
+    memo = load_memo(MEMO)
+    misses = []
+    hits = 0
+    for pos, obj in todo:
+        request = build_summary_request(obj)
+        key = request_hash(request)
+        if key in memo:
+            obj["text"] = memo[key]
+            out[pos] = json.dumps(obj, ensure_ascii=False)
+            hits += 1
+        else:
+            misses.append((pos, obj, key, request))
+
+    print(f"… {len(todo)} records a enrichir, {len(misses)} appels LLM necessaires")
+    executor = LLMExecutor(
+        journal_path=LLM_JOURNAL_DIR / "augment_meso_text.jsonl",
+        client=AsyncOpenAI(api_key=API_KEY, max_retries=0),
+    )
+    results = executor.run_all([(f"{pos}:{obj.get('meso_id')}", request) for pos, obj, _, request in misses])
+
+    new_entries = []
+    for pos, obj, key, _ in misses:
+        content = results[f"{pos}:{obj.get('meso_id')}"]
+        if content:
+            obj["text"] = clean_summary(content)
+            new_entries.append((key, obj["text"]))
+        else:
+            # en cas d'échec, on met un text minimal (non mémorisé)
             obj["text"] = f"{obj.get('groupe','')} — {obj.get('niveau','')}: {obj.get('methode','')}"
-        out.append(json.dumps(obj, ensure_ascii=False))
-
-        if i % 20 == 0:
-            print(f"… enrichis {i} lignes")
+        out[pos] = json.dumps(obj, ensure_ascii=False)
+    append_memo(MEMO, new_entries)
 
-    DST.write_text("\n".join(out) + "\n", encoding="utf-8")
+    with atomic_open(DST) as f:
+        f.write(("\n".join(out) + "\n").encode("utf-8"))
+    # Réponses sauvées dans le mémo et la sortie : le journal peut partir
+    executor.clear_journal()
     print(f"OK Enrichissement termine. Sauvegarde: {BAK} | Mis a jour: {DST}")
+    print(f"Memo: {hits} hits / {len(misses)} misses ({MEMO})")
 
 if __name__ == "__main__":
     main()
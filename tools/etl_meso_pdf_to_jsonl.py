@@ -18,21 +18,23 @@ import re
 import sys
 import json
 import argparse
-import hashlib
 import unicodedata
 from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scripts.pdf_text_cache import get_text, sha256_file as _sha256_hex
+
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
 try:
-    from pdfminer.high_level import extract_text
+    import pdfminer  # extraction via scripts.pdf_text_cache (extracteur "pdfminer")
 except ImportError:
     print("Veuillez installer pdfminer.six : pip install pdfminer.six", file=sys.stderr)
     sys.exit(1)
 try:
-    from jsonschema import validate, Draft202012Validator
+    from scripts.catalog_validation import compile_schema, ValidationGate
 except ImportError:
     print("Veuillez installer jsonschema : pip install jsonschema", file=sys.stderr)
     sys.exit(1)
@@ -153,11 +155,7 @@ def map_niveau(n: str) -> str:
     if "confirmé" in n or "confirme" in n: return "avance"
     return "intermediaire"
 def sha256_file(path: Path) -> str:
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return "sha256:" + h.hexdigest()
+    return "sha256:" + _sha256_hex(path)
 def _is_rubrique_line(l: str) -> bool:
     return any(l.startswith(r) for r in RUBRIQUES)
 
@@ -177,7 +175,7 @@ def _collapse(s: str) -> str:
     return s.strip()
 
 def extract_meso_records(pdf_path: Path, debug: bool = False):
-    text = extract_text(str(pdf_path))
+    text = get_text(pdf_path, extractor="pdfminer")
     raw_lines = [l for l in text.splitlines()]
     lines = [norm(l) for l in raw_lines if l.strip()]
 
@@ -343,11 +341,8 @@ def openai_normalize(records, model_name: str):
             out.append(payload)
     return out
 def is_valid(record: dict) -> bool:
-    try:
-        Draft202012Validator(MESO_SCHEMA).validate(record)
-        return True
-    except Exception:
-        return False
+    # Validateur compilé une fois par process (compile_schema met en cache)
+    return compile_schema(MESO_SCHEMA).is_valid(record)
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--pdf", required=True, help="Chemin vers meso.pdf")
@@ -385,15 +380,19 @@ def main():
         (debug_dir / "meso_debug_sample.json").write_text(json.dumps(sample, ensure_ascii=False, indent=2), encoding="utf-8")
         print(f"Debug: {len(candidates)} blocs candidats, {len(raw_records)} matchés, {len(unmatched)} non-matchés -> data2/meso_debug_unmatched.txt", file=sys.stderr)
     
+    gate = ValidationGate({"meso_ref": MESO_SCHEMA}, strict=True)
     written = 0
     with open(out_path, "w", encoding="utf-8") as f:
         for rec in cleaned:
             rec = strip_empty(rec)
             rec["type"] = "meso_ref"
-            if is_valid(rec):
+            if gate.check(rec):
                 f.write(json.dumps(rec, ensure_ascii=False) + "\n")
                 written += 1
     print(f"OK — {written} meso-cycles ecrits -> {out_path}")
+    if gate.report.invalid:
+        stats = ", ".join(f"{field}={n}" for field, n in gate.report.by_field.most_common(5))
+        print(f"   {gate.report.invalid} records rejetes par le schema ({stats})", file=sys.stderr)
     if written == 0:
         print("Aucun record valide ecrit. Verifie le PDF ou le regex.", file=sys.stderr)
         sys.exit(3)
@@ -5,15 +5,20 @@ Extraction micro-cycles depuis micro.pdf -> JSONL via OpenAI.
 Ce script lit le PDF micro.pdf et génère data2/micro_catalog.jsonl avec la clé OpenAI (.env)
 Gère automatiquement les PDFs longs en découpant en sections si nécessaire.
 """
-from openai import OpenAI
 import json
 import re
+import sys
 from pathlib import Path
-from pdfminer.high_level import extract_text
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scripts.pdf_text_cache import get_text
+from scripts.jsonl_io import atomic_open
+
 load_dotenv()
-client = OpenAI()
+
+# Exécuteur concurrent (RPM/TPM, retries, journal de reprise)
+from llm_executor import LLMExecutor, LLM_JOURNAL_DIR
 
 # Configuration
 MAX_CHARS_PER_CHUNK = 100000  # Limite par chunk (GPT-4o peut gérer jusqu'à 128k tokens)
@@ -47,9 +52,9 @@ def split_text_by_sections(text: str) -> list:
     
     return chunks
 
-def extract_jsonl_from_text(text_chunk: str, chunk_num: int = None, total_chunks: int = None) -> str:
+def build_extract_request(text_chunk: str, chunk_num: int = None, total_chunks: int = None) -> dict:
     """
-    Extrait le JSONL d'un chunk de texte via OpenAI
+    Requête OpenAI d'extraction du JSONL d'un chunk de texte
     """
     chunk_info = ""
     if chunk_num is not None and total_chunks is not None:
@@ -101,14 +106,14 @@ Voici le texte source (extrait TOUS les micro-cycles présents) :
 {text_chunk}
 """
     
-    resp = client.chat.completions.create(
-        model="gpt-4o",
-        temperature=0.3,
-        messages=[{"role": "user", "content": prompt}],
-        max_tokens=16000,  # Augmenté pour permettre plus de micro-cycles
-    )
-    
-    content = resp.choices[0].message.content
+    return {
+        "model": "gpt-4o",
+        "temperature": 0.3,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 16000,  # Augmenté pour permettre plus de micro-cycles
+    }
+
+def clean_jsonl_content(content: str) -> str:
     # Retire les blocs ```jsonl ou ``` si présents
     content = re.sub(r"^```(?:jsonl|json)?\s*\n", "", content, flags=re.MULTILINE)
     content = re.sub(r"\n```\s*$", "", content, flags=re.MULTILINE)
@@ -116,7 +121,7 @@ Voici le texte source (extrait TOUS les micro-cycles présents) :
 
 # 1. Extraction brute du texte PDF
 pdf_path = Path("data/raw/pdfs/micro.pdf")
-raw_text = extract_text(str(pdf_path))
+raw_text = get_text(pdf_path, extractor="pdfminer")  # cache d'extraction (clé = hash du PDF)
 
 # 2. Normalisation du texte
 text = re.sub(r"\s+", " ", raw_text).strip()
@@ -131,11 +136,20 @@ for i, chunk in enumerate(chunks, 1):
     first_line = chunk[:100].split('\n')[0] if '\n' in chunk[:100] else chunk[:100]
     print(f"   Chunk {i}: {len(chunk)} caractères - {first_line[:50]}...")
 
-# 4. Traitement de chaque chunk
+# 4. Traitement des chunks en parallèle (ordre des résultats conservé)
+executor = LLMExecutor(journal_path=LLM_JOURNAL_DIR / "etl_micro_openai.jsonl")
+results = executor.run_all([
+    (f"chunk-{i}", build_extract_request(chunk, chunk_num=i, total_chunks=len(chunks)))
+    for i, chunk in enumerate(chunks, 1)
+])
+
 all_jsonl_lines = []
 for i, chunk in enumerate(chunks, 1):
-    print(f"🔄 Traitement du chunk {i}/{len(chunks)} ({len(chunk)} caractères)...")
-    jsonl_content = extract_jsonl_from_text(chunk, chunk_num=i, total_chunks=len(chunks))
+    content = results[f"chunk-{i}"]
+    if content is None:
+        print(f"   ⚠️  Chunk {i} en échec ({executor.failure_hint(f'chunk-{i}')})")
+        continue
+    jsonl_content = clean_jsonl_content(content)
     
     # Parse les lignes JSONL
     lines = [l.strip() for l in jsonl_content.split("\n") if l.strip()]
@@ -163,10 +177,12 @@ for line in all_jsonl_lines:
 
 # 6. Sauvegarde
 out_path = Path("data2/micro_catalog.jsonl")
-out_path.parent.mkdir(parents=True, exist_ok=True)
-with open(out_path, "w", encoding="utf-8") as f:
+with atomic_open(out_path) as f:
     for line in unique_lines:
-        f.write(line + "\n")
+        f.write((line + "\n").encode("utf-8"))
+# Sortie écrite : les réponses du journal ne servent plus (gardées si des chunks sont à reprendre)
+if not executor.stats["failed"]:
+    executor.clear_journal()
 
 # 7. Validation finale
 valid_count = 0
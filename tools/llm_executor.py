@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exécuteur LLM partagé par les outils ETL (etl_micro_openai, augment_meso_text, llm_meso_candidates_to_jsonl).
+
+- Appels concurrents (asyncio) sous limites requêtes/minute (RPM) et tokens/minute (TPM)
+- Retry avec backoff exponentiel + jitter (429, 5xx, erreurs réseau et timeouts), jamais sur un bug
+- Journal JSONL des items terminés : un run interrompu reprend là où il s'est arrêté.
+  Le journal est conservé après run() : l'appelant le supprime (clear_journal) une fois sa sortie
+  écrite, sinon un crash pendant l'écriture ferait perdre les réponses déjà payées
+
+Tests en local : OPENAI_BASE_URL=http://127.0.0.1:8089/v1 (voir tools/llm_stub_server.py).
+
+Usage:
+    from llm_executor import LLMExecutor
+    executor = LLMExecutor(journal_path=Path(".cache/llm_journal/augment.jsonl"))
+    results = executor.run_all([(item_id, {"model": ..., "messages": [...], "max_tokens": 200}), ...])
+    # results[item_id] = contenu texte de la réponse (None si échec définitif)
+    write_output(results)        # écriture atomique de la sortie
+    executor.clear_journal()     # seulement ensuite
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except Exception:
+    pass
+
+LLM_RPM = int(os.getenv("LLM_RPM", "300"))
+LLM_TPM = int(os.getenv("LLM_TPM", "150000"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_JOURNAL_DIR = Path(os.getenv("LLM_JOURNAL_DIR", ".cache/llm_journal"))
+
+
+def request_hash(request: dict) -> str:
+    """Empreinte d'une requête : un item dont le prompt change n'est pas repris depuis le journal."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def estimate_tokens(request: dict) -> int:
+    """Estimation grossière (≈ 4 caractères / token) + budget de sortie, pour la limite TPM."""
+    chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+    return chars // 4 + int(request.get("max_tokens") or 0)
+
+
+def _network_errors() -> Tuple[type, ...]:
+    errors: Tuple[type, ...] = (asyncio.TimeoutError, TimeoutError, OSError)
+    try:
+        import openai
+    except ImportError:
+        return errors
+    # APITimeoutError hérite d'APIConnectionError
+    return errors + (openai.APIConnectionError,)
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    429, 5xx, erreurs réseau et timeouts : une relance peut réussir.
+    Autres 4xx, et toute exception sans statut qui n'est pas réseau (KeyError, TypeError, JSON...) : non,
+    ce sont des bugs ou des requêtes à corriger, les relancer avec backoff ne ferait que perdre du temps.
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        return isinstance(error, _network_errors())
+    return status == 429 or status >= 500
+
+
+class RateLimiter:
+    """Double token bucket (requêtes et tokens), rechargé en continu sur une fenêtre d'une minute."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm, self.tpm = rpm, tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    async def acquire(self, tokens: int):
+        # Une requête plus grosse que le budget TPM passe quand le bucket est plein
+        tokens = min(tokens, self.tpm)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait_req = (1 - self._requests) * 60.0 / self.rpm if self._requests < 1 else 0
+                wait_tok = (tokens - self._tokens) * 60.0 / self.tpm if self._tokens < tokens else 0
+                await asyncio.sleep(max(wait_req, wait_tok, 0.01))
+
+
+class LLMExecutor:
+    def __init__(self, journal_path: Optional[Path] = None, rpm: int = LLM_RPM, tpm: int = LLM_TPM,
+                 concurrency: int = LLM_CONCURRENCY, max_retries: int = LLM_MAX_RETRIES, client=None):
+        self.journal_path = Path(journal_path) if journal_path else None
+        self.rpm, self.tpm = rpm, tpm
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self._client = client
+        self.stats = {"resumed": 0, "done": 0, "failed": 0, "retries": 0}
+        # item_id -> True si l'échec est passager (relancer reprendra l'item), False sinon (4xx)
+        self.failures: Dict[str, bool] = {}
+
+    def _get_client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+            # OPENAI_BASE_URL est lu par le SDK : permet de viser un serveur stub local
+            self._client = AsyncOpenAI(max_retries=0)
+        return self._client
+
+    def _load_journal(self) -> Dict[str, str]:
+        done = {}
+        if self.journal_path and self.journal_path.exists():
+            with self.journal_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # dernière ligne tronquée par une interruption
+                    done[entry["key"]] = entry["content"]
+        return done
+
+    async def _call(self, limiter: RateLimiter, request: dict) -> str:
+        client = self._get_client()
+        tokens = estimate_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire(tokens)
+            try:
+                resp = await client.chat.completions.create(**request)
+                return resp.choices[0].message.content
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(min(60.0, (2 ** attempt) + random.random()))
+
+    async def run(self, items: Iterable[Tuple[str, dict]]) -> Dict[str, Optional[str]]:
+        items = list(items)
+        done = self._load_journal()
+        results: Dict[str, Optional[str]] = {}
+        pending = []
+        for item_id, request in items:
+            key = f"{item_id}:{request_hash(request)}"
+            if key in done:
+                results[item_id] = done[key]
+                self.stats["resumed"] += 1
+            else:
+                pending.append((item_id, key, request))
+
+        limiter = RateLimiter(self.rpm, self.tpm)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        journal = None
+        if self.journal_path:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            journal = self.journal_path.open("a", encoding="utf-8")
+            if journal.tell() > 0:
+                # Repartir sur une ligne propre si le run précédent a été coupé en pleine écriture
+                with self.journal_path.open("rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        journal.write("\n")
+
+        async def worker(item_id: str, key: str, request: dict):
+            async with semaphore:
+                try:
+                    content = await self._call(limiter, request)
+                except Exception as e:
+                    retryable = is_retryable(e)
+                    if retryable:
+                        print(f"   ⚠️  {item_id}: échec après {self.max_retries} retries ({e}), "
+                              f"relancer pour reprendre", file=sys.stderr)
+                    else:
+                        status = getattr(e, "status_code", None)
+                        cause = f"HTTP {status}" if status is not None else type(e).__name__
+                        print(f"   ❌ {item_id}: erreur non récupérable ({cause}: {e}), "
+                              f"la requête est à corriger : une relance échouera de même", file=sys.stderr)
+                    self.failures[item_id] = retryable
+                    results[item_id] = None
+                    self.stats["failed"] += 1
+                    return
+            results[item_id] = content
+            self.stats["done"] += 1
+            if journal:
+                journal.write(json.dumps({"key": key, "content": content}, ensure_ascii=False) + "\n")
+                journal.flush()
+
+        try:
+            await asyncio.gather(*(worker(*p) for p in pending))
+        finally:
+            if journal:
+                journal.close()
+
+        # Résultats dans l'ordre des items
+        return {item_id: results.get(item_id) for item_id, _ in items}
+
+    def clear_journal(self):
+        """Delete the journal. Call it only once the outputs built from the results are safely written."""
+        if self.journal_path:
+            self.journal_path.unlink(missing_ok=True)
+
+    def failure_hint(self, item_id: str) -> str:
+        if self.failures.get(item_id, True):
+            return "relancer le script pour reprendre"
+        return "erreur non récupérable, requête à corriger"
+
+    def run_all(self, items: Iterable[Tuple[str, dict]]) -> Dict[str, Optional[str]]:
+        results = asyncio.run(self.run(items))
+        print(f"   LLM: {self.stats['done']} appels, {self.stats['resumed']} repris du journal, "
+              f"{self.stats['retries']} retries, {self.stats['failed']} échecs")
+        return results
@@ -12,7 +12,7 @@ Sortie:
 - data2/meso_catalog.jsonl (1 objet JSON par ligne, sans champs inutiles/vides)
 """
 
-import os, json, re, unicodedata, argparse
+import os, sys, json, re, unicodedata, argparse
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -95,37 +95,36 @@ Notes:
 - Output must be STRICT JSON, no code fences, no comments.
 """
 
-# OpenAI client (new SDK)
-def get_client():
-    try:
-        from openai import OpenAI
-        return OpenAI()
-    except Exception as e:
-        raise RuntimeError("openai package (>=1.0) is required. pip install openai") from e
-
-def llm_extract_one_block(client, text_block: str) -> dict:
+# Exécuteur concurrent (RPM/TPM, retries, journal de reprise)
+from llm_executor import LLMExecutor, LLM_JOURNAL_DIR
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scripts.jsonl_io import atomic_open
+
+def block_meso_id(text_block: str) -> str:
+    """meso_id "x.y" si le bloc commence par MCx.y, sinon ""."""
+    m = re.match(r"^MC(\d+\.\d+)\s*[–—-]\s*", norm(text_block))
+    return m.group(1) if m else ""
+
+def build_extract_request(text_block: str) -> dict:
+    return {
+        "model": OPENAI_MODEL,
+        "temperature": TEMPERATURE,
+        "messages": [
+            {"role":"system","content": SYSTEM_INSTRUCTIONS},
+            {"role":"user","content": norm(text_block)}
+        ],
+        "max_tokens": MAX_TOKENS,
+        "response_format": {"type":"json_object"},
+    }
+
+def parse_extract_response(meso_id: str, content: str) -> dict:
     """
-    Appelle le LLM pour extraire les champs. Renvoie {} si parsing impossible.
+    Valide/normalise la réponse du LLM pour un bloc. Renvoie {} si parsing impossible.
     """
-    text_block = norm(text_block)
-    # quick sanity: doit commencer par MCx.y
-    m = re.match(r"^MC(\d+\.\d+)\s*[–—-]\s*", text_block)
-    if not m:
+    if not content:
         return {}
-    meso_id = m.group(1)  # "x.y"
-    # Envoie le bloc brut au modèle
     try:
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            temperature=TEMPERATURE,
-            messages=[
-                {"role":"system","content": SYSTEM_INSTRUCTIONS},
-                {"role":"user","content": text_block}
-            ],
-            max_tokens=MAX_TOKENS,
-            response_format={"type":"json_object"},
-        )
-        content = resp.choices[0].message.content
         obj = json.loads(content)
         # Validations minimales
         if obj.get("type") != "meso_ref": obj["type"] = "meso_ref"
@@ -176,12 +175,20 @@ def main():
     if args.limit > 0:
         blocks = blocks[:args.limit]
 
-    client = get_client()
     out_lines = []
     ok, fail = 0, 0
 
-    for b in blocks:
-        obj = llm_extract_one_block(client, b)
+    # quick sanity: chaque bloc doit commencer par MCx.y
+    ids = [block_meso_id(b) for b in blocks]
+    fail += sum(1 for mid in ids if not mid)
+    items = [(f"{i}:{mid}", build_extract_request(b)) for i, (b, mid) in enumerate(zip(blocks, ids)) if mid]
+    executor = LLMExecutor(journal_path=LLM_JOURNAL_DIR / "llm_meso_candidates.jsonl")
+    results = executor.run_all(items)
+
+    for i, mid in enumerate(ids):
+        if not mid:
+            continue
+        obj = parse_extract_response(mid, results[f"{i}:{mid}"])
         if not obj:
             fail += 1
             continue
@@ -207,7 +214,11 @@ def main():
         out_lines.append(json.dumps(pruned, ensure_ascii=False))
         ok += 1
 
-    Path(args.out_path).write_text("\n".join(out_lines) + ("\n" if out_lines else ""), encoding="utf-8")
+    with atomic_open(args.out_path) as f:
+        f.write(("\n".join(out_lines) + ("\n" if out_lines else "")).encode("utf-8"))
+    # Sortie écrite : journal supprimé, sauf s'il reste des appels à reprendre
+    if not executor.stats["failed"]:
+        executor.clear_journal()
     print(f"OK: {ok} | FAIL: {fail} | -> {args.out_path}")
 
 if __name__ == "__main__":
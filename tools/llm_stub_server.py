@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serveur stub compatible OpenAI (POST /v1/chat/completions) pour tester les outils ETL sans clé ni coût.
+
+Usage:
+    python tools/llm_stub_server.py --port 8089 [--fail-rate 0.2] [--content '{"type": "meso_ref"}']
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=stub python tools/augment_meso_text.py
+
+Réponse : --content si fourni, sinon un écho du dernier message. --fail-rate renvoie des 429 aléatoires
+pour exercer les retries de llm_executor.
+"""
+import json
+import time
+import random
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ARGS = None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        req = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            return self._send(404, {"error": {"message": "not found"}})
+        if random.random() < ARGS.fail_rate:
+            return self._send(429, {"error": {"message": "rate limited (stub)", "type": "rate_limit_error"}})
+        time.sleep(ARGS.latency)
+
+        messages = req.get("messages") or [{"content": ""}]
+        content = ARGS.content if ARGS.content is not None else f"stub: {messages[-1].get('content', '')[:200]}"
+        self._send(200, {
+            "id": f"chatcmpl-stub-{random.randint(0, 1 << 30)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": req.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+
+def main():
+    global ARGS
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    ap.add_argument("--latency", type=float, default=0.05, help="Latence simulée (s)")
+    ap.add_argument("--content", default=None)
+    ARGS = ap.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", ARGS.port), StubHandler)
+    print(f"Stub OpenAI sur http://127.0.0.1:{ARGS.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
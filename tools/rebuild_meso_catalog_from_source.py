@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import re, json, unicodedata, argparse
+import re, sys, unicodedata, argparse
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from scripts.jsonl_io import iter_jsonl, jsonl_writer
+
 def norm(s: str) -> str:
     s = unicodedata.normalize("NFKC", s or "")
     s = s.replace("'","'").replace(""",'"').replace(""",'"')
@@ -234,45 +237,40 @@ def main():
     args = ap.parse_args()
 
     truth = parse_txt_truth(Path(args.txt))
-    src_lines = Path(args.in_jsonl).read_text(encoding="utf-8").splitlines()
-
-    out = []
     fixed, total = 0, 0
-    for line in src_lines:
-        if not line.strip():
-            continue
-        obj = json.loads(line)
-        total += 1
-        mid = obj.get("meso_id")
-        # tolère "1.1" vs "MC1.1"
-        key = mid if isinstance(mid, str) and mid.startswith("MC") else f"MC{mid}"
+    # Lecture et écriture en streaming ; --out-jsonl n'est remplacé qu'à la fin d'un run complet
+    with jsonl_writer(args.out_jsonl) as out:
+        for obj in iter_jsonl(args.in_jsonl, on_error="raise"):
+            total += 1
+            mid = obj.get("meso_id")
+            # tolère "1.1" vs "MC1.1"
+            key = mid if isinstance(mid, str) and mid.startswith("MC") else f"MC{mid}"
 
-        if key in truth:
-            t = truth[key]
-            # Remplacer les champs par la vérité source
-            obj["groupe"] = t["groupe"]
-            obj["niveau"] = t["niveau"]
-            obj["nom"] = t["nom"]
-            obj["objectif"] = t["objectif"]
-            obj["methode"] = t["methode"]
-            obj["variables"] = t["variables"]
-            obj["sollicitation_neuromusculaire"] = t["neuro"]
-            obj["systeme_energetique"] = t["energy"]
-            # Normalise ponctuation de l'intention
-            intent = t["intention"]
-            if ";" in intent and " ;" not in intent:
-                intent = intent.replace(";", " ;")
-            obj["intention"] = intent
-            fixed += 1
+            if key in truth:
+                t = truth[key]
+                # Remplacer les champs par la vérité source
+                obj["groupe"] = t["groupe"]
+                obj["niveau"] = t["niveau"]
+                obj["nom"] = t["nom"]
+                obj["objectif"] = t["objectif"]
+                obj["methode"] = t["methode"]
+                obj["variables"] = t["variables"]
+                obj["sollicitation_neuromusculaire"] = t["neuro"]
+                obj["systeme_energetique"] = t["energy"]
+                # Normalise ponctuation de l'intention
+                intent = t["intention"]
+                if ";" in intent and " ;" not in intent:
+                    intent = intent.replace(";", " ;")
+                obj["intention"] = intent
+                fixed += 1
 
-            # (optionnel) régénérer "text" compact pour embedding
-            v = obj["variables"]
-            text = f"{obj['groupe']} – {obj['niveau']} – {obj['methode']} – I:{v.get('I','')} T:{v.get('T','')} S:{v.get('S','')} RE:{v.get('RE','')} RY:{v.get('RY','')} – {obj['sollicitation_neuromusculaire']} – {obj['systeme_energetique']} – {obj['intention']}"
-            obj["text"] = norm(text)
+                # (optionnel) régénérer "text" compact pour embedding
+                v = obj["variables"]
+                text = f"{obj['groupe']} – {obj['niveau']} – {obj['methode']} – I:{v.get('I','')} T:{v.get('T','')} S:{v.get('S','')} RE:{v.get('RE','')} RY:{v.get('RY','')} – {obj['sollicitation_neuromusculaire']} – {obj['systeme_energetique']} – {obj['intention']}"
+                obj["text"] = norm(text)
 
-        out.append(json.dumps(obj, ensure_ascii=False))
+            out.write(obj)
 
-    Path(args.out_jsonl).write_text("\n".join(out) + "\n", encoding="utf-8")
     print(f"OK reconciled: {fixed}/{total} rows from source {args.txt}")
     print(f"-> {args.out_jsonl}")
 